@@ -1,11 +1,24 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from pathlib import Path
-from PIL import Image, ImageTk
-from database import db_connect
+from datetime import date
+from tkinter import ttk, messagebox, filedialog, simpledialog
+from database import get_connection, data_generation
+import services
 from payment_history import PaymentHistoryWindow
-from utils import get_art_path
-from datetime import datetime
+from utils import br_to_iso, iso_to_br
+from assets import load_image
+from virtual_table import VirtualTreeview
+from db_worker import DbWorker
+from backup import create_backup
+import importer
+import archive
+import maintenance
+from export_window import ExportWindow
+from receipt_window import ReceiptWindow
+from reports import ReportWindow
+from ledger_window import LedgerWindow
+from billing import BillingWindow
+from overdue import OverdueScanner, OverdueWindow
+from diagnostics_window import DiagnosticsWindow
 
 
 class AdminWindow:
@@ -26,14 +39,20 @@ class AdminWindow:
         self.root.configure(bg=self.bg_gray)
 
         self.setup_styles()
+        # queries run off the Tk thread; results come back through root.after
+        self.worker = DbWorker(self.root, on_busy=self.set_busy)
+        self.root.bind("<Destroy>", self._on_destroy, add="+")
         self.setup_ui()
 
         # load students after UI built
         self.root.after(200, self.load_students)
+        self.root.after(self.GENERATION_POLL_MS, self.watch_generation)
+        self.root.after(self.MAINTENANCE_POLL_MS, self.check_maintenance)
 
-        # banner check (admin only)
+        # overdue scan (admin only): first one shortly after opening, then periodically
         if self.is_admin:
-            self.root.after(600, self.check_overdue_payments_and_show_alerts)
+            self.overdue_scanner = OverdueScanner()
+            self.root.after(600, self.scan_overdue)
 
     # ---------------- Styles ----------------
     def setup_styles(self):
@@ -54,26 +73,47 @@ class AdminWindow:
 
     # ---------------- UI ----------------
     def setup_ui(self):
+        # MENU (admin only)
+        if self.is_admin:
+            menubar = tk.Menu(self.root)
+            self.data_menu = tk.Menu(menubar, tearoff=0)
+            self.data_menu.add_command(label="Importar alunos (CSV)...", command=lambda: self.import_csv("alunos"))
+            self.data_menu.add_command(label="Importar pagamentos (CSV)...", command=lambda: self.import_csv("pagamentos"))
+            self.data_menu.add_command(label="Exportar...", command=lambda: ExportWindow(self.worker))
+            self.data_menu.add_command(label="Gerar cobranças do mês...", command=lambda: BillingWindow(self.worker))
+            self.data_menu.add_command(label="Arquivar ano encerrado...", command=self.archive_year)
+            self.data_menu.add_command(label="Recibos e extratos...", command=lambda: ReceiptWindow(self.worker))
+            self.data_menu.add_separator()
+            self.data_menu.add_command(label="Fazer backup agora", command=self.backup_now)
+            menubar.add_cascade(label="Dados", menu=self.data_menu)
+            reports_menu = tk.Menu(menubar, tearoff=0)
+            reports_menu.add_command(label="Resumo financeiro", command=lambda: ReportWindow(self.worker))
+            reports_menu.add_command(label="Livro-caixa de pagamentos", command=lambda: LedgerWindow(self.worker))
+            reports_menu.add_command(label="Alunos em atraso", command=self.open_overdue)
+            reports_menu.add_separator()
+            reports_menu.add_command(label="Diagnóstico de desempenho", command=DiagnosticsWindow)
+            menubar.add_cascade(label="Relatórios", menu=reports_menu)
+            self.root.config(menu=menubar)
+
         # HEADER
         header = tk.Frame(self.root, bg=self.primary)
         header.grid(row=0, column=0, sticky="ew")
         tk.Label(header, text="Painel Administrativo — Escola IEGV", bg=self.primary, fg=self.white,
                  font=("Segoe UI", 18, "bold"), pady=12).pack(side="left", padx=18)
 
-        logo_path = get_art_path("logo.png")
-        if Path(logo_path).exists():
-            try:
-                img = Image.open(logo_path).resize((48, 48))
-                self.logo_small = ImageTk.PhotoImage(img)
-                tk.Label(header, image=self.logo_small, bg=self.primary).pack(side="right", padx=12)
-            except Exception:
-                pass
+        self.logo_small = load_image("logo.png", (48, 48), master=self.root)
+        if self.logo_small is not None:
+            tk.Label(header, image=self.logo_small, bg=self.primary).pack(side="right", padx=12)
 
         # BANNER (row 1) - initially hidden; will be grid'ed when needed
         self.banner_frame = tk.Frame(self.root, bg="#FFCDD2")
         self.banner_label = tk.Label(self.banner_frame, text="", bg="#FFCDD2", fg="#B71C1C",
                                      font=("Segoe UI", 12, "bold"), pady=6)
         self.banner_label.pack(fill="x")
+        if self.is_admin:
+            # clicking the banner opens the paginated overdue list
+            self.banner_label.config(cursor="hand2")
+            self.banner_label.bind("<Button-1>", self.open_overdue)
 
         # Ensure grid expansion for content area
         self.root.grid_columnconfigure(0, weight=1)
@@ -93,6 +133,38 @@ class AdminWindow:
         ttk.Button(self.search_frame, text="Buscar", style="Green.TButton", command=self.search_student).grid(row=0, column=2, padx=6)
         ttk.Button(self.search_frame, text="Limpar", style="Green.TButton", command=self.load_students).grid(row=0, column=3, padx=6)
 
+        # search-as-you-type (debounced)
+        self.instant_search = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.search_frame, text="Busca instantânea", variable=self.instant_search).grid(row=0, column=4, padx=6)
+        # typo-tolerant search over the trigram name index (top matches ranked by similarity)
+        self.fuzzy_search = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.search_frame, text="Busca aproximada", variable=self.fuzzy_search,
+                        command=self.search_student).grid(row=0, column=5, padx=6)
+        self._search_job = None
+        self.search_var.trace_add("write", lambda *a: self.schedule_search())
+
+        # filters (row 1 of the search frame); applied in SQL together with the search term
+        self.search_term = ""
+        self.filters = {}
+        self.sort_column = None
+        self.sort_desc = False
+        filter_frame = ttk.Frame(self.search_frame)
+        filter_frame.grid(row=1, column=0, columnspan=6, sticky="w", pady=(6, 0))
+        ttk.Label(filter_frame, text="Status:").pack(side="left", padx=(5, 2))
+        self.filter_status = tk.StringVar(value="")
+        ttk.Combobox(filter_frame, textvariable=self.filter_status, values=["", "Pago", "Pendente"],
+                     state="readonly", width=10).pack(side="left", padx=4)
+        self.filter_entries = {}
+        for key, label, width in (("turma", "Turma:", 8), ("professor", "Professor:", 16),
+                                  ("date_from", "De:", 11), ("date_to", "Até:", 11)):
+            ttk.Label(filter_frame, text=label).pack(side="left", padx=(8, 2))
+            ent = ttk.Entry(filter_frame, width=width)
+            ent.pack(side="left", padx=2)
+            ent.bind("<Return>", lambda e: self.apply_filters())
+            self.filter_entries[key] = ent
+        ttk.Button(filter_frame, text="Filtrar", style="Green.TButton", command=self.apply_filters).pack(side="left", padx=6)
+        ttk.Button(filter_frame, text="Limpar filtros", style="Green.TButton", command=self.clear_filters).pack(side="left", padx=2)
+
         # FORM (row 3)
         self.form_frame = tk.LabelFrame(self.root, text="Cadastro de Alunos", bg=self.bg_gray,
                                        font=("Segoe UI", 12, "bold"))
@@ -135,15 +207,21 @@ class AdminWindow:
         self.table_frame.grid_columnconfigure(0, weight=1)
 
         cols = ["Nome", "Professor", "Turma", "Data de Pagamento", "Forma de Pagamento", "Assinatura", "Status"]
-        self.tree = ttk.Treeview(self.table_frame, columns=cols, show="headings", selectmode="browse")
+        # only the visible window of rows is materialized; pages are fetched while scrolling
+        self.table = VirtualTreeview(self.table_frame, cols, get_connection, self.format_student_row, worker=self.worker,
+                                     generation=lambda conn: data_generation(conn, "students"),
+                                     selectmode="extended")
+        self.tree = self.table.tree
         self.tree.grid(row=0, column=0, sticky="nsew")
-
-        scroll_y = ttk.Scrollbar(self.table_frame, orient="vertical", command=self.tree.yview)
-        scroll_y.grid(row=0, column=1, sticky="ns")
-        self.tree.configure(yscrollcommand=scroll_y.set)
+        self.table.scrollbar.grid(row=0, column=1, sticky="ns")
 
         for c in cols:
-            self.tree.heading(c, text=c)
+            column = self.SORT_COLUMNS.get(c)
+            if column:
+                # sorting happens in SQLite (ORDER BY + keyset paging), not on the loaded rows
+                self.tree.heading(c, text=c, command=lambda col=column: self.sort_by(col))
+            else:
+                self.tree.heading(c, text=c)
             self.tree.column(c, width=150, anchor="center")
 
         self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
@@ -152,90 +230,145 @@ class AdminWindow:
         self.footer = tk.Label(self.root, text=f"Logado como: {self.username} {'(Admin)' if self.is_admin else ''}",
                                bg=self.bg_gray, fg="#555", font=("Segoe UI", 10))
         self.footer.grid(row=7, column=0, sticky="ew", pady=4)
+        self.busy_bar = ttk.Progressbar(self.root, mode="indeterminate", length=140)
+
+    # ---------------- Background work ----------------
+    def set_busy(self, busy):
+        if busy:
+            self.busy_bar.grid(row=7, column=0, sticky="e", padx=14)
+            self.busy_bar.start(15)
+            self.root.configure(cursor="watch")
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.grid_forget()
+            self.root.configure(cursor="")
+
+    def show_db_error(self, exc):
+        messagebox.showerror("Erro", f"Falha ao acessar o banco de dados:\n{exc}")
+
+    def _on_destroy(self, event):
+        if event.widget is self.root:
+            self.worker.shutdown()
 
     # ---------------- Banner & overdue check ----------------
-    def check_overdue_payments_and_show_alerts(self):
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("SELECT nome, payment_date FROM alunos WHERE status_pagamento='Pendente' AND payment_date IS NOT NULL")
-        rows = cur.fetchall()
-        conn.close()
-
-        atrasados = []
-        hoje = datetime.now().date()
-
-        for nome, data in rows:
-            try:
-                dt = datetime.strptime(data, "%d/%m/%Y").date()
-                if dt < hoje:
-                    atrasados.append((nome, data))
-            except Exception:
-                continue
-
-        if not atrasados:
+    OVERDUE_SCAN_MS = 60000
+
+    def scan_overdue(self):
+        # the scan itself is skipped when neither the students generation nor the date changed
+        self.worker.submit(self.overdue_scanner.scan, on_done=self.show_overdue_alerts,
+                           on_error=self.show_db_error, key="overdue", label="overdue_scan")
+        self.root.after(self.OVERDUE_SCAN_MS, self.scan_overdue)
+
+    def show_overdue_alerts(self, result):
+        if not result.total:
             # ensure banner is hidden
-            try:
-                self.banner_frame.grid_forget()
-            except Exception:
-                pass
+            self.banner_frame.grid_forget()
             return
-
-        msg = f"⚠ Existem {len(atrasados)} alunos com pagamentos atrasados! Pesquise usando Buscar."
-        self.banner_label.config(text=msg)
+        self.banner_label.config(text=result.banner())
         # show banner right below header
         self.banner_frame.grid(row=1, column=0, sticky="ew", padx=12, pady=(8,4))
 
-        # popup list
-        lista = "\n".join([f"{n} — vencido em {d}" for n, d in atrasados])
-        messagebox.showwarning("Pagamentos Atrasados", lista)
+    def open_overdue(self, event=None):
+        OverdueWindow(self.worker, on_pay=lambda change: self.table.apply_updates(change.generation, change.rows))
 
     # ---------------- CRUD ----------------
+    def format_student_row(self, row):
+        status = "✔️ Pago" if row[-1] == "Pago" else "❌ Pendente"
+        sid, name, professor, turma, pdate, method, assinatura = row[:-1]
+        return sid, (name, professor, turma, iso_to_br(pdate), method, assinatura, status)
+
+    SORT_COLUMNS = {"Nome": "name", "Professor": "professor", "Turma": "turma",
+                    "Data de Pagamento": "payment_date", "Status": "status_pagamento"}
+
     def load_students(self):
+        self.search_term = ""
+        self.reload_source("load_students")
+
+    def reload_source(self, label=None):
+        self.table.set_source(services.student_source(self.search_term, self.sort_column, self.sort_desc, self.filters,
+                                                      fuzzy=self.fuzzy_search.get()),
+                              label)
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_desc = not self.sort_desc
+        else:
+            self.sort_column, self.sort_desc = column, False
+        for label, col in self.SORT_COLUMNS.items():
+            arrow = (" ▼" if self.sort_desc else " ▲") if col == column else ""
+            self.tree.heading(label, text=label + arrow)
+        self.reload_source("sort_students")
+
+    def apply_filters(self):
+        values = {key: ent.get().strip() for key, ent in self.filter_entries.items()}
         try:
-            self.tree.delete(*self.tree.get_children())
-        except Exception:
-            pass
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("""SELECT id, nome, professor, turma, payment_date, payment_method, assinatura, status_pagamento FROM alunos ORDER BY nome""")
-        for row in cur.fetchall():
-            status = "✔️ Pago" if row[-1] == "Pago" else "❌ Pendente"
-            self.tree.insert("", "end", iid=row[0], values=row[1:-1] + (status,))
-        conn.close()
+            values["date_from"] = br_to_iso(values["date_from"])
+            values["date_to"] = br_to_iso(values["date_to"])
+        except ValueError:
+            messagebox.showerror("Erro", "Data inválida. Use o formato DD/MM/AAAA.")
+            return
+        values["status"] = self.filter_status.get()
+        self.filters = {k: v for k, v in values.items() if v}
+        self.reload_source("filter_students")
+
+    def clear_filters(self):
+        self.filter_status.set("")
+        for ent in self.filter_entries.values():
+            ent.delete(0, "end")
+        self.filters = {}
+        self.reload_source("filter_students")
+
+    GENERATION_POLL_MS = 5000
+
+    def watch_generation(self):
+        """Recarrega a tabela (mantendo a posição) quando outra janela ou processo alterou os alunos."""
+        def done(current):
+            known = self.table.data_generation
+            if known is not None and current != known:
+                self.table.refresh()
+
+        self.worker.submit(services.generation, "students", on_done=done, key="students-generation")
+        self.root.after(self.GENERATION_POLL_MS, self.watch_generation)
+
+    MAINTENANCE_POLL_MS = 2000
+
+    def check_maintenance(self):
+        """Mostra os problemas achados pela manutenção em segundo plano iniciada em main.py."""
+        problems = maintenance.take_problems()
+        if problems:
+            messagebox.showwarning("Manutenção do banco", "\n".join(problems[:10]), parent=self.root)
+        self.root.after(self.MAINTENANCE_POLL_MS, self.check_maintenance)
+
+    SEARCH_DEBOUNCE_MS = 250
+
+    def schedule_search(self):
+        if not self.instant_search.get():
+            return
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(self.SEARCH_DEBOUNCE_MS, self.search_student)
 
     def search_student(self):
-        term = self.search_var.get().strip()
-        conn = db_connect()
-        cur = conn.cursor()
-        if term == "":
-            cur.execute("SELECT id, nome, professor, turma, payment_date, payment_method, assinatura, status_pagamento FROM alunos ORDER BY nome")
-        else:
-            like = f"%{term}%"
-            cur.execute("""SELECT id, nome, professor, turma, payment_date, payment_method, assinatura, status_pagamento
-                           FROM alunos WHERE nome LIKE ? OR professor LIKE ? OR turma LIKE ? ORDER BY nome""", (like, like, like))
-        rows = cur.fetchall()
-        conn.close()
-
-        self.tree.delete(*self.tree.get_children())
-        for row in rows:
-            status = row[-1]
-            status_display = "✔️ Pago" if status == "Pago" else "❌ Pendente"
-            self.tree.insert("", "end", iid=row[0], values=row[1:-1] + (status_display,))
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+            self._search_job = None
+        self.search_term = self.search_var.get()
+        self.reload_source("fuzzy_search" if self.fuzzy_search.get() and self.search_term.strip() else "search_student")
 
     def add_student(self):
-        vals = [self.entries[k].get().strip() for k in self.entries]
+        vals = self.read_form()
+        if vals is None:
+            return
         if not vals[0]:
             messagebox.showerror("Erro", "O campo Nome é obrigatório.")
             return
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO alunos (nome, professor, turma, payment_date, payment_method, assinatura, status_pagamento) VALUES (?,?,?,?,?,?,?)",
-                    (vals[0], vals[1], vals[2], vals[3], vals[4], vals[5], "Pendente"))
-        conn.commit()
-        conn.close()
-        self.load_students()
-        self.clear_inputs()
-        messagebox.showinfo("Sucesso", "Aluno cadastrado com sucesso.")
+
+        def done(change):
+            self.table.apply_change(change.generation, "insert", change.row)
+            self.clear_inputs()
+            messagebox.showinfo("Sucesso", "Aluno cadastrado com sucesso.")
+
+        self.worker.submit(services.add_student, *vals, on_done=done, on_error=self.show_db_error)
 
     def update_student(self):
         sel = self.tree.selection()
@@ -243,15 +376,15 @@ class AdminWindow:
             messagebox.showerror("Erro", "Selecione um registro.")
             return
         sid = int(sel[0])
-        vals = [self.entries[k].get().strip() for k in self.entries]
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("UPDATE alunos SET nome=?, professor=?, turma=?, payment_date=?, payment_method=?, assinatura=? WHERE id=?",
-                    (*vals, sid))
-        conn.commit()
-        conn.close()
-        self.load_students()
-        messagebox.showinfo("Sucesso", "Registro atualizado.")
+        vals = self.read_form()
+        if vals is None:
+            return
+
+        def done(change):
+            self.table.apply_change(change.generation, "update", change.row)
+            messagebox.showinfo("Sucesso", "Registro atualizado.")
+
+        self.worker.submit(services.update_student, sid, *vals, on_done=done, on_error=self.show_db_error)
 
     def delete_student(self):
         sel = self.tree.selection()
@@ -260,13 +393,21 @@ class AdminWindow:
             return
         sid = int(sel[0])
         if messagebox.askyesno("Confirmação", "Deseja deletar este registro?"):
-            conn = db_connect()
-            cur = conn.cursor()
-            cur.execute("DELETE FROM alunos WHERE id=?", (sid,))
-            conn.commit()
-            conn.close()
-            self.load_students()
-            messagebox.showinfo("Sucesso", "Registro deletado.")
+            def done(change):
+                self.table.apply_change(change.generation, "delete", row_id=sid)
+                messagebox.showinfo("Sucesso", "Registro deletado.")
+
+            self.worker.submit(services.delete_student, sid, on_done=done, on_error=self.show_db_error)
+
+    def read_form(self):
+        """Form values with the payment date converted to ISO; None if the date is invalid."""
+        vals = [self.entries[k].get().strip() for k in self.entries]
+        try:
+            vals[3] = br_to_iso(vals[3])
+        except ValueError:
+            messagebox.showerror("Erro", "Data inválida. Use o formato DD/MM/AAAA.")
+            return None
+        return vals
 
     def clear_inputs(self):
         for e in self.entries.values():
@@ -291,19 +432,58 @@ class AdminWindow:
             return
         sid = int(sel[0])
         name = self.tree.item(sel[0], "values")[0]
-        PaymentHistoryWindow(sid, name)
+        PaymentHistoryWindow(sid, name, worker=self.worker)
+
+    def import_csv(self, kind):
+        path = filedialog.askopenfilename(title=f"Importar {kind}", filetypes=[("CSV", "*.csv"), ("Todos", "*.*")])
+        if not path:
+            return
+        run = importer.import_students if kind == "alunos" else importer.import_payments
+
+        def done(report):
+            msg = report.summary()
+            if report.rejected:
+                rejects = path + ".rejeitados.csv"
+                importer.write_rejects(report, rejects)
+                msg += f"\n\nLinhas rejeitadas gravadas em:\n{rejects}"
+            self.table.refresh()
+            messagebox.showinfo("Importação", msg)
+
+        self.worker.submit(run, path, on_done=done, on_error=self.show_db_error, key="import")
+
+    def archive_year(self):
+        year = simpledialog.askinteger("Arquivar ano", "Ano encerrado a arquivar:", parent=self.root,
+                                       minvalue=1900, maxvalue=date.today().year - 1)
+        if year is None:
+            return
+        if not messagebox.askyesno("Confirmação", f"Mover os pagamentos de {year} para um arquivo somente leitura?\n"
+                                                  "Os alunos formados nesse ano também saem da lista."):
+            return
+
+        def done(result):
+            # graduated students left the table
+            self.table.refresh()
+            messagebox.showinfo("Arquivamento", result.summary())
+
+        self.worker.submit(archive.archive_year, year, on_done=done, key="archive",
+                           on_error=lambda exc: messagebox.showerror("Arquivamento", str(exc)))
+
+    def backup_now(self):
+        self.worker.submit(create_backup,
+                           on_done=lambda path: messagebox.showinfo("Backup", f"Backup salvo em:\n{path}"),
+                           on_error=self.show_db_error, key="backup")
 
     def validate_payment(self):
-        sel = self.tree.selection()
-        if not sel:
-            messagebox.showerror("Atenção", "Selecione um aluno.")
+        # linhas "carregando..." não são alunos
+        ids = [int(iid) for iid in self.tree.selection() if not iid.startswith("loading-")]
+        if not ids:
+            messagebox.showerror("Atenção", "Selecione um aluno.", parent=self.root)
             return
-        sid = int(sel[0])
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("UPDATE alunos SET status_pagamento='Pago' WHERE id=?", (sid,))
-        conn.commit()
-        conn.close()
-        self.load_students()
-        messagebox.showinfo("Sucesso", "Pagamento validado!")
+
+        def done(change):
+            self.table.apply_updates(change.generation, change.rows)
+            messagebox.showinfo("Sucesso", "Pagamento validado!" if len(ids) == 1
+                                else f"{len(change.rows)} pagamentos validados!", parent=self.root)
+
+        self.worker.submit(services.mark_students_paid, ids, on_done=done, on_error=self.show_db_error)
 
@@ -0,0 +1,459 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import secrets
+import sys
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+
+import diagnostics
+import services
+from database import init_db, close_connections, get_connection, data_generation
+from utils import br_to_iso, iso_to_br, validate_payment_fields
+
+DEFAULT_PORT = 8765
+READER_THREADS = 4
+SESSION_TTL = 8 * 3600
+MAX_BODY = 1 << 20
+PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+REASONS = {200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+           401: "Unauthorized", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method: str, target: str, headers: dict, body: bytes):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path.rstrip("/") or "/"
+        self.target = target
+        self.query = dict(parse_qsl(parts.query))
+        self.headers = headers
+        self.body = body
+        self.user = None
+
+    def json(self) -> dict:
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise ApiError(400, "JSON inválido.")
+        if not isinstance(data, dict):
+            raise ApiError(400, "O corpo deve ser um objeto JSON.")
+        return data
+
+    def int_arg(self, name: str, default: int, maximum: int | None = None) -> int:
+        value = self.query.get(name)
+        if value is None:
+            return default
+        if not value.isdigit():
+            raise ApiError(400, f"Parâmetro {name} inválido.")
+        return min(int(value), maximum) if maximum else int(value)
+
+
+# ---------------- Rotas ----------------
+# (método, padrão, função, escreve?, só admin?, tabelas que compõem o ETag)
+# No ETag, "hoje" entra com a data atual, para respostas que dependem dela.
+ROUTES: list[tuple[str, re.Pattern, object, bool, bool, tuple]] = []
+
+
+def route(method: str, pattern: str, write: bool = False, admin: bool = False, etag: tuple = ()):
+    def register(fn):
+        ROUTES.append((method, re.compile(f"^{pattern}$"), fn, write, admin, etag))
+        return fn
+    return register
+
+
+def _student(row) -> dict | None:
+    return dict(zip(services.STUDENT_COLUMNS, row)) if row else None
+
+
+def _payment(row) -> dict | None:
+    return dict(zip(services.PAYMENT_COLUMNS, row)) if row else None
+
+
+def _encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> list:
+    """[posição] ou [posição, id, valor da coluna de ordenação], como gerado por _encode_cursor."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ApiError(400, "Cursor inválido.")
+    if (not isinstance(values, list) or len(values) not in (1, 3)
+            or not isinstance(values[0], int) or isinstance(values[0], bool) or values[0] < 0
+            or not all(v is None or isinstance(v, (int, float, str)) for v in values[1:])):
+        raise ApiError(400, "Cursor inválido.")
+    return values
+
+
+_STUDENT_LABELS = {"name": "Nome", "professor": "Professor", "turma": "Turma", "payment_date": "Data de Pagamento",
+                   "payment_method": "Forma de Pagamento", "assinatura": "Assinatura"}
+
+
+def _student_fields(data: dict) -> tuple:
+    for key, label in _STUDENT_LABELS.items():
+        if not isinstance(data.get(key, ""), (str, type(None))):
+            raise ApiError(400, f"O campo {label} deve ser texto.")
+    name = (data.get("name") or "").strip()
+    if not name:
+        raise ApiError(400, "O campo Nome é obrigatório.")
+    try:
+        pdate = br_to_iso(data.get("payment_date") or "")
+    except ValueError:
+        raise ApiError(400, "Data inválida. Use o formato DD/MM/AAAA.")
+    return (name, data.get("professor", ""), data.get("turma", ""), pdate,
+            data.get("payment_method", ""), data.get("assinatura", ""))
+
+
+def _ids(data: dict) -> list[int]:
+    ids = data.get("ids")
+    if (not isinstance(ids, list) or not ids
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        raise ApiError(400, "Informe a lista de ids.")
+    return ids
+
+
+@route("GET", "/students", etag=("students",))
+def list_students(req: Request):
+    """Listagem/busca paginada; `cursor` vem do campo next da página anterior.
+
+    Com aproximada=1 a busca `q` tolera erros de digitação e cada item traz a
+    sua similaridade (de 0 a 1).
+    """
+    filters = {}
+    try:
+        for key, arg in (("status", "status"), ("turma", "turma"), ("professor", "professor")):
+            if req.query.get(arg):
+                filters[key] = req.query[arg]
+        for key, arg in (("date_from", "de"), ("date_to", "ate")):
+            if req.query.get(arg):
+                filters[key] = br_to_iso(req.query[arg])
+        source = services.student_source(req.query.get("q", ""), req.query.get("sort") or None,
+                                         req.query.get("desc") in ("1", "true"), filters,
+                                         fuzzy=req.query.get("aproximada") in ("1", "true"))
+    except ValueError as exc:
+        raise ApiError(400, str(exc))
+    limit = req.int_arg("limit", PAGE_LIMIT, MAX_PAGE_LIMIT) or PAGE_LIMIT
+    conn = get_connection()
+    offset, after = 0, None
+    if req.query.get("cursor"):
+        cursor = _decode_cursor(req.query["cursor"])
+        offset = cursor[0]
+        if isinstance(source, services.KeysetSource) and len(cursor) == 3:
+            after = [None] * len(source.columns)
+            after[0], after[source.columns.index(source.order_column)] = cursor[1], cursor[2]
+    rows = source.fetch(conn, offset, limit + 1, after)
+    body = {"items": [_student(r) for r in rows[:limit]], "next": None}
+    if isinstance(source, services.FuzzySource):
+        for item in body["items"]:
+            item["similaridade"] = source.scores.get(item["id"])
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        cursor = [offset + limit]
+        if isinstance(source, services.KeysetSource):
+            cursor += [last[0], last[source.columns.index(source.order_column)]]
+        body["next"] = _encode_cursor(cursor)
+    if offset == 0:
+        # o total só é contado na primeira página
+        body["total"] = source.count(conn)
+    return 200, body
+
+
+@route("GET", r"/students/(\d+)", etag=("students",))
+def get_student(req: Request, student_id: str):
+    row = services.get_student(int(student_id))
+    if row is None:
+        raise ApiError(404, "Aluno não encontrado.")
+    return 200, _student(row)
+
+
+@route("POST", "/students", write=True)
+def add_student(req: Request):
+    change = services.add_student(*_student_fields(req.json()))
+    return 201, _student(change.row)
+
+
+@route("PUT", r"/students/(\d+)", write=True)
+def update_student(req: Request, student_id: str):
+    change = services.update_student(int(student_id), *_student_fields(req.json()))
+    if change.row is None:
+        raise ApiError(404, "Aluno não encontrado.")
+    return 200, _student(change.row)
+
+
+@route("DELETE", r"/students/(\d+)", write=True)
+def delete_student(req: Request, student_id: str):
+    services.delete_student(int(student_id))
+    return 204, None
+
+
+@route("POST", r"/students/(\d+)/pay", write=True, admin=True)
+def mark_student_paid(req: Request, student_id: str):
+    change = services.mark_student_paid(int(student_id))
+    if change.row is None:
+        raise ApiError(404, "Aluno não encontrado.")
+    return 200, _student(change.row)
+
+
+@route("POST", "/students/pay", write=True, admin=True)
+def mark_students_paid(req: Request):
+    change = services.mark_students_paid(_ids(req.json()))
+    return 200, {"items": [_student(r) for r in change.rows]}
+
+
+@route("GET", "/diagnostics", admin=True)
+def diagnostics_snapshot(req: Request):
+    """Percentis de SQL e das rotas deste processo (mesmo formato do JSON do painel)."""
+    return 200, {"limite_lento_ms": diagnostics.SLOW_QUERY_MS, "metricas": diagnostics.snapshot()}
+
+
+@route("GET", "/overdue", admin=True, etag=("students", "hoje"))
+def overdue(req: Request):
+    return 200, {"items": [{"name": n, "payment_date": d} for n, d in services.overdue_students()]}
+
+
+@route("GET", r"/students/(\d+)/payments", admin=True, etag=("payments",))
+def payment_history(req: Request, student_id: str):
+    rows = services.payment_history(int(student_id))
+    if req.query.get("arquivados") in ("1", "true"):
+        # anos arquivados vêm depois, somente leitura
+        rows += services.archived_payment_history(int(student_id))
+    return 200, {"items": [_payment(r) for r in rows]}
+
+
+@route("POST", r"/students/(\d+)/payments", write=True, admin=True)
+def add_payment(req: Request, student_id: str):
+    data = req.json()
+    pdate = str(data.get("payment_date", ""))
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", pdate):
+        pdate = iso_to_br(pdate)
+    try:
+        fields = validate_payment_fields(data.get("month", ""), data.get("year", ""), pdate,
+                                         data.get("payment_method", ""), data.get("amount", ""))
+    except ValueError as exc:
+        raise ApiError(400, str(exc))
+    if services.get_student(int(student_id)) is None:
+        raise ApiError(404, "Aluno não encontrado.")
+    change = services.add_payment(int(student_id), *fields)
+    return 201, _payment(change.row)
+
+
+@route("POST", r"/payments/(\d+)/pay", write=True, admin=True)
+def mark_payment_paid(req: Request, payment_id: str):
+    change = services.mark_payment_paid(int(payment_id))
+    if change.row is None:
+        raise ApiError(404, "Pagamento não encontrado.")
+    return 200, _payment(change.row)
+
+
+@route("POST", "/payments/pay", write=True, admin=True)
+def mark_payments_paid(req: Request):
+    change = services.mark_payments_paid(_ids(req.json()))
+    return 200, {"items": [_payment(r) for r in change.rows]}
+
+
+def _etag(req: Request, tables: tuple) -> str:
+    """ETag derivado das gerações das tabelas lidas: muda a cada escrita, sem refazer a consulta."""
+    conn = get_connection()
+    generations = "-".join(date.today().isoformat() if t == "hoje" else str(data_generation(conn, t))
+                           for t in tables)
+    digest = hashlib.sha1(req.target.encode()).hexdigest()[:12]
+    return f'"{generations}-{digest}"'
+
+
+def _run(handler, req: Request, args: tuple, etag_tables: tuple):
+    """Executa a rota numa thread do pool; com ETag igual ao do cliente devolve 304 sem consultar."""
+    if etag_tables:
+        etag = _etag(req, etag_tables)
+        if etag in [t.strip() for t in req.headers.get("if-none-match", "").split(",")]:
+            return 304, None, etag
+        status, body = handler(req, *args)
+        return status, body, etag
+    status, body = handler(req, *args)
+    return status, body, None
+
+
+# ---------------- Servidor ----------------
+class ApiServer:
+    """Servidor HTTP/JSON assíncrono sobre services.
+
+    As rotas rodam num pool de threads, cada uma com a sua conexão persistente
+    (database.get_connection). As escritas de services passam pelo escritor
+    único de database, que agrupa as de vários balcões no mesmo COMMIT, então
+    eles nunca disputam o lock de escrita do SQLite entre si.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, readers: int = READER_THREADS):
+        self.host = host
+        self.port = port
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix="api-read")
+        self.sessions: dict[str, tuple[str, bool, float]] = {}
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._client, self.host, self.port)
+        return self.server
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.readers.shutdown(wait=True)
+
+    # ---- protocolo ----
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                if isinstance(request, ApiError):
+                    status, body, headers = request.status, {"erro": str(request)}, {}
+                    keep_alive = False
+                else:
+                    status, body, headers = await self.dispatch(request)
+                    keep_alive = request.headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, body, headers, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # linha maior que o limite do StreamReader
+            return ApiError(400, "Requisição inválida.")
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            return ApiError(400, "Requisição inválida.")
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                return ApiError(400, "Cabeçalho muito longo.")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get("content-length", "0").strip() or "0"
+        if not (length.isascii() and length.isdigit()):
+            return ApiError(400, "Content-Length inválido.")
+        length = int(length)
+        if length > MAX_BODY:
+            return ApiError(413, "Corpo muito grande.")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    def _write_response(self, writer, status: int, body, headers: dict, keep_alive: bool):
+        payload = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                 f"Content-Length: {len(payload)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if payload:
+            lines.append("Content-Type: application/json; charset=utf-8")
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+
+    # ---- roteamento ----
+    def _authenticate(self, req: Request):
+        auth = req.headers.get("authorization", "")
+        token = auth[7:] if auth.lower().startswith("bearer ") else ""
+        session = self.sessions.get(token)
+        if session is None or session[2] < time.monotonic():
+            self.sessions.pop(token, None)
+            raise ApiError(401, "Faça login.")
+        req.user = session
+
+    async def _login(self, req: Request):
+        data = req.json()
+        username, password = str(data.get("username", "")).strip(), str(data.get("password", "")).strip()
+        if not username or not password:
+            raise ApiError(400, "Preencha usuário e senha.")
+        loop = asyncio.get_running_loop()
+        ok, is_admin = await loop.run_in_executor(self.readers, services.authenticate, username, password)
+        if not ok:
+            raise ApiError(401, "Usuário ou senha incorretos.")
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = (username, is_admin, time.monotonic() + SESSION_TTL)
+        return 200, {"token": token, "username": username, "is_admin": is_admin}, {}
+
+    async def dispatch(self, req: Request):
+        try:
+            if req.path == "/login" and req.method == "POST":
+                return await self._login(req)
+            allowed = False
+            for method, pattern, handler, write, admin, etag in ROUTES:
+                match = pattern.match(req.path)
+                if not match:
+                    continue
+                allowed = True
+                if method != req.method:
+                    continue
+                self._authenticate(req)
+                if admin and not req.user[1]:
+                    raise ApiError(403, "Disponível apenas para administradores.")
+                loop = asyncio.get_running_loop()
+                with diagnostics.timed("api", f"{method} {pattern.pattern[1:-1]}"):
+                    status, body, tag = await loop.run_in_executor(self.readers, _run, handler, req, match.groups(), etag)
+                return status, body, ({"ETag": tag} if tag else {})
+            if allowed:
+                raise ApiError(405, "Método não permitido.")
+            raise ApiError(404, "Recurso não encontrado.")
+        except ApiError as exc:
+            return exc.status, {"erro": str(exc)}, {}
+        except Exception as exc:
+            return 500, {"erro": f"Falha ao acessar o banco de dados: {exc}"}, {}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON para vários balcões usarem o mesmo banco.")
+    parser.add_argument("--host", default="127.0.0.1", help="use 0.0.0.0 para aceitar conexões da rede local")
+    parser.add_argument("--porta", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--leitores", type=int, default=READER_THREADS, help="threads de leitura")
+    args = parser.parse_args(argv)
+
+    init_db()
+    server = ApiServer(args.host, args.porta, args.leitores)
+    print(f"API em http://{args.host}:{args.porta}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        close_connections()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
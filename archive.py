@@ -0,0 +1,349 @@
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+import database
+from database import (init_db, get_connection, transaction, serialized_write, data_generation, bump_generation,
+                      rebuild_payment_summary)
+
+ARCHIVE_DIRNAME = "arquivo"
+FETCH_SIZE = 5000
+MAX_ATTACHED = 8            # o SQLite aceita 10 bancos anexados por conexão
+ATTEMPTS = 3                # o arquivamento é refeito se os dados mudarem no meio
+
+# attach() e cleanup_files() mexem nos arquivos sob esta trava; os que um
+# arquivamento ainda está gravando (não registrados até o _commit) ficam em
+# _in_progress para a limpeza não apagá-los
+_files_lock = threading.Lock()
+_in_progress: set[str] = set()
+
+# Mesmas colunas das tabelas do banco principal, para que rebuild_payment_summary
+# e as consultas de relatório/exportação rodem iguais sobre um arquivo anexado.
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    student_id INTEGER,
+    month INTEGER,
+    year INTEGER,
+    payment_date TEXT,
+    payment_method TEXT,
+    amount REAL,
+    status_pagamento TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_payments_student ON payments(student_id, year, month);
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    professor TEXT,
+    turma TEXT,
+    payment_date TEXT,
+    payment_method TEXT,
+    assinatura TEXT,
+    status_pagamento TEXT,
+    graduated INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS payment_summary (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    turma TEXT NOT NULL,
+    status_pagamento TEXT NOT NULL,
+    total REAL NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, month, turma, status_pagamento)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS payment_summary_professor (
+    year INTEGER NOT NULL,
+    professor TEXT NOT NULL,
+    status_pagamento TEXT NOT NULL,
+    total REAL NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, professor, status_pagamento)
+) WITHOUT ROWID;
+"""
+
+_PAYMENT_COLUMNS = "id, student_id, month, year, payment_date, payment_method, amount, status_pagamento"
+_STUDENT_COLUMNS = "id, name, professor, turma, payment_date, payment_method, assinatura, status_pagamento"
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class ArchiveResult:
+    def __init__(self, year: int):
+        self.year = year
+        self.filename = ""
+        self.payments = 0
+        self.students = 0
+        self.elapsed = 0.0
+
+    def summary(self) -> str:
+        return (f"{self.payments} pagamentos de {self.year} arquivados em {self.filename} "
+                f"({self.students} alunos formados removidos) em {self.elapsed:.2f}s")
+
+
+def archive_dir() -> str:
+    """Pasta dos arquivos anuais, ao lado do banco em uso."""
+    return os.path.join(os.path.dirname(database.DB_PATH), ARCHIVE_DIRNAME)
+
+
+# ---------------- Leitura (ATTACH sob demanda) ----------------
+def archived_years(conn, date_from: str | None = None, date_to: str | None = None,
+                   year: int | None = None) -> list[tuple[int, str]]:
+    """(ano, arquivo) dos anos arquivados que podem ter pagamentos no intervalo ISO informado."""
+    conds, params = [], []
+    if year is not None:
+        conds.append("year = ?")
+        params.append(year)
+    if date_from:
+        conds.append("(max_date IS NULL OR max_date >= ?)")
+        params.append(date_from)
+    if date_to:
+        conds.append("(min_date IS NULL OR min_date <= ?)")
+        params.append(date_to)
+    where = (" WHERE " + " AND ".join(conds)) if conds else ""
+    return conn.execute(f"SELECT year, filename FROM archived_years{where} ORDER BY year", params).fetchall()
+
+
+def _schema_name(filename: str) -> str:
+    return "arq_" + re.sub(r"\W", "_", os.path.splitext(filename)[0])
+
+
+def attach(conn, year: int, filename: str) -> str:
+    """Anexa o arquivo do ano à conexão (se ainda não estiver) e devolve o nome do schema.
+
+    Cada versão do arquivo tem o seu nome de schema; versões antigas do mesmo
+    ano e, acima de MAX_ATTACHED, os anexos mais antigos são desanexados.
+    """
+    schema = _schema_name(filename)
+    attached = [row[1] for row in conn.execute("PRAGMA database_list") if row[1].startswith("arq_")]
+    if schema in attached:
+        return schema
+    path = os.path.join(archive_dir(), filename)
+    stale = [name for name in attached if name.startswith(f"arq_pagamentos_{year}_")]
+    others = [name for name in attached if name not in stale]
+    stale += others[:max(0, len(others) - MAX_ATTACHED + 1)]
+    for name in stale:
+        try:
+            conn.execute(f"DETACH DATABASE {name}")
+        except sqlite3.OperationalError:
+            pass    # ainda em uso por um cursor aberto; sai na próxima vez
+    with _files_lock:
+        if not os.path.exists(path):
+            # o ATTACH criaria um banco vazio no lugar
+            raise ArchiveError(f"Arquivo de {year} não encontrado: {path}")
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    return schema
+
+
+def schemas(conn, date_from: str | None = None, date_to: str | None = None, year: int | None = None):
+    """Gera os schemas anexados dos anos arquivados que interessam ao intervalo, do mais antigo ao mais novo.
+
+    Os anexos acontecem à medida que o gerador avança: use cada schema antes
+    de pedir o próximo.
+    """
+    for archived_year, filename in archived_years(conn, date_from, date_to, year):
+        yield attach(conn, archived_year, filename)
+
+
+# ---------------- Arquivamento ----------------
+def _next_filename(conn, year: int) -> tuple[str, str | None]:
+    row = conn.execute("SELECT filename FROM archived_years WHERE year = ?", (year,)).fetchone()
+    previous = row[0] if row else None
+    version = int(re.search(r"_v(\d+)\.db$", previous).group(1)) + 1 if previous else 1
+    return f"pagamentos_{year}_v{version}.db", previous
+
+
+def _graduated(conn, year: int) -> list[int]:
+    """Alunos sem pendência cujos pagamentos estão todos no ano arquivado e sem vencimento depois dele."""
+    return [row[0] for row in conn.execute("""
+        SELECT s.id FROM students s
+        WHERE s.status_pagamento = 'Pago'
+          AND (s.payment_date IS NULL OR s.payment_date < ?)
+          AND EXISTS (SELECT 1 FROM payments p WHERE p.student_id = s.id AND p.year = ?)
+          AND NOT EXISTS (SELECT 1 FROM payments p WHERE p.student_id = s.id AND p.year IS NOT ?)""",
+        (f"{year + 1}-01-01", year, year))]
+
+
+def _write_archive(conn, path: str, previous: str | None, year: int, graduated: list[int]) -> tuple:
+    """Grava o arquivo do ano (copiando a versão anterior, se houver) e devolve (pagamentos, total, min, max)."""
+    part = path + ".part"
+    if os.path.exists(part):
+        os.remove(part)
+    if previous:
+        shutil.copyfile(os.path.join(os.path.dirname(path), previous), part)
+    arq = sqlite3.connect(part, isolation_level=None)
+    try:
+        # o resumo é sempre recalculado; o da versão anterior pode ter a chave antiga (com professor)
+        arq.execute("DROP TABLE IF EXISTS payment_summary")
+        arq.executescript(ARCHIVE_SCHEMA)
+        arq.execute("BEGIN")
+        cur = conn.execute(f"SELECT {_PAYMENT_COLUMNS} FROM payments WHERE year = ? ORDER BY id", (year,))
+        while rows := cur.fetchmany(FETCH_SIZE):
+            arq.executemany(f"INSERT OR REPLACE INTO payments ({_PAYMENT_COLUMNS}) VALUES (?,?,?,?,?,?,?,?)", rows)
+        # retrato dos alunos na data do arquivamento: nome, turma e professor dos relatórios antigos
+        cur = conn.execute(f"SELECT {_STUDENT_COLUMNS} FROM students WHERE id IN "
+                           f"(SELECT student_id FROM payments WHERE year = ?)", (year,))
+        grads = set(graduated)
+        while rows := cur.fetchmany(FETCH_SIZE):
+            arq.executemany(f"INSERT OR REPLACE INTO students ({_STUDENT_COLUMNS}, graduated) VALUES (?,?,?,?,?,?,?,?,?)",
+                            [row + (int(row[0] in grads),) for row in rows])
+        rebuild_payment_summary(arq)
+        arq.execute("COMMIT")
+        stats = arq.execute("SELECT COUNT(*), COALESCE(SUM(amount), 0), MIN(payment_date), MAX(payment_date) "
+                            "FROM payments").fetchone()
+        arq.execute("VACUUM")
+    finally:
+        arq.close()
+    os.replace(part, path)
+    os.chmod(path, 0o444)
+    return stats
+
+
+@serialized_write
+def _commit(year: int, generations: tuple, graduated: list[int], filename: str, stats: tuple) -> bool:
+    """Remove do banco principal o que foi arquivado; False se os dados mudaram desde a leitura."""
+    with transaction() as conn:
+        current = (data_generation(conn, "payments"), data_generation(conn, "students"))
+        if current[0] != generations[0] or (graduated and current[1] != generations[1]):
+            return False
+        conn.execute("DELETE FROM payments WHERE year = ?", (year,))
+        for i in range(0, len(graduated), 500):
+            chunk = graduated[i:i + 500]
+            conn.execute(f"DELETE FROM students WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        payments, total, min_date, max_date = stats
+        conn.execute("""
+            INSERT INTO archived_years (year, filename, payments, students, total, min_date, max_date, archived_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(year) DO UPDATE SET filename = excluded.filename, payments = excluded.payments,
+                students = students + excluded.students, total = excluded.total, min_date = excluded.min_date,
+                max_date = excluded.max_date, archived_at = excluded.archived_at""",
+            (year, filename, payments, len(graduated), total, min_date, max_date,
+             datetime.now().isoformat(timespec="seconds")))
+        bump_generation(conn, "payments")
+        if graduated:
+            bump_generation(conn, "students")
+    return True
+
+
+def archive_year(year: int, include_pending: bool = False, graduates: bool = True) -> ArchiveResult:
+    """Move os pagamentos de um ano encerrado (e os alunos formados) para um arquivo somente leitura.
+
+    O arquivo é montado a partir de um retrato consistente do banco (uma
+    transação de leitura) e só então os registros saem do banco principal,
+    numa escrita do escritor único. Se outra escrita mexer nos dados no meio,
+    o arquivo é descartado e o processo recomeça.
+    """
+    if year >= date.today().year:
+        raise ArchiveError(f"O ano {year} ainda não foi encerrado.")
+    result = ArchiveResult(year)
+    start = time.perf_counter()
+    os.makedirs(archive_dir(), exist_ok=True)
+    for _ in range(ATTEMPTS):
+        with transaction(immediate=False) as conn:
+            generations = (data_generation(conn, "payments"), data_generation(conn, "students"))
+            count, pending = conn.execute("SELECT COUNT(*), COALESCE(SUM(status_pagamento = 'Pendente'), 0) "
+                                          "FROM payments WHERE year = ?", (year,)).fetchone()
+            if not count:
+                raise ArchiveError(f"Não há pagamentos de {year} no banco principal.")
+            if pending and not include_pending:
+                raise ArchiveError(f"{pending} pagamentos de {year} ainda estão pendentes.")
+            graduated = _graduated(conn, year) if graduates else []
+            filename, previous = _next_filename(conn, year)
+            path = os.path.join(archive_dir(), filename)
+            with _files_lock:
+                _in_progress.add(filename)
+            try:
+                stats = _write_archive(conn, path, previous, year, graduated)
+            except BaseException:
+                _finish(filename, path)
+                raise
+        try:
+            committed = _commit(year, generations, graduated, filename, stats)
+        except BaseException:
+            _finish(filename, path)
+            raise
+        if committed:
+            with _files_lock:
+                _in_progress.discard(filename)
+            if previous:
+                # em uso por outra conexão (Windows) fica para a próxima limpeza
+                _remove(os.path.join(archive_dir(), previous))
+            result.filename, result.payments, result.students = filename, count, len(graduated)
+            result.elapsed = time.perf_counter() - start
+            return result
+        _finish(filename, path)
+    raise ArchiveError("Os dados mudaram durante o arquivamento. Tente novamente.")
+
+
+def cleanup_files(conn=None) -> list[str]:
+    """Apaga sobras de arquivamentos (.part e versões não registradas em archived_years).
+
+    Pula os arquivos que um arquivamento ainda está gravando e os anexados à conexão.
+    """
+    folder = archive_dir()
+    if not os.path.isdir(folder):
+        return []
+    conn = conn or get_connection()
+    removed = []
+    with _files_lock:
+        keep = {row[0] for row in conn.execute("SELECT filename FROM archived_years")} | _in_progress
+        keep |= {os.path.basename(row[2]) for row in conn.execute("PRAGMA database_list") if row[2]}
+        for name in os.listdir(folder):
+            if name.removesuffix(".part") in keep:
+                continue
+            if name.endswith(".part") or re.fullmatch(r"pagamentos_\d+_v\d+\.db", name):
+                path = os.path.join(folder, name)
+                _remove(path)
+                if not os.path.exists(path):
+                    removed.append(name)
+    return removed
+
+
+def _finish(filename: str, path: str):
+    """Descarta o arquivo de uma tentativa que não foi registrada."""
+    with _files_lock:
+        _in_progress.discard(filename)
+        _remove(path)
+
+
+def _remove(path: str):
+    try:
+        os.chmod(path, 0o644)
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Arquiva anos encerrados em arquivos SQLite somente leitura.")
+    parser.add_argument("acao", choices=["arquivar", "listar"])
+    parser.add_argument("ano", type=int, nargs="?")
+    parser.add_argument("--com-pendentes", action="store_true", help="arquiva mesmo com pagamentos pendentes")
+    parser.add_argument("--manter-alunos", action="store_true", help="não remove os alunos formados")
+    args = parser.parse_args(argv)
+
+    init_db()
+    if args.acao == "listar":
+        for row in get_connection().execute("SELECT year, filename, payments, students, total, archived_at "
+                                            "FROM archived_years ORDER BY year"):
+            print(f"{row[0]}  {row[1]:<26} {row[2]:>8} pagamentos  {row[3]:>6} alunos  R$ {row[4]:>12.2f}  {row[5]}")
+        return 0
+    if args.ano is None:
+        parser.error("informe o ano a arquivar")
+    try:
+        print(archive_year(args.ano, args.com_pendentes, not args.manter_alunos).summary())
+    except ArchiveError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import os
+import tkinter as tk
+
+from utils import get_art_path
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "cache", "assets")
+
+
+def scaled_asset(filename: str, size: tuple[int, int]) -> str | None:
+    """Caminho de uma cópia de `filename` já redimensionada para `size`.
+
+    A cópia fica em CACHE_DIR com o mtime do original no nome; só é gerada
+    (com PIL) quando o original muda. Devolve None se o original não existir.
+    """
+    source = get_art_path(filename)
+    try:
+        mtime = os.stat(source).st_mtime_ns
+    except OSError:
+        return None
+    stem, ext = os.path.splitext(filename)
+    prefix = f"{stem}_{size[0]}x{size[1]}_"
+    target = os.path.join(CACHE_DIR, f"{prefix}{mtime}{ext}")
+    if os.path.exists(target):
+        return target
+
+    from PIL import Image  # só é importado quando a cópia precisa ser refeita
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    partial = target + ".part"
+    with Image.open(source) as img:
+        img.resize(size, Image.LANCZOS).save(partial, format=img.format or "PNG")
+    os.replace(partial, target)
+    # remove as cópias geradas a partir de versões anteriores do original
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith(prefix) and name != os.path.basename(target):
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError:
+                pass
+    return target
+
+
+def load_image(filename: str, size: tuple[int, int], master=None):
+    """PhotoImage de `filename` em `size`, ou None se não houver imagem.
+
+    O PNG em cache é lido direto pelo Tk; PIL só entra em cena para gerar
+    a cópia ou se o Tk não souber ler o formato.
+    """
+    try:
+        path = scaled_asset(filename, size)
+    except Exception:
+        return None
+    if path is None:
+        return None
+    try:
+        return tk.PhotoImage(file=path, master=master)
+    except tk.TclError:
+        try:
+            from PIL import Image, ImageTk
+            return ImageTk.PhotoImage(Image.open(path), master=master)
+        except Exception:
+            return None
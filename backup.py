@@ -0,0 +1,176 @@
+import os
+import sys
+import sqlite3
+import threading
+from datetime import datetime
+
+import database
+
+BACKUP_DIR = os.path.join(database.BASE_DIR, "backups")
+RETENTION = 10                 # quantos snapshots manter
+PAGES_PER_STEP = 256           # páginas copiadas por passo da API de backup
+STEP_SLEEP = 0.005             # pausa entre passos, libera o banco para escritores
+SCHEDULE_INTERVAL = 6 * 60 * 60
+
+
+def _snapshot_name() -> str:
+    return f"database-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db"
+
+
+def list_backups(dest_dir: str = BACKUP_DIR) -> list[str]:
+    """Snapshots existentes, do mais novo para o mais antigo."""
+    if not os.path.isdir(dest_dir):
+        return []
+    names = [n for n in os.listdir(dest_dir) if n.startswith("database-") and n.endswith(".db")]
+    return [os.path.join(dest_dir, n) for n in sorted(names, reverse=True)]
+
+
+def rotate_backups(dest_dir: str = BACKUP_DIR, keep: int = RETENTION) -> list[str]:
+    removed = []
+    for path in list_backups(dest_dir)[keep:]:
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError:
+            pass
+    return removed
+
+
+def verify_backup(path: str) -> bool:
+    """Confere a integridade do arquivo e se ele contém as tabelas do sistema."""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            if conn.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+                return False
+            tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            return {"users", "students", "payments"} <= tables
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+
+
+def create_backup(dest_dir: str = BACKUP_DIR, keep: int = RETENTION, pages: int = PAGES_PER_STEP,
+                  progress=None) -> str:
+    """Copia o banco com a API de backup online do SQLite, em passos de `pages` páginas.
+
+    Entre um passo e outro o banco fica livre para escrita; se houver escrita
+    durante a cópia o SQLite reinicia os passos e o snapshot final continua
+    consistente. `progress(remaining, total)` é chamado a cada passo.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    path = os.path.join(dest_dir, _snapshot_name())
+    partial = path + ".part"
+
+    src = sqlite3.connect(database.DB_PATH, timeout=database.BUSY_TIMEOUT)
+    dst = sqlite3.connect(partial)
+    try:
+        src.backup(dst, pages=pages, sleep=STEP_SLEEP,
+                   progress=(lambda status, remaining, total: progress(remaining, total)) if progress else None)
+    finally:
+        dst.close()
+        src.close()
+
+    if not verify_backup(partial):
+        os.remove(partial)
+        raise RuntimeError(f"backup corrompido, descartado: {path}")
+    os.replace(partial, path)
+    rotate_backups(dest_dir, keep)
+    return path
+
+
+def _generations(conn: sqlite3.Connection) -> dict[str, int]:
+    try:
+        return dict(conn.execute("SELECT name, value FROM data_generation").fetchall())
+    except sqlite3.OperationalError:   # banco novo ou anterior à migração 8
+        return {}
+
+
+def restore_backup(path: str, target: str | None = None) -> None:
+    """Restaura um snapshot sobre o banco, verificando o arquivo antes e depois."""
+    target = target or database.DB_PATH
+    if not verify_backup(path):
+        raise RuntimeError(f"backup inválido: {path}")
+
+    database.close_connections()
+    src = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    dst = sqlite3.connect(target, timeout=database.BUSY_TIMEOUT)
+    try:
+        before = _generations(dst)
+        src.backup(dst, pages=PAGES_PER_STEP)
+        # as gerações nunca voltam atrás: caches de outras instâncias abertas
+        # não podem confundir o banco restaurado com o que tinham guardado
+        restored = _generations(dst)
+        with dst:
+            for name, value in before.items():
+                if name in restored:
+                    dst.execute("UPDATE data_generation SET value = MAX(value, ?) + 1 WHERE name = ?", (value, name))
+    finally:
+        dst.close()
+        src.close()
+
+    if not verify_backup(target):
+        raise RuntimeError("o banco restaurado não passou na verificação de integridade")
+
+
+class BackupScheduler(threading.Thread):
+    """Thread de fundo que faz um snapshot a cada `interval` segundos ou sob demanda."""
+
+    def __init__(self, interval: float = SCHEDULE_INTERVAL, initial_delay: float = 0.0,
+                 dest_dir: str = BACKUP_DIR, keep: int = RETENTION, on_error=None):
+        super().__init__(name="backup-scheduler", daemon=True)
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.dest_dir = dest_dir
+        self.keep = keep
+        self.on_error = on_error
+        self.last_backup: str | None = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def run_now(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def run(self):
+        delay = self.initial_delay
+        while not self._stopping.is_set():
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                self.last_backup = create_backup(self.dest_dir, self.keep)
+            except Exception as exc:
+                if self.on_error:
+                    self.on_error(exc)
+            delay = self.interval
+
+
+def main(argv: list[str]) -> int:
+    usage = "uso: python backup.py [create | list | verify ARQUIVO | restore ARQUIVO]"
+    cmd = argv[0] if argv else "create"
+    if cmd == "create":
+        print(create_backup())
+    elif cmd == "list":
+        for path in list_backups():
+            print(path)
+    elif cmd == "verify" and len(argv) == 2:
+        ok = verify_backup(argv[1])
+        print("ok" if ok else "falhou")
+        return 0 if ok else 1
+    elif cmd == "restore" and len(argv) == 2:
+        restore_backup(argv[1])
+        print("restaurado")
+    else:
+        print(usage)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,205 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import database
+import exporter
+import importer
+import overdue
+import reports
+import services
+import synthetic_data
+
+DEFAULT_DB = os.path.join(database.BASE_DIR, "benchmark.db")
+SEARCH_TERMS = ["silva", "joao", "mar", "3ºB", "conceicao"]
+FUZZY_TERMS = ["Marcus Silva", "Leticia Olivera", "Fernada Souza", "Gabrel Ribeiro", "Joao Perreira"]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def _stats(samples: list[float]) -> dict:
+    ms = [s * 1000 for s in samples]
+    return {
+        "runs": len(ms),
+        "min_ms": round(min(ms), 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(_percentile(ms, 95), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+class Bench:
+    def __init__(self, repeat: int, seed: int = 7):
+        self.repeat = repeat
+        self.rng = random.Random(seed)
+        self.results: dict[str, dict] = {}
+
+    def time(self, name: str, fn, repeat: int | None = None):
+        samples = []
+        for _ in range(repeat or self.repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        self.results[name] = _stats(samples)
+        print(f"{name:<28} mediana {self.results[name]['median_ms']:>10.3f} ms   p95 {self.results[name]['p95_ms']:>10.3f} ms")
+
+
+def run(repeat: int) -> dict:
+    conn = database.get_connection()
+    n_students = conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+    n_payments = conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+    if n_students == 0:
+        raise SystemExit("banco vazio: gere dados com --gerar")
+    max_id = conn.execute("SELECT MAX(id) FROM students").fetchone()[0]
+    b = Bench(repeat)
+
+    # leitura (mesmas funções usadas pelas janelas), sem o cache de leituras
+    cache = database.get_query_cache()
+    entries, cache.entries = cache.entries, 0
+    b.time("load_students", lambda: services.list_students(""))
+    source = services.student_source("")
+    middle = n_students // 2
+    b.time("scroll_offset_page", lambda: source.fetch(conn, middle, services.PAGE_SIZE))
+    anchor = source.fetch(conn, middle, services.PAGE_SIZE)[-1]
+    b.time("scroll_keyset_page", lambda: source.fetch(conn, middle + services.PAGE_SIZE, services.PAGE_SIZE, anchor))
+    terms = iter(SEARCH_TERMS * repeat)
+    b.time("search_student", lambda: services.list_students(next(terms)))
+    fuzzy = iter(FUZZY_TERMS * repeat)
+    b.time("fuzzy_search", lambda: services.student_source(next(fuzzy), fuzzy=True).fetch(conn, 0, services.PAGE_SIZE))
+    b.time("load_history", lambda: services.payment_history(b.rng.randint(1, max_id)))
+    b.time("overdue_check", services.overdue_students)
+    # varredura completa (scanner novo a cada vez, sem o atalho da geração)
+    b.time("overdue_scan", lambda: overdue.OverdueScanner().scan(conn))
+    b.time("report_by_month", lambda: reports.summary("mes"))
+    b.time("ledger_page", lambda: services.ledger_page({"status": "Pago"}))
+
+    # as mesmas telas reabertas, servidas pelo cache
+    cache.entries = entries
+    services.list_students("")
+    b.time("load_students_cached", lambda: services.list_students(""))
+    student = b.rng.randint(1, max_id)
+    services.payment_history(student)
+    b.time("load_history_cached", lambda: services.payment_history(student))
+    reports.summary("mes")
+    b.time("report_by_month_cached", lambda: reports.summary("mes"))
+
+    # CRUD
+    created = []
+    b.time("add_student", lambda: created.append(services.add_student("Aluno Benchmark", "Prof", "1ºA", "2024-01-10", "Pix", "").row[0]))
+    b.time("update_student", lambda: services.update_student(created[0], "Aluno Benchmark 2", "Prof", "1ºB", "2024-01-10", "Pix", ""))
+    b.time("mark_student_paid", lambda: services.mark_student_paid(created[0]))
+    pays = []
+    b.time("add_payment", lambda: pays.append(services.add_payment(created[0], 1, 2024, "2024-01-10", "Pix", 100.0).row[0]))
+    b.time("mark_payment_paid", lambda: services.mark_payment_paid(pays[0]))
+    pending = iter(created)
+    b.time("delete_student", lambda: services.delete_student(next(pending)), repeat=len(created))
+
+    # operações em lote
+    last_payment = conn.execute("SELECT COALESCE(MAX(id), 0) FROM payments").fetchone()[0]
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "pagamentos.csv")
+        rows = 10_000
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["student_id", "mes", "ano", "data", "forma", "valor"])
+            for _ in range(rows):
+                writer.writerow([b.rng.randint(1, max_id), b.rng.randint(1, 12), 2024, "10/01/2024", "Pix", "120,00"])
+        report = None
+
+        def bulk_import():
+            nonlocal report
+            report = importer.import_payments(csv_path)
+
+        b.time("bulk_import_10k", bulk_import, repeat=1)
+        b.results["bulk_import_10k"]["rows_per_s"] = round(report.rows_per_second)
+        out = os.path.join(tmp, "export.jsonl.gz")
+        exported = []
+        b.time("bulk_export_payments", lambda: exported.append(exporter.export_payments(out, "jsonl", True)), repeat=1)
+        b.results["bulk_export_payments"]["rows"] = exported[0]
+    with database.transaction() as c:
+        # desfaz a importação para que execuções repetidas meçam o mesmo banco
+        c.execute("DELETE FROM payments WHERE id > ?", (last_payment,))
+        database.bump_generation(c, "payments")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "students": n_students,
+            "payments": n_payments,
+            "repeat": repeat,
+        },
+        "results": b.results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Operações cuja mediana piorou mais que `tolerance` (fração) em relação à base."""
+    regressions = []
+    for name, stats in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        before, after = old["median_ms"], stats["median_ms"]
+        # ignora variações abaixo de 1 ms, que são ruído de medição
+        if after > before * (1 + tolerance) and after - before > 1.0:
+            regressions.append(f"{name}: {before:.3f} ms -> {after:.3f} ms (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mede as operações do sistema sobre um banco sintético.")
+    parser.add_argument("--banco", default=DEFAULT_DB)
+    parser.add_argument("--gerar", action="store_true", help="(re)gera os dados sintéticos antes de medir")
+    parser.add_argument("--alunos", type=int, default=100_000)
+    parser.add_argument("--pagamentos", type=int, default=2_000_000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo (use-o depois como --baseline)")
+    parser.add_argument("--baseline", help="resultado anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    if args.gerar:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.banco + suffix):
+                os.remove(args.banco + suffix)
+    database.use_database(args.banco)
+    database.init_db()
+    if args.gerar:
+        start = time.perf_counter()
+        synthetic_data.generate(args.alunos, args.pagamentos,
+                                progress=lambda label, n, total: print(f"\r{label}: {n}/{total}", end="", file=sys.stderr))
+        print(f"\ndados gerados em {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    result = run(args.repeticoes)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"resultados gravados em {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerancia)
+        for line in regressions:
+            print("REGRESSÃO", line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
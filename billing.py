@@ -0,0 +1,186 @@
+import argparse
+import calendar
+import sys
+import time
+import tkinter as tk
+from datetime import date
+from tkinter import ttk, messagebox
+
+from database import init_db, get_connection, transaction, serialized_write, bump_generation
+from utils import parse_month
+
+
+class BillingResult:
+    def __init__(self, year: int, month: int):
+        self.year = year
+        self.month = month
+        self.created = 0
+        self.skipped = 0
+        self.generation = None
+        self.elapsed = 0.0
+
+    def summary(self) -> str:
+        return (f"{self.created} cobranças geradas para {self.month:02d}/{self.year}, "
+                f"{self.skipped} alunos já cobrados em {self.elapsed:.2f}s")
+
+
+def due_date(year: int, month: int, day: int) -> str:
+    """Vencimento ISO no dia `day` do mês (o último dia, em meses mais curtos)."""
+    return date(year, month, min(day, calendar.monthrange(year, month)[1])).isoformat()
+
+
+def _scope(turma):
+    return ("WHERE s.turma = ?", (turma,)) if turma else ("", ())
+
+
+def preview(year: int, month: int, turma: str | None = None) -> tuple[int, int]:
+    """(alunos a cobrar, alunos que já têm pagamento no mês)."""
+    where, params = _scope(turma)
+    row = get_connection().execute(f"""
+        SELECT COUNT(*),
+               SUM(EXISTS (SELECT 1 FROM payments p WHERE p.student_id = s.id AND p.year = ? AND p.month = ?))
+        FROM students s {where}""", (year, month) + params).fetchone()
+    billed = row[1] or 0
+    return row[0] - billed, billed
+
+
+@serialized_write
+def run_billing(year: int, month: int, amount: float, day: int = 10, turma: str | None = None) -> BillingResult:
+    """Gera o pagamento pendente do mês para cada aluno (ou os da turma) numa única transação.
+
+    Alunos que já têm um pagamento em (ano, mês) são ignorados, então a mesma
+    cobrança pode ser rodada de novo sem duplicar nada.
+    """
+    result = BillingResult(year, month)
+    start = time.perf_counter()
+    where, params = _scope(turma)
+    with transaction() as conn:
+        if conn.execute("SELECT 1 FROM archived_years WHERE year = ?", (year,)).fetchone():
+            # os pagamentos já arquivados não entrariam no NOT EXISTS abaixo
+            raise ValueError(f"O ano {year} foi arquivado; não é possível gerar cobranças para ele.")
+        total = conn.execute(f"SELECT COUNT(*) FROM students s {where}", params).fetchone()[0]
+        # idx_payments_student (student_id, year, month) responde o NOT EXISTS
+        cur = conn.execute(f"""
+            INSERT INTO payments (student_id, month, year, payment_date, payment_method, amount, status_pagamento)
+            SELECT s.id, ?, ?, ?, '', ?, 'Pendente' FROM students s {where}
+            {'AND' if where else 'WHERE'} NOT EXISTS (
+                SELECT 1 FROM payments p WHERE p.student_id = s.id AND p.year = ? AND p.month = ?)
+            ORDER BY s.id""", (month, year, due_date(year, month, day), amount) + params + (year, month))
+        result.created = cur.rowcount
+        result.skipped = total - result.created
+        result.generation = bump_generation(conn, "payments")
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+class BillingWindow:
+    """Janela da cobrança mensal: mostra quantos alunos serão cobrados e gera os pagamentos."""
+
+    def __init__(self, worker, on_done=None):
+        self.worker = worker
+        self.on_done = on_done
+        self.root = tk.Toplevel()
+        self.root.title("Gerar cobranças do mês")
+        self.root.resizable(False, False)
+
+        form = ttk.Frame(self.root, padding=12)
+        form.pack(fill="both", expand=True)
+        today = date.today()
+        self.entries = {}
+        for i, (key, label, default) in enumerate([("month", "Mês", f"{today.month:02d}"),
+                                                   ("year", "Ano", str(today.year)),
+                                                   ("amount", "Valor", ""),
+                                                   ("day", "Dia do vencimento", "10"),
+                                                   ("turma", "Turma (vazio = todas)", "")]):
+            ttk.Label(form, text=label).grid(row=i, column=0, sticky="w", pady=3)
+            ent = ttk.Entry(form, width=18)
+            ent.insert(0, default)
+            ent.grid(row=i, column=1, sticky="w")
+            self.entries[key] = ent
+
+        self.info = ttk.Label(form, text="")
+        self.info.grid(row=5, column=0, columnspan=2, sticky="w", pady=(8, 0))
+
+        btns = ttk.Frame(form)
+        btns.grid(row=6, column=0, columnspan=2, pady=(10, 0))
+        ttk.Button(btns, text="Verificar", command=self.check).grid(row=0, column=0, padx=6)
+        self.run_btn = ttk.Button(btns, text="Gerar", command=self.run)
+        self.run_btn.grid(row=0, column=1, padx=6)
+        ttk.Button(btns, text="Fechar", command=self.root.destroy).grid(row=0, column=2, padx=6)
+
+    def read_form(self):
+        try:
+            month = parse_month(self.entries["month"].get())
+        except ValueError:
+            raise ValueError("Mês inválido.")
+        year = self.entries["year"].get().strip()
+        if not year.isdigit() or not 1900 <= int(year) <= 2100:
+            raise ValueError("Ano inválido.")
+        try:
+            amount = float(self.entries["amount"].get().strip().replace(",", "."))
+        except ValueError:
+            raise ValueError("Valor inválido.")
+        day = self.entries["day"].get().strip()
+        if not day.isdigit() or not 1 <= int(day) <= 31:
+            raise ValueError("Dia de vencimento inválido.")
+        return int(year), month, amount, int(day), self.entries["turma"].get().strip() or None
+
+    def check(self):
+        try:
+            year, month, _, _, turma = self.read_form()
+        except ValueError as exc:
+            messagebox.showerror("Erro", str(exc), parent=self.root)
+            return
+        self.worker.submit(preview, year, month, turma,
+                           on_done=lambda res: self.info.config(text=f"{res[0]} alunos a cobrar, {res[1]} já cobrados"),
+                           on_error=self.failed, key=("billing-preview", id(self)))
+
+    def run(self):
+        try:
+            year, month, amount, day, turma = self.read_form()
+        except ValueError as exc:
+            messagebox.showerror("Erro", str(exc), parent=self.root)
+            return
+        if not messagebox.askyesno("Confirmação", f"Gerar as cobranças de {month:02d}/{year}?", parent=self.root):
+            return
+        self.run_btn.state(["disabled"])
+        self.info.config(text="Gerando cobranças…")
+        self.worker.submit(run_billing, year, month, amount, day, turma,
+                           on_done=self.finished, on_error=self.failed, key="billing")
+
+    def finished(self, result):
+        if self.on_done:
+            self.on_done(result)
+        if not self.root.winfo_exists():
+            return
+        self.run_btn.state(["!disabled"])
+        self.info.config(text=result.summary())
+
+    def failed(self, exc):
+        if self.root.winfo_exists():
+            self.run_btn.state(["!disabled"])
+            messagebox.showerror("Erro", f"Falha na cobrança:\n{exc}", parent=self.root)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gera os pagamentos pendentes do mês para todos os alunos ou uma turma.")
+    parser.add_argument("mes")
+    parser.add_argument("ano", type=int)
+    parser.add_argument("--valor", type=float, required=True)
+    parser.add_argument("--dia", type=int, default=10, help="dia do vencimento")
+    parser.add_argument("--turma")
+    parser.add_argument("--simular", action="store_true", help="só mostra quantos alunos seriam cobrados")
+    args = parser.parse_args(argv)
+
+    init_db()
+    month = parse_month(args.mes)
+    if args.simular:
+        pending, billed = preview(args.ano, month, args.turma)
+        print(f"{pending} alunos a cobrar, {billed} já cobrados")
+        return 0
+    print(run_billing(args.ano, month, args.valor, args.dia, args.turma).summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
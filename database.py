@@ -1,12 +1,37 @@
 import sqlite3
 from pathlib import Path
+from contextlib import contextmanager
 import os
 import hashlib
-import shutil
+import threading
+import re
+import queue
+import random
+import time
+import functools
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from utils import br_to_iso, parse_month
+import diagnostics
 
 BASE_DIR = os.path.dirname(__file__)
 DB_PATH = os.path.join(BASE_DIR, "database.db")
 
+# Ajustes aplicados a cada conexão do pool
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",      # ~16 MB de page cache
+    "PRAGMA mmap_size = 67108864",     # 64 MB mapeados em memória
+)
+BUSY_TIMEOUT = 10.0
+STATEMENT_CACHE_SIZE = 256
+
+logger = logging.getLogger("academia.database")
+
 
 def hash_password(password: str, salt: str | None = None) -> tuple[str, str]:
     """Gera ou utiliza salt e retorna (salt, digest)."""
@@ -17,26 +42,291 @@ def hash_password(password: str, salt: str | None = None) -> tuple[str, str]:
 
 
 def db_connect():
+    """Abre uma conexão avulsa, fora do pool. Prefira get_connection()/transaction()."""
     return sqlite3.connect(DB_PATH)
 
 
-def init_db():
-    """Cria/atualiza banco e adiciona usuários padrão se não existirem."""
-    Path(BASE_DIR).mkdir(parents=True, exist_ok=True)
+class ConnectionManager:
+    """Mantém uma conexão persistente por thread com o banco.
+
+    As conexões ficam abertas durante toda a execução, preservando o page
+    cache e o cache de statements preparados do sqlite3. Cada thread recebe
+    a sua própria conexão (o sqlite3 não permite compartilhá-las) e todas
+    são fechadas juntas em close_all().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread=False só para que close_all() possa fechar as conexões
+        # das outras threads; fora isso cada conexão continua sendo usada por uma só
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE,
+                               isolation_level=None, factory=diagnostics.connection_factory())
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
 
-    # backup se já existir
-    if os.path.exists(DB_PATH):
-        backup_path = DB_PATH + ".backup"
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate: bool = True):
+        """Abre uma transação e faz commit/rollback ao sair do bloco.
+
+        Um bloco aninhado reaproveita a transação externa.
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
         try:
-            shutil.copy2(DB_PATH, backup_path)
-        except Exception:
-            pass
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
 
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("PRAGMA foreign_keys = ON")
+    def close_all(self):
+        with self._lock:
+            conns, self._connections = self._connections, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error as exc:
+                # ex.: uma thread ainda no meio de uma consulta; a conexão fica aberta
+                logger.warning("conexão com o banco não pôde ser fechada: %s", exc)
+        self._local = threading.local()
+        _query_cache.clear()
+
+
+_manager: ConnectionManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_manager() -> ConnectionManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ConnectionManager(DB_PATH)
+    return _manager
+
+
+def get_connection() -> sqlite3.Connection:
+    """Conexão persistente da thread atual."""
+    return get_manager().connection()
+
+
+def transaction(immediate: bool = True):
+    """Atalho para get_manager().transaction()."""
+    return get_manager().transaction(immediate)
+
+
+def close_connections():
+    if _manager is not None:
+        _manager.close_all()
+
+
+def use_database(path: str):
+    """Aponta o módulo para outro arquivo de banco (benchmark, simulações)."""
+    global DB_PATH, _manager
+    close_connections()
+    DB_PATH = path
+    _manager = None
+
+
+# ---------------- Escritor único ----------------
+WRITE_BATCH = 64            # escritas por transação de grupo
+WRITE_RETRIES = 6
+WRITE_BACKOFF = 0.05        # segundos; dobra a cada nova tentativa
+WRITE_BACKOFF_MAX = 2.0
+WRITE_BUSY_TIMEOUT_MS = 1000  # espera do próprio SQLite antes de cada nova tentativa
+
+
+def is_busy(exc: BaseException) -> bool:
+    return isinstance(exc, sqlite3.OperationalError) and ("locked" in str(exc) or "busy" in str(exc))
+
+
+class WriteQueue:
+    """Thread única que executa todas as escritas do processo.
+
+    As escritas enfileiradas enquanto uma transação está em andamento são
+    agrupadas na transação seguinte (group commit): um BEGIN IMMEDIATE/COMMIT
+    para até WRITE_BATCH operações. Cada operação roda num SAVEPOINT, então a
+    que falhar é desfeita sozinha. Se o banco estiver ocupado por outro
+    processo (SQLITE_BUSY), o grupo inteiro é repetido com espera exponencial.
+    Quem enfileira recebe um Future, resolvido só depois do COMMIT.
+    """
+
+    def __init__(self, batch: int = WRITE_BATCH):
+        self.batch = batch
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.commits = 0
+        self.writes = 0
+        self.retries = 0
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def in_writer(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Enfileira fn(*args, **kwargs); o Future recebe o resultado após o COMMIT."""
+        future = Future()
+        self._ensure_thread()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """Executa fn no escritor e espera o resultado (direto, se já estiver nele)."""
+        if self.in_writer():
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            while len(jobs) < self.batch:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            jobs = [job for job in jobs if job[0].set_running_or_notify_cancel()]
+            if jobs:
+                self._commit_group(jobs)
+
+    def _commit_group(self, jobs):
+        for attempt in range(WRITE_RETRIES + 1):
+            conn = get_connection()
+            conn.execute(f"PRAGMA busy_timeout = {WRITE_BUSY_TIMEOUT_MS}")
+            outcomes = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for _, fn, args, kwargs in jobs:
+                    conn.execute("SAVEPOINT write_job")
+                    try:
+                        outcomes.append((True, fn(*args, **kwargs)))
+                    except Exception as exc:
+                        if is_busy(exc):
+                            raise
+                        conn.execute("ROLLBACK TO write_job")
+                        outcomes.append((False, exc))
+                    conn.execute("RELEASE write_job")
+                conn.commit()
+            except Exception as exc:
+                if conn.in_transaction:
+                    conn.rollback()
+                if is_busy(exc) and attempt < WRITE_RETRIES:
+                    self.retries += 1
+                    delay = min(WRITE_BACKOFF * 2 ** attempt, WRITE_BACKOFF_MAX)
+                    time.sleep(delay * random.uniform(0.5, 1.0))
+                    continue
+                for future, *_ in jobs:
+                    future.set_exception(exc)
+                return
+            self.commits += 1
+            self.writes += len(jobs)
+            for (future, *_), (ok, value) in zip(jobs, outcomes):
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            return
+
+
+_writer: WriteQueue | None = None
+
+
+def get_writer() -> WriteQueue:
+    global _writer
+    if _writer is None:
+        with _manager_lock:
+            if _writer is None:
+                _writer = WriteQueue()
+    return _writer
+
+
+def serialized_write(fn):
+    """Decora uma função de escrita para que ela rode sempre no escritor único.
 
-    cur.execute('''
+    Dentro dele o `with transaction()` da função se junta à transação do
+    grupo; de qualquer outra thread a chamada espera o COMMIT e devolve o
+    resultado (ou levanta a exceção) como uma chamada comum.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return get_writer().call(fn, *args, **kwargs)
+    return wrapper
+
+
+# ---------------- Busca textual (FTS5) ----------------
+_fts5_available: bool | None = None
+
+
+def has_fts5(conn: sqlite3.Connection) -> bool:
+    global _fts5_available
+    if _fts5_available is None:
+        try:
+            conn.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)")
+            conn.execute("DROP TABLE temp._fts5_probe")
+            _fts5_available = True
+        except sqlite3.OperationalError:
+            _fts5_available = False
+    return _fts5_available
+
+
+def fts_query(term: str) -> str | None:
+    """Converte o texto digitado em uma consulta MATCH com prefixo ("joa" -> "joa"*)."""
+    tokens = re.findall(r"\w+", term)
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+# ---------------- Migrações ----------------
+# Cada passo roda uma única vez, em ordem, dentro da sua própria transação, e
+# precisa ser idempotente (pode encontrar bancos parcialmente atualizados).
+MIGRATIONS: list[tuple[int, str, object]] = []
+
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone() is not None
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+@migration(1, "tabelas base")
+def _m001_base_schema(conn):
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -46,7 +336,7 @@ def init_db():
         )
     ''')
 
-    cur.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS students (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT,
@@ -59,7 +349,7 @@ def init_db():
         )
     ''')
 
-    cur.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS payments (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             student_id INTEGER,
@@ -73,9 +363,500 @@ def init_db():
         )
     ''')
 
-    conn.commit()
 
-    # cria usuários padrão
+@migration(2, "unifica a tabela antiga alunos(nome) em students(name)")
+def _m002_unify_students(conn):
+    if not _table_exists(conn, "alunos"):
+        return
+    # os ids são preservados porque payments.student_id aponta para eles
+    conn.execute('''
+        INSERT OR IGNORE INTO students (id, name, professor, turma, payment_date,
+                                        payment_method, assinatura, status_pagamento)
+        SELECT id, nome, professor, turma, payment_date, payment_method, assinatura,
+               COALESCE(status_pagamento, 'Pendente')
+        FROM alunos
+    ''')
+    for trigger in ("alunos_fts_ai", "alunos_fts_ad", "alunos_fts_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS alunos_fts")
+    conn.execute("DROP TABLE alunos")
+
+
+def _log_dropped(conn, version: int, table: str, column: str, condition: str):
+    """Guarda em migration_log os valores de table.column que `condition` vai anular, e avisa no log."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS migration_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            version INTEGER NOT NULL,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            column_name TEXT NOT NULL,
+            original TEXT
+        )""")
+    count = conn.execute(f"""
+        INSERT INTO migration_log (version, table_name, row_id, column_name, original)
+        SELECT ?, ?, id, ?, {column} FROM {table} WHERE {condition}""", (version, table, column)).rowcount
+    if count:
+        logger.warning("migração %d: %d valor(es) ilegível(is) de %s.%s ficaram NULL (ver tabela migration_log)",
+                       version, count, table, column)
+
+
+def _iso_or_none(value):
+    """br_to_iso para as migrações: None em vez de erro, para nunca deixar data fora do formato ISO."""
+    try:
+        return br_to_iso(value)
+    except (AttributeError, ValueError):
+        return None
+
+
+# com um modificador, date() do SQLite normaliza o dia (30/02 vira 01/03) e só devolve o
+# próprio texto para datas ISO válidas; as demais passam pelo Python
+_NOT_ISO = "{0} IS NOT date({0}, '+0 days')"
+_BAD_DATE = _NOT_ISO + " AND TRIM({0}) != '' AND to_iso({0}) IS NULL"
+
+
+@migration(3, "datas em ISO (AAAA-MM-DD) e mês numérico")
+def _m003_iso_dates(conn):
+    def to_month(value):
+        try:
+            return parse_month(value)
+        except (TypeError, ValueError):
+            # nunca deixa texto na coluna INTEGER; o valor original fica em migration_log
+            return None
+
+    # datas ilegíveis (ex.: '31/02/2024') também viram NULL, com o original em migration_log
+    conn.create_function("to_iso", 1, _iso_or_none, deterministic=True)
+    conn.create_function("to_month", 1, to_month, deterministic=True)
+    _log_dropped(conn, 3, "payments", "month", "to_month(month) IS NULL AND month IS NOT NULL")
+    _log_dropped(conn, 3, "payments", "payment_date", _BAD_DATE.format("payment_date"))
+    _log_dropped(conn, 3, "students", "payment_date", _BAD_DATE.format("payment_date"))
+
+    conn.execute("UPDATE students SET payment_date = to_iso(payment_date) WHERE payment_date IS NOT NULL")
+
+    # a coluna month era TEXT; a tabela é recriada para ter afinidade INTEGER
+    conn.execute('''
+        CREATE TABLE payments_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER,
+            month INTEGER,
+            year INTEGER,
+            payment_date TEXT,
+            payment_method TEXT,
+            amount REAL,
+            status_pagamento TEXT DEFAULT 'Pendente',
+            FOREIGN KEY(student_id) REFERENCES students(id) ON DELETE CASCADE
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO payments_new (id, student_id, month, year, payment_date, payment_method, amount, status_pagamento)
+        SELECT id, student_id, to_month(month), CAST(year AS INTEGER), to_iso(payment_date),
+               payment_method, amount, status_pagamento
+        FROM payments
+    ''')
+    conn.execute("DROP TABLE payments")
+    conn.execute("ALTER TABLE payments_new RENAME TO payments")
+
+
+@migration(4, "índices das consultas principais")
+def _m004_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_name ON students(name, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_status_date ON students(status_pagamento, payment_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_student ON payments(student_id, year, month)")
+
+
+@migration(5, "índice FTS5 de busca de alunos")
+def _m005_search_index(conn):
+    """Índice FTS5 sobre name, professor e turma, mantido por triggers."""
+    if not has_fts5(conn):
+        return
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+            name, professor, turma,
+            content='students', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN
+            INSERT INTO students_fts(rowid, name, professor, turma)
+            VALUES (new.id, new.name, new.professor, new.turma);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN
+            INSERT INTO students_fts(students_fts, rowid, name, professor, turma)
+            VALUES ('delete', old.id, old.name, old.professor, old.turma);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF name, professor, turma ON students BEGIN
+            INSERT INTO students_fts(students_fts, rowid, name, professor, turma)
+            VALUES ('delete', old.id, old.name, old.professor, old.turma);
+            INSERT INTO students_fts(rowid, name, professor, turma)
+            VALUES (new.id, new.name, new.professor, new.turma);
+        END
+    ''')
+    conn.execute("INSERT INTO students_fts(students_fts) VALUES ('rebuild')")
+
+
+# Resumos mantidos por triggers: tabela -> (colunas da chave, expressões da chave
+# a partir de uma linha de payments (p) e do aluno (s)). O professor tem um resumo
+# à parte, só por ano: na chave do resumo por mês/turma ele multiplicava as linhas
+# (mais da metade do tamanho de payments) e o relatório por mês quase não ganhava
+# nada em relação a varrer os pagamentos.
+_SUMMARIES = {
+    "payment_summary": (
+        "year, month, turma, status_pagamento",
+        "COALESCE({p}.year, 0), COALESCE({p}.month, 0), COALESCE({s}.turma, ''), "
+        "COALESCE({p}.status_pagamento, 'Pendente')"),
+    "payment_summary_professor": (
+        "year, professor, status_pagamento",
+        "COALESCE({p}.year, 0), COALESCE({s}.professor, ''), COALESCE({p}.status_pagamento, 'Pendente')"),
+}
+
+
+def _group_by(key: str) -> str:
+    return ", ".join(str(i + 1) for i in range(len(key.split(","))))
+
+
+def _summary_delta(row: str, sign: str) -> str:
+    """SQL que soma (sign='+') ou subtrai (sign='-') a linha NEW/OLD de payments nos resumos."""
+    return "".join(f"""
+        INSERT INTO {table} ({key}, total, count)
+        SELECT {expr.format(p=row, s='s')}, {sign}COALESCE({row}.amount, 0), {sign}1
+        FROM (SELECT 1) LEFT JOIN students s ON s.id = {row}.student_id
+        WHERE 1 ON CONFLICT({key}) DO UPDATE SET total = total + excluded.total, count = count + excluded.count;"""
+                   for table, (key, expr) in _SUMMARIES.items())
+
+
+def _summary_move(student: str, sign: str) -> str:
+    """SQL que soma/subtrai todos os pagamentos de um aluno usando turma/professor de NEW/OLD."""
+    return "".join(f"""
+        INSERT INTO {table} ({key}, total, count)
+        SELECT {expr.format(p='p', s=student)}, {sign}SUM(COALESCE(p.amount, 0)), {sign}COUNT(*)
+        FROM payments p WHERE p.student_id = {student}.id
+        GROUP BY {_group_by(key)}
+        ON CONFLICT({key}) DO UPDATE SET total = total + excluded.total, count = count + excluded.count;"""
+                   for table, (key, expr) in _SUMMARIES.items())
+
+
+def rebuild_payment_summary(conn: sqlite3.Connection):
+    """Recalcula os resumos (payment_summary e payment_summary_professor) do zero a partir de payments."""
+    for table, (key, expr) in _SUMMARIES.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"""
+            INSERT INTO {table} ({key}, total, count)
+            SELECT {expr.format(p='p', s='s')}, SUM(COALESCE(p.amount, 0)), COUNT(*)
+            FROM payments p LEFT JOIN students s ON s.id = p.student_id
+            GROUP BY {_group_by(key)}""")
+
+
+def _create_payment_summaries(conn: sqlite3.Connection):
+    """Tabelas dos resumos, os triggers que as mantêm e o cálculo inicial."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS payment_summary (
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            turma TEXT NOT NULL,
+            status_pagamento TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (year, month, turma, status_pagamento)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS payment_summary_professor (
+            year INTEGER NOT NULL,
+            professor TEXT NOT NULL,
+            status_pagamento TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (year, professor, status_pagamento)
+        ) WITHOUT ROWID
+    ''')
+    # os triggers apagam as linhas zeradas a cada escrita; o índice parcial evita varrer o resumo
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payment_summary_empty ON payment_summary(count) WHERE count <= 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payment_summary_professor_empty "
+                 "ON payment_summary_professor(count) WHERE count <= 0")
+    cleanup = "".join(f"DELETE FROM {table} WHERE count <= 0;" for table in _SUMMARIES)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS payment_summary_ai AFTER INSERT ON payments BEGIN
+            {_summary_delta('NEW', '+')}
+        END""")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS payment_summary_ad AFTER DELETE ON payments BEGIN
+            {_summary_delta('OLD', '-')}
+            {cleanup}
+        END""")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS payment_summary_au
+        AFTER UPDATE OF student_id, month, year, amount, status_pagamento ON payments BEGIN
+            {_summary_delta('OLD', '-')}
+            {_summary_delta('NEW', '+')}
+            {cleanup}
+        END""")
+    # turma/professor fazem parte das chaves: mover os pagamentos do aluno
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS payment_summary_student_au
+        AFTER UPDATE OF turma, professor ON students BEGIN
+            {_summary_move('OLD', '-')}
+            {_summary_move('NEW', '+')}
+            {cleanup}
+        END""")
+    # apaga os pagamentos antes do aluno, para que os triggers acima ainda enxerguem a turma
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS payment_summary_student_bd BEFORE DELETE ON students BEGIN
+            DELETE FROM payments WHERE student_id = OLD.id;
+        END""")
+    rebuild_payment_summary(conn)
+
+
+@migration(6, "resumo financeiro mantido por triggers")
+def _m006_payment_summary(conn):
+    # usa a definição atual dos resumos; bancos que já tinham a antiga são refeitos na migração 14
+    _create_payment_summaries(conn)
+
+
+@migration(7, "índices compostos do livro-caixa de pagamentos")
+def _m007_ledger_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_period ON payments(year, month)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_status_period ON payments(status_pagamento, year, month)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_method_period ON payments(payment_method, year, month)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_date ON payments(payment_date)")
+
+
+@migration(8, "contadores de geração por tabela")
+def _m008_data_generation(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_generation (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID""")
+    conn.executemany("INSERT OR IGNORE INTO data_generation (name) VALUES (?)", [("students",), ("payments",)])
+
+
+@migration(9, "índice parcial para a limpeza do resumo financeiro")
+def _m009_summary_cleanup_index(conn):
+    # os triggers do resumo apagam as linhas zeradas a cada escrita em payments;
+    # sem índice esse DELETE varria payment_summary inteira por linha alterada
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_payment_summary_empty ON payment_summary(count) WHERE count <= 0")
+
+
+@migration(10, "índices de ordenação e filtro da tabela de alunos")
+def _m010_student_sort_indexes(conn):
+    # um índice em (col) já guarda as entradas em (col, rowid): serve à
+    # paginação por chave ORDER BY col, id nos dois sentidos
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_professor ON students(professor)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_turma ON students(turma)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_date ON students(payment_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_status ON students(status_pagamento)")
+    # sem estatísticas o planejador tende a preferir idx_students_status a
+    # idx_students_status_date quando se filtra por status e ordena por data
+    conn.execute("ANALYZE students")
+
+
+@migration(11, "registro dos anos arquivados")
+def _m011_archived_years(conn):
+    # um arquivo SQLite somente leitura por ano encerrado (ver archive.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archived_years (
+            year INTEGER PRIMARY KEY,
+            filename TEXT NOT NULL,
+            payments INTEGER NOT NULL,
+            students INTEGER NOT NULL,
+            total REAL NOT NULL,
+            min_date TEXT,
+            max_date TEXT,
+            archived_at TEXT NOT NULL
+        )""")
+
+
+@migration(12, "índice de trigramas para a busca aproximada de nomes")
+def _m012_name_trigrams(conn):
+    # palavras distintas de nomes de alunos e professores, tiradas do vocabulário
+    # do students_fts, e os trigramas de cada uma (ver name_index.py)
+    if not has_fts5(conn):
+        return
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS students_fts_vocab USING fts5vocab(students_fts, 'col')")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS name_words (
+            word TEXT PRIMARY KEY,
+            grams INTEGER NOT NULL
+        ) WITHOUT ROWID""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS name_trigrams (
+            gram TEXT NOT NULL,
+            word TEXT NOT NULL,
+            PRIMARY KEY (gram, word)
+        ) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_name_trigrams_word ON name_trigrams(word)")
+    # geração de students já indexada; -1 faz a primeira busca (ou a manutenção) montar o índice
+    conn.execute("CREATE TABLE IF NOT EXISTS name_index_state (generation INTEGER NOT NULL)")
+    conn.execute("INSERT INTO name_index_state SELECT -1 WHERE NOT EXISTS (SELECT 1 FROM name_index_state)")
+
+
+@migration(13, "meses ilegíveis de payments viram NULL")
+def _m013_null_text_months(conn):
+    # bancos migrados antes desta correção podem ter texto (ex.: 'xx') na coluna month
+    condition = "typeof(month) NOT IN ('integer', 'null')"
+    _log_dropped(conn, 13, "payments", "month", condition)
+    conn.execute(f"UPDATE payments SET month = NULL WHERE {condition}")
+
+
+@migration(14, "resumo por mês/turma sem professor e resumo por professor à parte")
+def _m014_split_payment_summary(conn):
+    for trigger in ("payment_summary_ai", "payment_summary_ad", "payment_summary_au", "payment_summary_student_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS payment_summary")
+    conn.execute("DROP TABLE IF EXISTS payment_summary_professor")
+    _create_payment_summaries(conn)
+
+
+@migration(15, "datas ilegíveis viram NULL")
+def _m015_null_bad_dates(conn):
+    # a migração 3 deixava como estavam as datas que não conseguia converter
+    conn.create_function("to_iso", 1, _iso_or_none, deterministic=True)
+    for table in ("students", "payments"):
+        _log_dropped(conn, 15, table, "payment_date", _BAD_DATE.format("payment_date"))
+        conn.execute(f"UPDATE {table} SET payment_date = to_iso(payment_date) "
+                     f"WHERE {_NOT_ISO.format('payment_date')} AND payment_date IS NOT to_iso(payment_date)")
+
+
+def bump_generation(conn: sqlite3.Connection, name: str) -> int:
+    """Incrementa a geração de `name` dentro da transação corrente e devolve o novo valor.
+
+    Toda escrita em students/payments feita pelo sistema passa por aqui; quem
+    guarda uma cópia dos dados compara gerações para saber se outra escrita
+    aconteceu no meio.
+    """
+    _query_cache.forget()
+    return conn.execute("UPDATE data_generation SET value = value + 1 WHERE name = ? RETURNING value",
+                        (name,)).fetchone()[0]
+
+
+def data_generation(conn: sqlite3.Connection, name: str) -> int:
+    row = conn.execute("SELECT value FROM data_generation WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+# ---------------- Cache de leituras ----------------
+QUERY_CACHE_ENTRIES = 256     # resultados guardados (os menos usados saem primeiro)
+QUERY_CACHE_MAX_ROWS = 5000   # resultados maiores que isso vão direto ao banco
+
+
+@functools.lru_cache(maxsize=1024)
+def _cache_sql(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+class QueryCache:
+    """Cache LRU de resultados de leitura, invalidado pelas gerações de data_generation.
+
+    Cada resultado fica guardado sob (SQL normalizado, parâmetros) junto com
+    as gerações das tabelas de que depende e só é devolvido enquanto elas
+    não mudarem. Para não reler data_generation a cada consulta, cada thread
+    guarda as gerações que viu e o PRAGMA data_version da sua conexão, que
+    muda quando outra conexão (desta ou de outra instância do programa) faz
+    commit; as escritas da própria conexão descartam essa cópia em
+    bump_generation.
+    """
+
+    def __init__(self, entries: int = QUERY_CACHE_ENTRIES, max_rows: int = QUERY_CACHE_MAX_ROWS):
+        self.entries = entries
+        self.max_rows = max_rows
+        self._results: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def generations(self, conn: sqlite3.Connection) -> dict[str, int]:
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        view = getattr(self._local, "view", None)
+        if view is None or view[0] is not conn or view[1] != version:
+            view = (conn, version, dict(conn.execute("SELECT name, value FROM data_generation").fetchall()))
+            self._local.view = view
+        return view[2]
+
+    def forget(self):
+        """Descarta as gerações vistas pela thread atual (ela acabou de escrever)."""
+        self._local.view = None
+
+    def fetchall(self, conn: sqlite3.Connection, sql: str, params=(), tables=("students", "payments")) -> list[tuple]:
+        if not self.entries or conn.in_transaction:
+            # dentro de uma transação a leitura pode depender de escritas ainda não confirmadas
+            return conn.execute(sql, params).fetchall()
+        start = time.perf_counter()
+        generations = self.generations(conn)
+        stamp = tuple(generations.get(name, 0) for name in tables)
+        key = (_cache_sql(sql), tuple(params), tables)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._results.move_to_end(key)
+                self.hits += 1
+                diagnostics.record("cache", "acerto", time.perf_counter() - start)
+                return list(entry[1])
+        # as gerações foram lidas antes: o resultado é no mínimo tão novo quanto o carimbo
+        rows = conn.execute(sql, params).fetchall()
+        with self._lock:
+            self.misses += 1
+            if len(rows) <= self.max_rows:
+                self._results[key] = (stamp, rows)
+                self._results.move_to_end(key)
+                while len(self._results) > self.entries:
+                    self._results.popitem(last=False)
+        diagnostics.record("cache", "falta", time.perf_counter() - start)
+        return list(rows)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = self.misses = 0
+        self._local = threading.local()
+
+
+_query_cache = QueryCache()
+
+
+def get_query_cache() -> QueryCache:
+    return _query_cache
+
+
+def cached_fetchall(conn: sqlite3.Connection, sql: str, params=(), tables=("students", "payments")) -> list[tuple]:
+    """conn.execute(sql, params).fetchall() servido pelo cache de leituras.
+
+    `tables` são os nomes em data_generation de que o resultado depende;
+    consultas que dependem da data corrente precisam recebê-la como parâmetro.
+    """
+    return _query_cache.fetchall(conn, sql, params, tuple(tables))
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate():
+    """Aplica, em ordem, as migrações ainda não registradas em schema_version."""
+    conn = get_connection()
+    current = schema_version(conn)
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with transaction():
+            step(conn)
+            conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+        current = version
+    return current
+
+
+def seed_users(conn: sqlite3.Connection):
+    """Cria os usuários padrão que não existirem (dentro da transação corrente)."""
+    cur = conn.cursor()
+
     def ensure_user(username: str, password: str, is_admin: bool):
         cur.execute("SELECT id FROM users WHERE username=?", (username,))
         if cur.fetchone() is None:
@@ -86,16 +867,34 @@ def init_db():
     ensure_user("admin", "admin", True)
     ensure_user("user", "123", False)
 
-    conn.commit()
-    conn.close()
+
+def init_db() -> bool:
+    """Cria/atualiza banco e adiciona usuários padrão se não existirem.
+
+    PRAGMA user_version guarda a última migração aplicada junto com os
+    usuários padrão; quando já está em dia, uma única leitura basta e nada
+    mais é feito (a conferência dos usuários fica para maintenance.py).
+    Devolve True se o caminho rápido foi usado.
+    """
+    conn = get_connection()
+    latest = MIGRATIONS[-1][0]
+    if conn.execute("PRAGMA user_version").fetchone()[0] == latest:
+        return True
+
+    Path(BASE_DIR).mkdir(parents=True, exist_ok=True)
+    # os backups agora são feitos em segundo plano (ver backup.py)
+    migrate()
+
+    with transaction() as conn:
+        seed_users(conn)
+        # só marcado depois das migrações e dos usuários, na mesma transação destes
+        conn.execute(f"PRAGMA user_version = {latest}")
+    return False
 
 
 def verify_user(username: str, password: str) -> tuple[bool, bool]:
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT salt, password_hash, is_admin FROM users WHERE username=?", (username,))
+    cur = get_connection().execute("SELECT salt, password_hash, is_admin FROM users WHERE username=?", (username,))
     row = cur.fetchone()
-    conn.close()
     if not row:
         return False, False
     salt, stored_hash, is_admin = row
@@ -0,0 +1,119 @@
+import queue
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import diagnostics
+
+
+class DbWorker:
+    """Executa consultas em threads de fundo e entrega o resultado na thread do Tk.
+
+    As funções enviadas rodam em um ThreadPoolExecutor (cada thread usa a sua
+    conexão persistente do database.ConnectionManager). Os resultados voltam por
+    uma fila que é lida com root.after, pois widgets Tk só podem ser tocados na
+    thread principal. Pedidos enviados com a mesma `key` substituem os
+    anteriores: os que ainda não começaram são cancelados e os que já estavam
+    rodando têm o resultado descartado.
+
+    Pedidos com `label` entram nas métricas de diagnostics: "ui" do submit
+    até o fim do callback e "tk" só o tempo do callback na thread do Tk.
+    """
+
+    POLL_MS = 25
+
+    def __init__(self, root, max_workers: int = 2, on_busy=None):
+        self.root = root
+        self.on_busy = on_busy
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._results: queue.Queue = queue.Queue()
+        self._latest: dict = {}
+        self._pending = 0
+        self._polling = False
+        self._closed = False
+
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None, label=None):
+        """Agenda fn(*args) numa thread de fundo; on_done/on_error rodam na thread do Tk.
+
+        Deve ser chamado a partir da thread do Tk.
+        """
+        if self._closed:
+            return None
+        token = object()
+        start = time.perf_counter() if label else None
+        future = self._executor.submit(self._run, fn, args, on_done, on_error, key, token, label, start)
+        self._started()
+        if key is not None:
+            previous = self._latest.get(key)
+            self._latest[key] = (token, future)
+            if previous is not None and previous[1].cancel():
+                self._finished()
+        return future
+
+    def _run(self, fn, args, on_done, on_error, key, token, label, start):
+        try:
+            result, error = fn(*args), None
+        except Exception as exc:
+            result, error = None, exc
+        self._results.put((key, token, result, error, on_done, on_error, label, start))
+
+    def _is_current(self, key, token) -> bool:
+        if key is None:
+            return True
+        latest = self._latest.get(key)
+        if latest is None or latest[0] is not token:
+            return False
+        del self._latest[key]
+        return True
+
+    # ---------------- Thread do Tk ----------------
+    def _started(self):
+        self._pending += 1
+        if self._pending == 1 and self.on_busy:
+            self.on_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _finished(self):
+        self._pending -= 1
+        if self._pending == 0 and self.on_busy:
+            self.on_busy(False)
+
+    def _poll(self):
+        if self._closed:
+            return
+        try:
+            while True:
+                try:
+                    key, token, result, error, on_done, on_error, label, start = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                self._finished()
+                if not self._is_current(key, token):
+                    continue
+                callback_start = time.perf_counter()
+                # um callback que falha (ex.: janela já fechada) não pode parar a entrega dos demais
+                try:
+                    if error is not None:
+                        if on_error:
+                            on_error(error)
+                        else:
+                            self.root.report_callback_exception(type(error), error, error.__traceback__)
+                    elif on_done:
+                        on_done(result)
+                except Exception:
+                    self.root.report_callback_exception(*sys.exc_info())
+                if label:
+                    end = time.perf_counter()
+                    diagnostics.record("tk", label, end - callback_start)
+                    diagnostics.record("ui", label, end - start)
+        finally:
+            if self._pending > 0:
+                self.root.after(self.POLL_MS, self._poll)
+            else:
+                self._polling = False
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
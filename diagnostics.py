@@ -0,0 +1,302 @@
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(__file__)
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+SLOW_LOG_PATH = os.path.join(LOG_DIR, "slow_queries.log")
+DUMP_PATH = os.path.join(LOG_DIR, "diagnostico.json")
+
+SLOW_QUERY_MS = 50.0          # consultas acima disso vão para o log lento
+SLOW_LOG_BYTES = 1 << 20      # rotação a cada ~1 MB
+SLOW_LOG_BACKUPS = 3
+MAX_SAMPLES = 2000            # amostras guardadas por métrica (as mais antigas saem)
+MAX_PLANS = 256               # planos de EXPLAIN guardados por statement
+
+# Tipos de métrica: "sql" (cada statement), "ui" (ação da tela, do clique até
+# a resposta desenhada), "tk" (tempo gasto no callback dentro da thread do Tk)
+# "api" (requisições do api_server) e "cache" (acertos e faltas do cache de
+# leituras de database).
+enabled = True
+
+
+class Metric:
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: deque = deque(maxlen=MAX_SAMPLES)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.samples.append(seconds)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        return {"tipo": self.kind, "nome": self.name, "qtd": self.count,
+                "total_ms": round(self.total * 1000, 3),
+                "p50_ms": _percentile(ordered, 50), "p95_ms": _percentile(ordered, 95),
+                "p99_ms": _percentile(ordered, 99), "max_ms": round(self.max * 1000, 3)}
+
+
+def _percentile(ordered: list[float], p: int) -> float:
+    """Percentil pelo método do posto mais próximo, em ms."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * p // 100))
+    return round(ordered[rank - 1] * 1000, 3)
+
+
+_metrics: dict[tuple[str, str], Metric] = {}
+_lock = threading.Lock()
+
+
+def record(kind: str, name: str, seconds: float):
+    if not enabled:
+        return
+    with _lock:
+        metric = _metrics.get((kind, name))
+        if metric is None:
+            metric = _metrics[(kind, name)] = Metric(kind, name)
+        metric.add(seconds)
+
+
+def snapshot() -> list[dict]:
+    """Resumo de todas as métricas, da que mais consumiu tempo para a que menos."""
+    with _lock:
+        rows = [m.summary() for m in _metrics.values()]
+    return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+
+
+def dump_json(path: str = DUMP_PATH) -> str:
+    """Grava o snapshot em JSON (para anexar a um chamado ou comparar máquinas)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data = {"gerado_em": datetime.now().isoformat(timespec="seconds"),
+            "limite_lento_ms": SLOW_QUERY_MS, "log_lento": SLOW_LOG_PATH,
+            "metricas": snapshot()}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return path
+
+
+class timed:
+    """Mede um bloco ou uma função: `with timed("ui", "x"):` ou `@timed("tk", "x")`."""
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.kind, self.name, time.perf_counter() - self.start)
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self:
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+# ---------------- SQL ----------------
+@functools.lru_cache(maxsize=1024)
+def normalize(sql: str) -> str:
+    """Chave da métrica: espaços colapsados e listas IN (?, ?, …) de qualquer tamanho juntas."""
+    text = re.sub(r"\s+", " ", sql).strip()
+    text = re.sub(r"\?(?:\s*,\s*\?)+", "?, …", text)
+    return text if len(text) <= 300 else text[:297] + "..."
+
+
+_slow_logger: logging.Logger | None = None
+_plans: dict[str, list[str]] = {}
+
+
+def _get_slow_logger() -> logging.Logger:
+    global _slow_logger
+    if _slow_logger is None:
+        with _lock:
+            if _slow_logger is None:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    SLOW_LOG_PATH, maxBytes=SLOW_LOG_BYTES, backupCount=SLOW_LOG_BACKUPS, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                logger = logging.getLogger("academia.slow_queries")
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                _slow_logger = logger
+    return _slow_logger
+
+
+def _query_plan(conn: sqlite3.Connection, key: str, sql: str, params) -> list[str]:
+    plan = _plans.get(key)
+    if plan is not None:
+        return plan
+    if not re.match(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", sql, re.I):
+        return []
+    try:
+        # chamada da classe base: o EXPLAIN não entra nas métricas
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+        plan = [f"{'  ' * _depth(rows, r)}{r[3]}" for r in rows]
+    except (sqlite3.Error, ValueError) as exc:
+        plan = [f"(plano indisponível: {exc})"]
+    if len(_plans) < MAX_PLANS:
+        _plans[key] = plan
+    return plan
+
+
+def _depth(rows, row) -> int:
+    """Nível de indentação de uma linha do EXPLAIN QUERY PLAN (coluna parent)."""
+    parents = {r[0]: r[1] for r in rows}
+    level, parent = 0, row[1]
+    while parent in parents and level < 32:
+        level, parent = level + 1, parents[parent]
+    return level
+
+
+def record_query(conn: sqlite3.Connection, sql: str, params, seconds: float):
+    key = normalize(sql)
+    record("sql", key, seconds)
+    if seconds * 1000 < SLOW_QUERY_MS:
+        return
+    plan = _query_plan(conn, key, sql, params)
+    shown = repr(params)
+    if len(shown) > 200:
+        shown = shown[:197] + "..."
+    lines = [f"{seconds * 1000:.1f} ms [{threading.current_thread().name}] {key}", f"  parâmetros: {shown}"]
+    lines += [f"  plano: {step}" for step in plan]
+    _get_slow_logger().info("\n".join(lines))
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor que mede cada statement, somando ao execute o tempo das leituras.
+
+    A amostra de um SELECT é fechada quando o cursor se esgota, executa outra
+    coisa ou é descartado (o caso comum de conn.execute(...).fetchone()).
+    """
+
+    _sql = None
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            record_query(self.connection, sql, self._params, self._elapsed)
+
+    def execute(self, sql, params=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._sql, self._params, self._elapsed = sql, params, time.perf_counter() - start
+            if self.description is None:
+                self._finish()
+
+    def executemany(self, sql, seq):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq)
+        finally:
+            record_query(self.connection, sql, None, time.perf_counter() - start)
+
+    def executescript(self, script):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            record("sql", normalize(script[:120]), time.perf_counter() - start)
+
+    def _timed_fetch(self, fetch, *args):
+        start = time.perf_counter()
+        rows = fetch(*args)
+        if self._sql is not None:
+            self._elapsed += time.perf_counter() - start
+        return rows
+
+    def fetchone(self):
+        row = self._timed_fetch(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed_fetch(super().fetchmany, size)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed_fetch(super().fetchall)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return super().__next__()
+        except StopIteration:
+            self._finish()
+            raise
+        finally:
+            if self._sql is not None:
+                self._elapsed += time.perf_counter() - start
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TimedConnection(sqlite3.Connection):
+    """Conexão cujos cursores são TimedCursor (use como factory= do sqlite3.connect)."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def commit(self):
+        with timed("sql", "COMMIT"):
+            super().commit()
+
+
+def connection_factory():
+    """Classe a passar para sqlite3.connect(factory=...): medida só se a instrumentação estiver ligada."""
+    return TimedConnection if enabled else sqlite3.Connection
+
@@ -0,0 +1,73 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+import diagnostics
+
+class DiagnosticsWindow:
+    """Painel com os percentis de SQL e das ações da tela, atualizado periodicamente."""
+
+    REFRESH_MS = 2000
+    COLUMNS = (("tipo", "Tipo", 50), ("nome", "Métrica", 420), ("qtd", "Qtd", 60),
+               ("total_ms", "Total (ms)", 90), ("p50_ms", "p50", 70), ("p95_ms", "p95", 70),
+               ("p99_ms", "p99", 70), ("max_ms", "Máx", 70))
+
+    def __init__(self):
+        self.root = tk.Toplevel()
+        self.root.title("Diagnóstico de desempenho")
+        self.root.geometry("1000x480")
+
+        top = ttk.Frame(self.root, padding=(10, 8))
+        top.pack(fill="x")
+        ttk.Label(top, text="Tipo").pack(side="left")
+        self.kind = ttk.Combobox(top, values=("", "sql", "ui", "tk", "api", "cache", "manutencao"), width=11, state="readonly")
+        self.kind.pack(side="left", padx=(4, 12))
+        self.kind.bind("<<ComboboxSelected>>", lambda e: self.show())
+        ttk.Button(top, text="Salvar JSON...", command=self.save).pack(side="right", padx=4)
+        ttk.Button(top, text="Zerar", command=self.clear).pack(side="right", padx=4)
+
+        frame = ttk.Frame(self.root, padding=(10, 0))
+        frame.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(frame, columns=[c[0] for c in self.COLUMNS], show="headings")
+        for key, label, width in self.COLUMNS:
+            self.tree.heading(key, text=label)
+            self.tree.column(key, width=width, anchor="w" if key == "nome" else "e", stretch=key == "nome")
+        scroll = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scroll.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scroll.pack(side="right", fill="y")
+
+        self.info = ttk.Label(self.root, padding=(10, 6),
+                              text=f"Consultas acima de {diagnostics.SLOW_QUERY_MS:.0f} ms vão para {diagnostics.SLOW_LOG_PATH}")
+        self.info.pack(fill="x")
+        self.tick()
+
+    def show(self):
+        kind = self.kind.get()
+        self.tree.delete(*self.tree.get_children())
+        for row in diagnostics.snapshot():
+            if not kind or row["tipo"] == kind:
+                self.tree.insert("", "end", values=[row[key] for key, _, _ in self.COLUMNS])
+
+    def tick(self):
+        if not self.root.winfo_exists():
+            return
+        # não redesenha enquanto o usuário examina uma linha
+        if not self.tree.selection():
+            self.show()
+        self.root.after(self.REFRESH_MS, self.tick)
+
+    def clear(self):
+        diagnostics.reset()
+        self.show()
+
+    def save(self):
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension=".json",
+                                            initialfile="diagnostico.json", filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            diagnostics.dump_json(path)
+        except OSError as exc:
+            messagebox.showerror("Erro", f"Falha ao gravar o arquivo:\n{exc}", parent=self.root)
+            return
+        messagebox.showinfo("Diagnóstico", f"Métricas gravadas em {path}", parent=self.root)
@@ -0,0 +1,96 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import time
+
+import exporter
+from db_worker import DbWorker
+
+
+class ExportWindow:
+    """Janela de exportação de alunos/pagamentos com filtros, executada em segundo plano."""
+
+    def __init__(self, worker: DbWorker):
+        self.worker = worker
+        self.root = tk.Toplevel()
+        self.root.title("Exportar dados")
+        self.root.resizable(False, False)
+        self._written = 0
+        self._running = False
+
+        form = ttk.Frame(self.root, padding=12)
+        form.pack(fill="both", expand=True)
+
+        self.kind = tk.StringVar(value="pagamentos")
+        self.fmt = tk.StringVar(value="csv")
+        self.compress = tk.BooleanVar(value=False)
+        self.status = tk.StringVar(value="")
+
+        ttk.Label(form, text="Dados").grid(row=0, column=0, sticky="w", pady=3)
+        ttk.Combobox(form, textvariable=self.kind, values=["alunos", "pagamentos"], state="readonly", width=18).grid(row=0, column=1, sticky="w")
+        ttk.Label(form, text="Formato").grid(row=1, column=0, sticky="w", pady=3)
+        ttk.Combobox(form, textvariable=self.fmt, values=["csv", "jsonl"], state="readonly", width=18).grid(row=1, column=1, sticky="w")
+        ttk.Checkbutton(form, text="Compactar (gzip)", variable=self.compress).grid(row=2, column=1, sticky="w", pady=3)
+
+        ttk.Label(form, text="Status").grid(row=3, column=0, sticky="w", pady=3)
+        ttk.Combobox(form, textvariable=self.status, values=["", "Pago", "Pendente"], state="readonly", width=18).grid(row=3, column=1, sticky="w")
+
+        self.entries = {}
+        for i, (key, label) in enumerate([("turma", "Turma"), ("professor", "Professor"),
+                                          ("date_from", "De (DD/MM/AAAA)"), ("date_to", "Até (DD/MM/AAAA)")], start=4):
+            ttk.Label(form, text=label).grid(row=i, column=0, sticky="w", pady=3)
+            ent = ttk.Entry(form, width=20)
+            ent.grid(row=i, column=1, sticky="w")
+            self.entries[key] = ent
+
+        self.progress_label = ttk.Label(form, text="")
+        self.progress_label.grid(row=8, column=0, columnspan=2, sticky="w", pady=(8, 0))
+
+        btns = ttk.Frame(form)
+        btns.grid(row=9, column=0, columnspan=2, pady=(10, 0))
+        self.export_btn = ttk.Button(btns, text="Exportar", command=self.export)
+        self.export_btn.grid(row=0, column=0, padx=6)
+        ttk.Button(btns, text="Fechar", command=self.root.destroy).grid(row=0, column=1, padx=6)
+
+    def export(self):
+        fmt, compress = self.fmt.get(), self.compress.get()
+        ext = "." + fmt + (".gz" if compress else "")
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension=ext,
+                                            initialfile=self.kind.get() + ext)
+        if not path:
+            return
+        filters = {k: e.get().strip() or None for k, e in self.entries.items()}
+        filters["status"] = self.status.get() or None
+        run = exporter.export_students if self.kind.get() == "alunos" else exporter.export_payments
+
+        self._written = 0
+        self._running = True
+        self._started = time.perf_counter()
+        self.export_btn.state(["disabled"])
+
+        def progress(n):
+            # runs on the worker thread; the label is refreshed by _poll_progress
+            self._written = n
+
+        self.worker.submit(lambda: run(path, fmt, compress, progress=progress, **filters),
+                           on_done=self.finished, on_error=self.failed)
+        self._poll_progress()
+
+    def _poll_progress(self):
+        if not self._running or not self.root.winfo_exists():
+            return
+        self.progress_label.config(text=f"{self._written} linhas exportadas...")
+        self.root.after(200, self._poll_progress)
+
+    def finished(self, total):
+        self._running = False
+        if not self.root.winfo_exists():
+            return
+        elapsed = time.perf_counter() - self._started
+        self.export_btn.state(["!disabled"])
+        self.progress_label.config(text=f"{total} linhas exportadas em {elapsed:.1f}s")
+
+    def failed(self, exc):
+        self._running = False
+        if self.root.winfo_exists():
+            self.export_btn.state(["!disabled"])
+            messagebox.showerror("Erro", f"Falha na exportação:\n{exc}", parent=self.root)
@@ -0,0 +1,128 @@
+import argparse
+import csv
+import gzip
+import json
+import sys
+import time
+
+import archive
+from database import init_db, get_connection
+from utils import br_to_iso
+
+FETCH_SIZE = 2000
+
+STUDENT_COLUMNS = ["id", "name", "professor", "turma", "payment_date", "payment_method",
+                   "assinatura", "status_pagamento"]
+PAYMENT_COLUMNS = ["id", "student_id", "student_name", "turma", "professor", "month", "year",
+                   "payment_date", "payment_method", "amount", "status_pagamento"]
+
+
+def _filters(prefix: str, turma=None, professor=None, status=None, date_from=None, date_to=None):
+    """Monta o WHERE a partir dos filtros informados (datas em DD/MM/AAAA ou ISO)."""
+    conds, params = [], []
+    for column, value in (("s.turma", turma), ("s.professor", professor), (f"{prefix}.status_pagamento", status)):
+        if value:
+            conds.append(f"{column} = ?")
+            params.append(value)
+    if date_from:
+        conds.append(f"{prefix}.payment_date >= ?")
+        params.append(br_to_iso(date_from))
+    if date_to:
+        conds.append(f"{prefix}.payment_date <= ?")
+        params.append(br_to_iso(date_to))
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+
+def _open(path: str, compress: bool):
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def _stream(queries, columns, path: str, fmt: str, compress: bool, progress=None) -> int:
+    """Grava o resultado das consultas (sql, parâmetros), uma após a outra, em lotes de FETCH_SIZE linhas.
+
+    `queries` pode ser um gerador: cada consulta só é pedida depois que a
+    anterior foi lida até o fim (os arquivos anuais são anexados nesse meio).
+    """
+    conn = get_connection()
+    written = 0
+    with _open(path, compress) as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+        for sql, params in queries:
+            cur = conn.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                if fmt == "csv":
+                    writer.writerows(rows)
+                else:
+                    f.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+                written += len(rows)
+                if progress:
+                    progress(written)
+    return written
+
+
+def export_students(path: str, fmt: str = "csv", compress: bool = False, progress=None, **filters) -> int:
+    """Alunos do banco principal e, antes deles, os formados que saíram para os arquivos anuais."""
+    where, params = _filters("s", **filters)
+    select = ", ".join("s." + c for c in STUDENT_COLUMNS)
+
+    def queries():
+        graduated = where + (" AND " if where else " WHERE ") + "s.graduated = 1"
+        for schema in archive.schemas(get_connection()):
+            yield f"SELECT {select} FROM {schema}.students s{graduated} ORDER BY s.id", params
+        yield f"SELECT {select} FROM students s{where} ORDER BY s.id", params
+
+    return _stream(queries(), STUDENT_COLUMNS, path, fmt, compress, progress)
+
+
+def export_payments(path: str, fmt: str = "csv", compress: bool = False, progress=None, **filters) -> int:
+    """Pagamentos dos anos arquivados que caem no período (do mais antigo ao mais novo) e depois os do banco principal."""
+    where, params = _filters("p", **filters)
+    select = ("SELECT p.id, p.student_id, s.name, s.turma, s.professor, p.month, p.year, p.payment_date, "
+              "p.payment_method, p.amount, p.status_pagamento")
+
+    def queries():
+        date_range = br_to_iso(filters.get("date_from")), br_to_iso(filters.get("date_to"))
+        for schema in archive.schemas(get_connection(), *date_range):
+            # turma e professor vêm do retrato do aluno guardado no arquivo
+            yield (f"{select} FROM {schema}.payments p LEFT JOIN {schema}.students s ON s.id = p.student_id"
+                   f"{where} ORDER BY p.id"), params
+        yield f"{select} FROM payments p LEFT JOIN students s ON s.id = p.student_id{where} ORDER BY p.id", params
+
+    return _stream(queries(), PAYMENT_COLUMNS, path, fmt, compress, progress)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Exporta alunos ou pagamentos em CSV ou JSON Lines.")
+    parser.add_argument("tipo", choices=["alunos", "pagamentos"])
+    parser.add_argument("arquivo")
+    parser.add_argument("--formato", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--gzip", action="store_true", help="compacta a saída (padrão para arquivos .gz)")
+    parser.add_argument("--turma")
+    parser.add_argument("--professor")
+    parser.add_argument("--status", choices=["Pago", "Pendente"])
+    parser.add_argument("--de", dest="date_from", help="data inicial DD/MM/AAAA")
+    parser.add_argument("--ate", dest="date_to", help="data final DD/MM/AAAA")
+    args = parser.parse_args(argv)
+
+    init_db()
+    export = export_students if args.tipo == "alunos" else export_payments
+    start = time.perf_counter()
+    total = export(args.arquivo, args.formato, args.gzip or args.arquivo.endswith(".gz"),
+                   progress=lambda n: print(f"\r{n} linhas...", end="", file=sys.stderr),
+                   turma=args.turma, professor=args.professor, status=args.status,
+                   date_from=args.date_from, date_to=args.date_to)
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    print(f"{total} linhas exportadas em {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
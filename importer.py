@@ -0,0 +1,199 @@
+import argparse
+import csv
+import sys
+import time
+
+from database import init_db, transaction, get_writer, bump_generation
+from utils import br_to_iso, validate_payment_fields
+
+CHUNK_SIZE = 1000
+
+# cabeçalhos aceitos no CSV -> coluna no banco
+STUDENT_HEADERS = {
+    "name": "name", "nome": "name",
+    "professor": "professor",
+    "turma": "turma",
+    "payment_date": "payment_date", "data de pagamento": "payment_date",
+    "payment_method": "payment_method", "forma de pagamento": "payment_method",
+    "assinatura": "assinatura",
+    "status_pagamento": "status_pagamento", "status": "status_pagamento",
+}
+PAYMENT_HEADERS = {
+    "student_id": "student_id", "aluno_id": "student_id",
+    "month": "month", "mes": "month", "mês": "month",
+    "year": "year", "ano": "year",
+    "payment_date": "payment_date", "data": "payment_date",
+    "payment_method": "payment_method", "forma": "payment_method",
+    "amount": "amount", "valor": "amount",
+    "status_pagamento": "status_pagamento", "status": "status_pagamento",
+}
+STATUSES = ("Pendente", "Pago")
+
+
+class ImportReport:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.inserted = 0
+        self.rejected: list[tuple[int, str, dict]] = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.inserted / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.inserted} {self.kind} importados, {len(self.rejected)} rejeitados "
+                f"em {self.elapsed:.2f}s ({self.rows_per_second:.0f} linhas/s)")
+
+
+def _open_reader(path: str, headers: dict):
+    f = open(path, newline="", encoding="utf-8-sig")
+    sample = f.read(4096)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(f, dialect)
+    header = next(reader, [])
+    columns = [headers.get(h.strip().lower()) for h in header]
+    return f, reader, columns
+
+
+def _rows(reader, columns):
+    """Gera (número da linha, dict) já com as colunas normalizadas."""
+    for line_no, values in enumerate(reader, start=2):
+        if not any(v.strip() for v in values):
+            continue
+        yield line_no, {col: v.strip() for col, v in zip(columns, values) if col}
+
+
+def _status(value: str) -> str:
+    if not value:
+        return "Pendente"
+    for s in STATUSES:
+        if value.lower() == s.lower():
+            return s
+    raise ValueError("Status inválido.")
+
+
+def _validate_student(row: dict) -> tuple:
+    if not row.get("name"):
+        raise ValueError("O campo Nome é obrigatório.")
+    try:
+        pdate = br_to_iso(row.get("payment_date"))
+    except ValueError:
+        raise ValueError("Data inválida. Use o formato DD/MM/AAAA.")
+    return (row["name"], row.get("professor", ""), row.get("turma", ""), pdate,
+            row.get("payment_method", ""), row.get("assinatura", ""), _status(row.get("status_pagamento", "")))
+
+
+def _validate_payment(row: dict) -> tuple:
+    try:
+        student_id = int(row.get("student_id", ""))
+    except ValueError:
+        raise ValueError("Aluno inválido.")
+    month, year, pdate, method, amount = validate_payment_fields(
+        row.get("month", ""), row.get("year", ""), row.get("payment_date", ""),
+        row.get("payment_method", ""), row.get("amount", ""))
+    return student_id, month, year, pdate, method, amount, _status(row.get("status_pagamento", ""))
+
+
+def _insert_students(conn, batch):
+    conn.executemany("INSERT INTO students (name, professor, turma, payment_date, payment_method, assinatura, status_pagamento) "
+                     "VALUES (?,?,?,?,?,?,?)", [values for _, _, values in batch])
+    bump_generation(conn, "students")
+    return batch, []
+
+
+def _insert_payments(conn, batch):
+    ids = sorted({values[0] for _, _, values in batch})
+    known = set()
+    for i in range(0, len(ids), 500):
+        part = ids[i:i + 500]
+        known.update(r[0] for r in conn.execute(
+            f"SELECT id FROM students WHERE id IN ({','.join('?' * len(part))})", part))
+    ok = [item for item in batch if item[2][0] in known]
+    missing = [(line_no, "Aluno não encontrado.", row) for line_no, row, values in batch if values[0] not in known]
+    conn.executemany("INSERT INTO payments (student_id, month, year, payment_date, payment_method, amount, status_pagamento) "
+                     "VALUES (?,?,?,?,?,?,?)", [values for _, _, values in ok])
+    bump_generation(conn, "payments")
+    return ok, missing
+
+
+def _import(path, kind, headers, validate, insert, chunk_size, progress):
+    report = ImportReport(kind)
+    start = time.perf_counter()
+    f, reader, columns = _open_reader(path, headers)
+    try:
+        batch = []
+
+        def write(batch):
+            with transaction() as conn:
+                return insert(conn, batch)
+
+        def flush():
+            # cada lote é gravado numa única transação, pelo escritor único
+            inserted, rejected = get_writer().call(write, batch)
+            report.inserted += len(inserted)
+            report.rejected.extend(rejected)
+            batch.clear()
+            if progress:
+                progress(report)
+
+        for line_no, row in _rows(reader, columns):
+            try:
+                batch.append((line_no, row, validate(row)))
+            except ValueError as exc:
+                report.rejected.append((line_no, str(exc), row))
+            if len(batch) >= chunk_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        f.close()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def import_students(path: str, chunk_size: int = CHUNK_SIZE, progress=None) -> ImportReport:
+    return _import(path, "alunos", STUDENT_HEADERS, _validate_student, _insert_students, chunk_size, progress)
+
+
+def import_payments(path: str, chunk_size: int = CHUNK_SIZE, progress=None) -> ImportReport:
+    return _import(path, "pagamentos", PAYMENT_HEADERS, _validate_payment, _insert_payments, chunk_size, progress)
+
+
+def write_rejects(report: ImportReport, path: str):
+    """Grava as linhas rejeitadas (com o motivo) para correção e reimportação."""
+    fields = sorted({k for _, _, row in report.rejected for k in row})
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["linha", "motivo"] + fields)
+        for line_no, reason, row in report.rejected:
+            writer.writerow([line_no, reason] + [row.get(k, "") for k in fields])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Importa alunos ou pagamentos de arquivos CSV.")
+    parser.add_argument("tipo", choices=["alunos", "pagamentos"])
+    parser.add_argument("arquivo")
+    parser.add_argument("--lote", type=int, default=CHUNK_SIZE, help="linhas por transação")
+    parser.add_argument("--rejeitados", help="CSV onde gravar as linhas rejeitadas")
+    args = parser.parse_args(argv)
+
+    init_db()
+    importer = import_students if args.tipo == "alunos" else import_payments
+    report = importer(args.arquivo, args.lote,
+                      progress=lambda r: print(f"\r{r.inserted} linhas...", end="", file=sys.stderr))
+    print(file=sys.stderr)
+    print(report.summary())
+    if report.rejected:
+        rejects = args.rejeitados or args.arquivo + ".rejeitados.csv"
+        write_rejects(report, rejects)
+        print(f"linhas rejeitadas gravadas em {rejects}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+import services
+from utils import br_to_iso, iso_to_br
+
+PAGE_SIZE = 100
+
+
+class LedgerWindow:
+    """Livro-caixa de todos os pagamentos da escola, com filtros e total acumulado."""
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.root = tk.Toplevel()
+        self.root.title("Livro-caixa de Pagamentos")
+        self.root.geometry("1000x600")
+
+        self.filters = {}
+        self.history = []       # (cursor, carry) de cada página já visitada
+        self.next_cursor = None
+        self.next_carry = 0.0
+
+        bar = ttk.Frame(self.root, padding=8)
+        bar.pack(fill="x")
+        self.status = tk.StringVar(value="")
+        self.method = tk.StringVar(value="")
+        ttk.Label(bar, text="Status").pack(side="left")
+        ttk.Combobox(bar, textvariable=self.status, values=["", "Pago", "Pendente"], state="readonly", width=10).pack(side="left", padx=4)
+        ttk.Label(bar, text="Forma").pack(side="left", padx=(10, 0))
+        self.method_combo = ttk.Combobox(bar, textvariable=self.method, values=[""], width=14)
+        self.method_combo.pack(side="left", padx=4)
+        ttk.Label(bar, text="De").pack(side="left", padx=(10, 0))
+        self.date_from = ttk.Entry(bar, width=11)
+        self.date_from.pack(side="left", padx=4)
+        ttk.Label(bar, text="Até").pack(side="left")
+        self.date_to = ttk.Entry(bar, width=11)
+        self.date_to.pack(side="left", padx=4)
+        ttk.Button(bar, text="Filtrar", command=self.apply_filters).pack(side="left", padx=8)
+
+        cols = ("Mês", "Ano", "Data", "Aluno", "Forma", "Valor", "Status", "Acumulado")
+        self.tree = ttk.Treeview(self.root, columns=cols, show="headings")
+        for c in cols:
+            self.tree.heading(c, text=c)
+            self.tree.column(c, anchor="center", width=110)
+        self.tree.column("Aluno", width=220, anchor="w")
+        self.tree.pack(fill="both", expand=True, padx=8, pady=4)
+
+        nav = ttk.Frame(self.root, padding=(8, 0, 8, 8))
+        nav.pack(fill="x")
+        self.prev_btn = ttk.Button(nav, text="◀ Anterior", command=self.prev_page)
+        self.prev_btn.pack(side="left")
+        self.next_btn = ttk.Button(nav, text="Próxima ▶", command=self.next_page)
+        self.next_btn.pack(side="left", padx=6)
+        self.page_label = ttk.Label(nav, text="")
+        self.page_label.pack(side="left", padx=12)
+        ttk.Button(nav, text="Marcar selecionados como pagos", command=self.mark_paid).pack(side="right")
+
+        self.worker.submit(services.payment_methods, on_done=self.show_methods)
+        self.apply_filters()
+
+    def show_methods(self, methods):
+        if self.root.winfo_exists():
+            self.method_combo.configure(values=[""] + methods)
+
+    def apply_filters(self):
+        try:
+            self.filters = {
+                "status": self.status.get() or None,
+                "method": self.method.get().strip() or None,
+                "date_from": br_to_iso(self.date_from.get()),
+                "date_to": br_to_iso(self.date_to.get()),
+            }
+        except ValueError:
+            messagebox.showerror("Erro", "Data inválida. Use o formato DD/MM/AAAA.", parent=self.root)
+            return
+        self.history = []
+        self.load_page(None, 0.0)
+
+    def load_page(self, cursor, carry):
+        self.history.append((cursor, carry))
+        self.worker.submit(services.ledger_page, self.filters, cursor, carry, PAGE_SIZE + 1,
+                           on_done=self.show_page, on_error=self.failed, key=("ledger", id(self)))
+
+    def show_page(self, rows):
+        if not self.root.winfo_exists():
+            return
+        has_next = len(rows) > PAGE_SIZE
+        rows = rows[:PAGE_SIZE]
+        self.tree.delete(*self.tree.get_children())
+        for pid, year, month, pdate, name, method, amount, status, running in rows:
+            month_display = f"{month:02d}" if isinstance(month, int) else ""
+            amount_display = f"R$ {amount:.2f}" if amount is not None else ""
+            self.tree.insert("", "end", iid=pid, values=(month_display, year, iso_to_br(pdate), name or "",
+                                                         method or "", amount_display, status, f"R$ {running:.2f}"))
+        if rows:
+            last = rows[-1]
+            self.next_cursor, self.next_carry = (last[1], last[2], last[0]), last[-1]
+        self.next_btn.state(["!disabled"] if has_next else ["disabled"])
+        self.prev_btn.state(["!disabled"] if len(self.history) > 1 else ["disabled"])
+        self.page_label.config(text=f"Página {len(self.history)}")
+
+    def next_page(self):
+        self.load_page(self.next_cursor, self.next_carry)
+
+    def prev_page(self):
+        if len(self.history) < 2:
+            return
+        self.history.pop()
+        cursor, carry = self.history.pop()
+        self.load_page(cursor, carry)
+
+    def mark_paid(self):
+        ids = [int(iid) for iid in self.tree.selection()]
+        if not ids:
+            messagebox.showwarning("Aviso", "Selecione um ou mais pagamentos.", parent=self.root)
+            return
+
+        def done(change):
+            if not self.root.winfo_exists():
+                return
+            # relê a página atual: o acumulado não muda, mas o status sim
+            cursor, carry = self.history.pop()
+            self.load_page(cursor, carry)
+            messagebox.showinfo("Sucesso", f"{len(change.rows)} pagamentos marcados como Pago.", parent=self.root)
+
+        self.worker.submit(services.mark_payments_paid, ids, on_done=done, on_error=self.failed)
+
+    def failed(self, exc):
+        if self.root.winfo_exists():
+            messagebox.showerror("Erro", f"Falha ao carregar pagamentos:\n{exc}", parent=self.root)
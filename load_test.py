@@ -0,0 +1,407 @@
+# Simulação de vários balcões atendendo ao mesmo tempo sobre o mesmo banco.
+#
+# Cada balcão é um processo (como um computador da secretaria com o sistema
+# aberto) e cada funcionário é uma thread desse processo (como as janelas e o
+# DbWorker de uma mesma instalação, ou os clientes do api_server). Os
+# funcionários repetem o fluxo das telas com as mesmas funções de services:
+# login, busca, listagem, histórico, lançamento e validação de pagamento,
+# sorteados segundo o mix configurado e separados por pausas ("tempo de
+# pensar"). Ao final sai, por operação, a vazão, os percentis de latência e
+# quantas falharam com "database is locked"/"busy".
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import date
+
+import database
+import services
+from synthetic_data import FIRST_NAMES, LAST_NAMES, METHODS
+from utils import validate_payment_fields
+
+DEFAULT_DB = os.path.join(database.BASE_DIR, "benchmark.db")
+OPERATIONS = ("login", "busca", "listagem", "historico", "pagamento", "validacao")
+DEFAULT_MIX = "login=1,busca=4,listagem=3,historico=4,pagamento=2,validacao=1"
+LOGIN_USER = "user"          # criado por init_db (seed_users)
+LOGIN_PASSWORD = "123"
+START_TIMEOUT = 60.0         # segundos para todos os balcões abrirem o banco
+MAX_MESSAGES = 5             # mensagens de erro distintas guardadas por operação
+
+
+class LoadError(Exception):
+    pass
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """"busca=4,historico=2" -> pesos por operação (as não citadas ficam com 0)."""
+    mix = dict.fromkeys(OPERATIONS, 0.0)
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in mix:
+            raise ValueError(f"operação desconhecida: {name!r} (use {', '.join(OPERATIONS)})")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"peso inválido para {name}: {weight!r}")
+        if mix[name] < 0:
+            raise ValueError(f"peso negativo para {name}")
+    if not any(mix.values()):
+        raise ValueError("o mix precisa de ao menos uma operação com peso maior que zero")
+    return mix
+
+
+# ---------------- Funcionário ----------------
+class Clerk:
+    """Um funcionário do balcão: repete o fluxo das telas, com pausas entre as ações.
+
+    Guarda o aluno "aberto" (o último encontrado na busca ou na listagem) e os
+    pagamentos que lançou e ainda não validou, como faria quem está atendendo.
+    """
+
+    def __init__(self, mix: dict[str, float], think: float, rng: random.Random, max_student: int):
+        self.names = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.names]
+        self.think = think
+        self.rng = rng
+        self.max_student = max_student
+        self.student: int | None = None
+        self.pending: list[int] = []
+        self.tally = {name: {"latencias": [], "bloqueios": 0, "erros": 0, "mensagens": Counter()}
+                      for name in self.names}
+
+    def _pick(self, rows):
+        if rows:
+            self.student = self.rng.choice(rows)[0]
+
+    def _student(self) -> int:
+        if self.student is None:
+            self.student = self.rng.randint(1, self.max_student)
+        return self.student
+
+    def login(self):
+        ok, _ = services.authenticate(LOGIN_USER, LOGIN_PASSWORD)
+        if not ok:
+            raise LoadError(f"login recusado para {LOGIN_USER!r}")
+
+    def busca(self):
+        # o que se digita no balcão: um nome, às vezes com o sobrenome, às vezes só o começo
+        term = self.rng.choice(FIRST_NAMES)
+        if self.rng.random() < 0.5:
+            term += " " + self.rng.choice(LAST_NAMES)
+        elif self.rng.random() < 0.5:
+            term = term[:3]
+        self._pick(services.list_students(term)[1])
+
+    def listagem(self):
+        self._pick(services.list_students("")[1])
+
+    def historico(self):
+        sid = self._student()
+        services.generation("payments")
+        rows = services.payment_history(sid)
+        services.archived_payment_history(sid)
+        for row in rows:
+            if row[-1] == "Pendente" and row[0] not in self.pending:
+                self.pending.append(row[0])
+                break
+
+    def pagamento(self):
+        today = date.today()
+        fields = validate_payment_fields(today.month, today.year, today.strftime("%d/%m/%Y"),
+                                         self.rng.choice(METHODS), f"{self.rng.uniform(150, 900):.2f}".replace(".", ","))
+        change = services.add_payment(self._student(), *fields)
+        self.pending.append(change.row[0])
+
+    def validacao(self):
+        if self.pending:
+            services.mark_payments_paid([self.pending.pop()])
+        else:
+            services.mark_students_paid([self._student()])
+
+    def run(self, deadline: float):
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            name = self.rng.choices(self.names, self.weights)[0]
+            entry = self.tally[name]
+            start = time.perf_counter()
+            try:
+                getattr(self, name)()
+            except Exception as exc:
+                if database.is_busy(exc):
+                    entry["bloqueios"] += 1
+                else:
+                    entry["erros"] += 1
+                    message = f"{type(exc).__name__}: {exc}"
+                    if message in entry["mensagens"] or len(entry["mensagens"]) < MAX_MESSAGES:
+                        entry["mensagens"][message] += 1
+            else:
+                entry["latencias"].append(time.perf_counter() - start)
+            if self.think:
+                pause = self.rng.expovariate(1 / self.think)
+                time.sleep(max(0.0, min(pause, deadline - time.monotonic())))
+
+
+def _merge(total: dict, tally: dict):
+    for name, entry in tally.items():
+        into = total.setdefault(name, {"latencias": [], "bloqueios": 0, "erros": 0, "mensagens": Counter()})
+        into["latencias"] += entry["latencias"]
+        into["bloqueios"] += entry["bloqueios"]
+        into["erros"] += entry["erros"]
+        into["mensagens"].update(entry["mensagens"])
+
+
+# ---------------- Balcão (processo) ----------------
+def _prepare(db_path: str) -> int:
+    if os.path.abspath(database.DB_PATH) != os.path.abspath(db_path):
+        # use_database fecha as conexões abertas (e as tabelas TEMP de _snapshot)
+        database.use_database(db_path)
+    max_student = database.get_connection().execute("SELECT MAX(id) FROM students").fetchone()[0]
+    if not max_student:
+        raise LoadError("banco sem alunos: gere dados com synthetic_data.py")
+    return max_student
+
+
+def _run_clerks(station: int, clerks: int, mix, think, duration, seed, max_student) -> dict:
+    """Roda `clerks` funcionários em threads até `duration` segundos; devolve o resultado somado."""
+    deadline = time.monotonic() + duration
+    staff = [Clerk(mix, think, random.Random(f"{seed}-{station}-{i}"), max_student) for i in range(clerks)]
+    threads = [threading.Thread(target=clerk.run, args=(deadline,), name=f"balcao-{station}-{i}", daemon=True)
+               for i, clerk in enumerate(staff)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tally: dict = {}
+    for clerk in staff:
+        _merge(tally, clerk.tally)
+    writer = database.get_writer()
+    return {"operacoes": tally, "commits": writer.commits, "escritas": writer.writes, "novas_tentativas": writer.retries}
+
+
+def _station(station: int, db_path: str, clerks: int, mix, think, duration, seed, out, go):
+    """Processo de um balcão: abre o banco, avisa que está pronto e espera a largada."""
+    try:
+        max_student = _prepare(db_path)
+        out.put(("pronto", station, None))
+        go.wait()
+        out.put(("resultado", station, _run_clerks(station, clerks, mix, think, duration, seed, max_student)))
+    except BaseException:
+        out.put(("erro", station, traceback.format_exc()))
+    finally:
+        database.close_connections()
+
+
+class LoadResult:
+    def __init__(self, processes: int, threads: int, elapsed: float, stations: list[dict]):
+        self.processes = processes
+        self.threads = threads
+        self.elapsed = elapsed
+        self.operations: dict = {}
+        for station in stations:
+            _merge(self.operations, station["operacoes"])
+        self.commits = sum(s["commits"] for s in stations)
+        self.writes = sum(s["escritas"] for s in stations)
+        self.retries = sum(s["novas_tentativas"] for s in stations)
+
+    def stats(self) -> dict[str, dict]:
+        """Por operação: execuções, vazão, percentis (só das bem-sucedidas) e falhas."""
+        result = {}
+        for name in OPERATIONS:
+            entry = self.operations.get(name)
+            if entry is None:
+                continue
+            ordered = sorted(entry["latencias"])
+            result[name] = {
+                "ok": len(ordered),
+                "por_s": round(len(ordered) / self.elapsed, 2) if self.elapsed else 0.0,
+                "p50_ms": _percentile(ordered, 50),
+                "p95_ms": _percentile(ordered, 95),
+                "p99_ms": _percentile(ordered, 99),
+                "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+                "bloqueios": entry["bloqueios"],
+                "erros": entry["erros"],
+                "mensagens": dict(entry["mensagens"]),
+            }
+        return result
+
+    @property
+    def lock_errors(self) -> int:
+        return sum(entry["bloqueios"] for entry in self.operations.values())
+
+    def summary(self) -> str:
+        done = sum(len(entry["latencias"]) for entry in self.operations.values())
+        return (f"{self.processes} balcão(ões) x {self.threads} funcionário(s): {done} operações em "
+                f"{self.elapsed:.1f}s ({done / self.elapsed if self.elapsed else 0:.1f}/s), "
+                f"{self.lock_errors} bloqueio(s); {self.writes} escritas em {self.commits} commits, "
+                f"{self.retries} nova(s) tentativa(s) por banco ocupado")
+
+    def table(self) -> list[str]:
+        lines = [f"{'operação':<11}{'ok':>8}{'/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}"
+                 f"{'bloqueios':>11}{'erros':>7}"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:<11}{s['ok']:>8}{s['por_s']:>9.2f}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}"
+                         f"{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}{s['bloqueios']:>11}{s['erros']:>7}")
+        return lines
+
+    def as_dict(self) -> dict:
+        return {"balcoes": self.processes, "funcionarios_por_balcao": self.threads,
+                "duracao_s": round(self.elapsed, 3), "commits": self.commits, "escritas": self.writes,
+                "novas_tentativas": self.retries, "operacoes": self.stats()}
+
+
+def _percentile(ordered: list[float], p: int) -> float:
+    """Percentil pelo método do posto mais próximo, em ms (o mesmo de diagnostics)."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * p // 100))
+    return round(ordered[rank - 1] * 1000, 3)
+
+
+def simulate(db_path: str, processes: int = 1, threads: int = 4, mix: dict | None = None,
+             think: float = 1.0, duration: float = 30.0, seed: int = 7) -> LoadResult:
+    """Roda processes x threads funcionários por `duration` segundos sobre o banco em `db_path`.
+
+    Com um único processo os funcionários rodam em threads deste mesmo
+    processo; com mais, cada balcão é um processo novo (spawn) e todos
+    começam juntos, depois de terem aberto o banco. `think` é a pausa média
+    entre duas ações, em segundos (0 = sem pausa).
+    """
+    mix = mix or parse_mix(DEFAULT_MIX)
+    if processes < 1 or threads < 1:
+        raise LoadError("informe ao menos um balcão e um funcionário por balcão")
+    if processes == 1:
+        max_student = _prepare(db_path)
+        start = time.perf_counter()
+        station = _run_clerks(0, threads, mix, think, duration, seed, max_student)
+        return LoadResult(1, threads, time.perf_counter() - start, [station])
+
+    ctx = multiprocessing.get_context("spawn")
+    out, go = ctx.Queue(), ctx.Event()
+    workers = [ctx.Process(target=_station, args=(i, db_path, threads, mix, think, duration, seed, out, go),
+                           name=f"balcao-{i}", daemon=True) for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    try:
+        _wait(out, workers, "pronto", START_TIMEOUT)
+        go.set()
+        start = time.perf_counter()
+        stations = _wait(out, workers, "resultado", duration + START_TIMEOUT)
+        elapsed = time.perf_counter() - start
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+    return LoadResult(processes, threads, elapsed, stations)
+
+
+def _wait(out, workers, kind: str, timeout: float) -> list:
+    """Espera a mensagem `kind` de todos os balcões; um erro ou processo morto aborta a simulação."""
+    received = {}
+    deadline = time.monotonic() + timeout
+    while len(received) < len(workers):
+        try:
+            got, station, payload = out.get(timeout=1.0)
+        except queue.Empty:
+            dead = [w.name for i, w in enumerate(workers) if i not in received and not w.is_alive()]
+            if dead:
+                raise LoadError(f"balcão encerrado sem resposta: {', '.join(dead)}")
+            if time.monotonic() > deadline:
+                raise LoadError(f"os balcões não responderam em {timeout:.0f}s")
+            continue
+        if got == "erro":
+            raise LoadError(f"falha no balcão {station}:\n{payload}")
+        received[station] = payload
+    return [received[i] for i in sorted(received)]
+
+
+def _snapshot(conn):
+    """Guarda (em tabelas TEMP desta conexão) quem está pendente antes da simulação."""
+    conn.execute("DROP TABLE IF EXISTS temp.load_pending_students")
+    conn.execute("DROP TABLE IF EXISTS temp.load_pending_payments")
+    conn.execute("CREATE TEMP TABLE load_pending_students AS SELECT id FROM students WHERE status_pagamento = 'Pendente'")
+    conn.execute("CREATE TEMP TABLE load_pending_payments AS SELECT id FROM payments WHERE status_pagamento = 'Pendente'")
+
+
+def _restore(last_payment: int):
+    """Desfaz os lançamentos e as validações, para que execuções repetidas usem o mesmo banco.
+
+    Roda na mesma thread (e conexão) de _snapshot.
+    """
+    with database.transaction() as c:
+        c.execute("DELETE FROM payments WHERE id > ?", (last_payment,))
+        c.execute("UPDATE payments SET status_pagamento = 'Pendente' "
+                  "WHERE status_pagamento = 'Pago' AND id IN (SELECT id FROM temp.load_pending_payments)")
+        c.execute("UPDATE students SET status_pagamento = 'Pendente' "
+                  "WHERE status_pagamento = 'Pago' AND id IN (SELECT id FROM temp.load_pending_students)")
+        database.bump_generation(c, "payments")
+        database.bump_generation(c, "students")
+    c.execute("DROP TABLE temp.load_pending_students")
+    c.execute("DROP TABLE temp.load_pending_payments")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Simula vários balcões usando o mesmo banco ao mesmo tempo.")
+    parser.add_argument("--banco", default=DEFAULT_DB, help="banco a usar (gere com synthetic_data.py)")
+    parser.add_argument("--processos", type=int, default=2, help="balcões (um processo cada)")
+    parser.add_argument("--threads", type=int, default=2, help="funcionários por balcão")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"pesos das operações (padrão: {DEFAULT_MIX})")
+    parser.add_argument("--pensar", type=float, default=1.0, help="pausa média entre ações, em segundos")
+    parser.add_argument("--duracao", type=float, default=30.0, help="segundos de simulação")
+    parser.add_argument("--semente", type=int, default=7)
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo")
+    parser.add_argument("--manter", action="store_true",
+                        help="mantém os pagamentos lançados e as validações feitas pela simulação "
+                             "(por padrão o banco volta ao estado de antes)")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if os.path.abspath(args.banco) == os.path.abspath(database.DB_PATH):
+        parser.error("a simulação grava no banco; use uma cópia ou um banco sintético, não o de produção")
+    if not os.path.exists(args.banco):
+        print(f"banco não encontrado: {args.banco} (gere com synthetic_data.py)", file=sys.stderr)
+        return 1
+
+    database.use_database(args.banco)
+    database.init_db()
+    conn = database.get_connection()
+    last_payment = conn.execute("SELECT COALESCE(MAX(id), 0) FROM payments").fetchone()[0]
+    if not args.manter:
+        _snapshot(conn)
+    try:
+        result = simulate(args.banco, args.processos, args.threads, mix, args.pensar, args.duracao, args.semente)
+    except LoadError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    finally:
+        if not args.manter:
+            _restore(last_payment)
+
+    print(result.summary())
+    for line in result.table():
+        print(line)
+    for name, s in result.stats().items():
+        for message, count in s["mensagens"].items():
+            print(f"ERRO {name} ({count}x): {message}", file=sys.stderr)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(result.as_dict(), f, indent=2, ensure_ascii=False)
+        print(f"resultados gravados em {args.saida}")
+    return 1 if result.lock_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from pathlib import Path
-from PIL import Image, ImageTk
 
-from utils import get_art_path
-from database import verify_user
-from admin_window import AdminWindow
+from assets import load_image
+from services import authenticate
 
 
 class LoginWindow:
@@ -46,16 +43,10 @@ class LoginWindow:
     # --------------------------
     def _build_ui(self):
         # Logo
-        logo_path = get_art_path("logo.png")
-
-        if Path(logo_path).exists():
-            try:
-                img = Image.open(logo_path).resize((120, 120))
-                self.logo_img = ImageTk.PhotoImage(img)
-                tk.Label(self.root, image=self.logo_img, bg="#F2F2F2").pack(pady=(25, 10))
-            except:
-                tk.Label(self.root, text="IEGV", font=("Segoe UI", 32, "bold"),
-                         fg=self.primary, bg="#F2F2F2").pack(pady=10)
+        self.logo_img = load_image("logo.png", (120, 120), master=self.root)
+
+        if self.logo_img is not None:
+            tk.Label(self.root, image=self.logo_img, bg="#F2F2F2").pack(pady=(25, 10))
         else:
             tk.Label(self.root, text="IEGV", font=("Segoe UI", 32, "bold"),
                      fg=self.primary, bg="#F2F2F2").pack(pady=10)
@@ -92,13 +83,16 @@ class LoginWindow:
             messagebox.showerror("Erro", "Preencha usuário e senha.")
             return
 
-        ok, is_admin = verify_user(username, password)
+        ok, is_admin = authenticate(username, password)
 
         if not ok:
             messagebox.showerror("Erro", "Usuário ou senha incorretos.")
             return
 
         # LOGIN OK → Abre o sistema
+        # importado só agora: a tela de login não precisa carregar o painel
+        from admin_window import AdminWindow
+
         self.root.destroy()
         app = tk.Tk()
         AdminWindow(app, is_admin=is_admin, username=username)
@@ -1,9 +1,74 @@
+import multiprocessing
+import sys
+import time
+
+_START = time.perf_counter()
+
 import tkinter as tk
-from database import init_db
+import diagnostics
+from database import init_db, close_connections
 from login_window import LoginWindow
+from backup import BackupScheduler
+from maintenance import MaintenanceThread, report_problems
+
+_IMPORTED = time.perf_counter()
+
+
+def print_startup_profile(marks: list[tuple[str, float]]):
+    """Relatório de inicialização (python main.py --perfil).
+
+    Para o detalhe por módulo use também: python -X importtime main.py --perfil
+    """
+    previous = _START
+    print("inicialização:", file=sys.stderr)
+    for label, moment in marks:
+        print(f"  {label:<24} {(moment - previous) * 1000:8.1f} ms", file=sys.stderr)
+        previous = moment
+    print(f"  {'até a primeira janela':<24} {(previous - _START) * 1000:8.1f} ms", file=sys.stderr)
+    heavy = [name for name in ("PIL", "admin_window", "importer", "exporter", "reports") if name in sys.modules]
+    print(f"  módulos carregados: {len(sys.modules)}; pesados já importados: {', '.join(heavy) or 'nenhum'}",
+          file=sys.stderr)
+
 
 if __name__ == "__main__":
-    init_db()
+    # os processos de recibos/extratos (spawn) precisam disto no executável empacotado
+    multiprocessing.freeze_support()
+    profile = "--perfil" in sys.argv[1:]
+    # --diagnostico grava as métricas de SQL e da tela em logs/diagnostico.json ao sair
+    dump = "--diagnostico" in sys.argv[1:]
+    marks = [("imports", _IMPORTED)]
+    fast = init_db()
+    marks.append(("init_db (rápido)" if fast else "init_db (migrações)", time.perf_counter()))
     root = tk.Tk()
+    marks.append(("tk.Tk()", time.perf_counter()))
     LoginWindow(root)
-    root.mainloop()
\ No newline at end of file
+    marks.append(("tela de login", time.perf_counter()))
+
+    # backups, verificação de integridade e optimize só começam com a janela na tela
+    scheduler = BackupScheduler(initial_delay=5.0)
+
+    def maintenance_finished(worker):
+        # chamado na thread da manutenção, que não depende da tela de login (destruída no login)
+        if profile:
+            print("manutenção em segundo plano:", file=sys.stderr)
+            for label, elapsed in worker.timings:
+                print(f"  {label:<28} {elapsed * 1000:8.1f} ms", file=sys.stderr)
+        report_problems(worker)
+
+    maintenance = MaintenanceThread(on_finished=maintenance_finished)
+
+    def first_frame():
+        root.update_idletasks()
+        marks.append(("primeiro desenho", time.perf_counter()))
+        diagnostics.record("ui", "time_to_first_window", marks[-1][1] - _START)
+        if profile:
+            print_startup_profile(marks)
+        scheduler.start()
+        maintenance.start()
+
+    root.after_idle(first_frame)
+    root.mainloop()
+    scheduler.stop()
+    close_connections()
+    if dump:
+        print(f"métricas gravadas em {diagnostics.dump_json()}", file=sys.stderr)
\ No newline at end of file
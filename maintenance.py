@@ -0,0 +1,132 @@
+import logging
+import sys
+import threading
+import time
+
+import archive
+import diagnostics
+import name_index
+from database import init_db, get_connection, transaction, serialized_write, seed_users
+
+logger = logging.getLogger("academia.maintenance")
+
+
+def integrity_check(full: bool = False) -> list[str]:
+    """Problemas encontrados pelo quick_check (ou integrity_check completo); lista vazia se ok."""
+    pragma = "integrity_check" if full else "quick_check"
+    rows = [row[0] for row in get_connection().execute(f"PRAGMA {pragma}")]
+    return [] if rows == ["ok"] else rows
+
+
+@serialized_write
+def optimize_and_seed() -> list[str]:
+    """Confere os usuários padrão e deixa o SQLite atualizar as estatísticas que estiverem velhas."""
+    with transaction() as conn:
+        seed_users(conn)
+        conn.execute("PRAGMA optimize")
+    return []
+
+
+def checkpoint() -> list[str]:
+    # PASSIVE: não espera leitores nem escritores
+    get_connection().execute("PRAGMA wal_checkpoint(PASSIVE)")
+    return []
+
+
+def cleanup_archives() -> list[str]:
+    archive.cleanup_files()
+    return []
+
+
+def refresh_name_index() -> list[str]:
+    if name_index.available(get_connection()):
+        name_index.refresh()
+    return []
+
+
+# tarefas adiadas da inicialização, na ordem em que rodam
+STEPS = [
+    ("verificação de integridade", integrity_check),
+    ("usuários padrão e optimize", optimize_and_seed),
+    ("checkpoint do WAL", checkpoint),
+    ("limpeza dos arquivos anuais", cleanup_archives),
+    ("índice da busca aproximada", refresh_name_index),
+]
+
+
+class MaintenanceThread(threading.Thread):
+    """Roda STEPS uma vez em segundo plano, depois que a primeira janela já apareceu.
+
+    Cada passo é cronometrado (também nas métricas de diagnostics, tipo
+    "manutencao"); `problems` junta o que os passos relataram ou as exceções.
+    Os backups continuam com o backup.BackupScheduler, iniciado no mesmo momento.
+    """
+
+    def __init__(self, steps=None, on_error=None, on_finished=None):
+        super().__init__(name="maintenance", daemon=True)
+        self.steps = STEPS if steps is None else steps
+        self.on_error = on_error
+        self.on_finished = on_finished
+        self.timings: list[tuple[str, float]] = []
+        self.problems: list[str] = []
+
+    def run(self):
+        try:
+            for label, step in self.steps:
+                start = time.perf_counter()
+                try:
+                    self.problems += [f"{label}: {p}" for p in step()]
+                except Exception as exc:
+                    self.problems.append(f"{label}: {exc}")
+                    if self.on_error:
+                        self.on_error(exc)
+                elapsed = time.perf_counter() - start
+                self.timings.append((label, elapsed))
+                diagnostics.record("manutencao", label, elapsed)
+        finally:
+            # roda nesta thread: nada de Tk aqui (ver report_problems)
+            if self.on_finished:
+                self.on_finished(self)
+
+
+# Problemas da manutenção do aplicativo ainda não mostrados. A passada começa
+# na tela de login, que é destruída no login; quem os mostra é a janela
+# principal (AdminWindow.check_maintenance), quando ela existir.
+_unreported: list[str] = []
+_unreported_lock = threading.Lock()
+
+
+def report_problems(worker: MaintenanceThread):
+    """on_finished da manutenção do aplicativo: registra os problemas no log e os guarda para a tela."""
+    for problem in worker.problems:
+        logger.warning("manutenção do banco: %s", problem)
+    with _unreported_lock:
+        _unreported.extend(worker.problems)
+
+
+def take_problems() -> list[str]:
+    """Problemas ainda não mostrados (e os esquece)."""
+    with _unreported_lock:
+        problems = _unreported[:]
+        _unreported.clear()
+    return problems
+
+
+def main(argv: list[str]) -> int:
+    """python maintenance.py [--completa]  (--completa usa integrity_check em vez de quick_check)"""
+    init_db()
+    steps = list(STEPS)
+    if "--completa" in argv:
+        steps[0] = (steps[0][0], lambda: integrity_check(full=True))
+    worker = MaintenanceThread(steps)
+    worker.start()
+    worker.join()
+    for label, elapsed in worker.timings:
+        print(f"{label:<30} {elapsed * 1000:8.1f} ms")
+    for problem in worker.problems:
+        print(problem, file=sys.stderr)
+    return 1 if worker.problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,166 @@
+# Índice da busca tolerante a erros de digitação ("Marcus" acha "Marcos").
+#
+# O índice não guarda trigramas por aluno: guarda as palavras distintas dos
+# nomes de alunos e professores (o vocabulário do students_fts, já em
+# minúsculas e sem acentos) e os trigramas de cada palavra. Uma busca troca
+# cada palavra digitada pelas palavras parecidas do vocabulário e procura as
+# combinações, da mais parecida para a menos, no próprio students_fts, até
+# juntar TOP_K alunos. O vocabulário cresce bem mais devagar que o cadastro,
+# então as consultas continuam pequenas com 100 mil alunos.
+import argparse
+import itertools
+import re
+import sys
+import unicodedata
+
+from database import (init_db, get_connection, transaction, serialized_write, data_generation, has_fts5,
+                      cached_fetchall)
+
+MIN_SIMILARITY = 0.3    # Jaccard mínimo entre os trigramas da palavra digitada e os de uma palavra do índice
+MIN_SCORE = 0.3         # nota mínima de um aluno (média das similaridades das palavras digitadas)
+WORD_CANDIDATES = 3     # palavras do índice tentadas para cada palavra digitada
+MAX_TOKENS = 4          # palavras digitadas consideradas
+TOP_K = 100             # alunos devolvidos pela busca
+
+
+def words(text: str) -> list[str]:
+    """Palavras do texto como o tokenizador do students_fts as guarda: minúsculas e sem acentos."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.findall(r"[^\W_]+", text)
+
+
+def trigrams(word: str) -> set[str]:
+    """Trigramas da palavra com dois espaços antes e um depois (o começo da palavra pesa mais)."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# ---------------- Manutenção do índice ----------------
+def sync(conn) -> int:
+    """Acerta name_words/name_trigrams com o vocabulário atual; devolve quantas palavras mudaram."""
+    current = {row[0] for row in conn.execute(
+        "SELECT DISTINCT term FROM students_fts_vocab WHERE col IN ('name', 'professor')")}
+    indexed = {row[0] for row in conn.execute("SELECT word FROM name_words")}
+    added, removed = current - indexed, indexed - current
+    grams = {word: trigrams(word) for word in added}
+    conn.executemany("INSERT INTO name_words (word, grams) VALUES (?, ?)",
+                     [(word, len(g)) for word, g in grams.items()])
+    conn.executemany("INSERT INTO name_trigrams (gram, word) VALUES (?, ?)",
+                     [(gram, word) for word, g in grams.items() for gram in g])
+    conn.executemany("DELETE FROM name_trigrams WHERE word = ?", [(word,) for word in removed])
+    conn.executemany("DELETE FROM name_words WHERE word = ?", [(word,) for word in removed])
+    return len(added) + len(removed)
+
+
+@serialized_write
+def refresh(force: bool = False) -> int:
+    """Atualiza o índice se students mudou desde a última vez (ou sempre, com force)."""
+    with transaction() as conn:
+        generation = data_generation(conn, "students")
+        if not force and _indexed_generation(conn) == generation:
+            return 0
+        changed = sync(conn)
+        conn.execute("UPDATE name_index_state SET generation = ?", (generation,))
+    return changed
+
+
+def _indexed_generation(conn) -> int | None:
+    row = conn.execute("SELECT generation FROM name_index_state").fetchone()
+    return row[0] if row else None
+
+
+def available(conn) -> bool:
+    return has_fts5(conn)
+
+
+def ensure_fresh(conn):
+    """Garante que o índice cobre a geração atual de students antes de uma busca."""
+    if _indexed_generation(conn) != data_generation(conn, "students"):
+        refresh()
+
+
+# ---------------- Busca ----------------
+def similar_words(conn, token: str) -> list[tuple[str, float]]:
+    """Até WORD_CANDIDATES palavras do índice parecidas com `token`, com a similaridade, da maior para a menor."""
+    grams = trigrams(token)
+    marks = ",".join("?" * len(grams))
+    rows = conn.execute(f"""
+        SELECT w.word, w.grams, t.shared
+        FROM (SELECT word, COUNT(*) AS shared FROM name_trigrams WHERE gram IN ({marks}) GROUP BY word) t
+        JOIN name_words w ON w.word = t.word""", tuple(grams)).fetchall()
+    scored = [(word, shared / (len(grams) + n - shared)) for word, n, shared in rows]
+    scored = [item for item in scored if item[1] >= MIN_SIMILARITY]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:WORD_CANDIDATES]
+
+
+def _combinations(options: list[list[tuple[str, float]]]) -> list[tuple[float, tuple[str, ...]]]:
+    """Combinações de palavras candidatas (uma ou nenhuma por palavra digitada), da melhor nota para a pior."""
+    best: dict[frozenset, tuple[float, tuple[str, ...]]] = {}
+    for combo in itertools.product(*[opts + [(None, 0.0)] for opts in options]):
+        chosen = tuple(word for word, _ in combo if word)
+        score = sum(sim for _, sim in combo) / len(options)
+        key = frozenset(chosen)
+        if chosen and score >= MIN_SCORE and score > best.get(key, (0.0,))[0]:
+            best[key] = (score, chosen)
+    return sorted(best.values(), key=lambda item: -item[0])
+
+
+def search(conn, term: str, columns: list[str], where: str = "", params: tuple = (),
+           limit: int = TOP_K) -> list[tuple[tuple, float]]:
+    """Os `limit` alunos mais parecidos com `term`: [(linha com `columns`, nota de 0 a 1)].
+
+    A nota é a média, sobre as palavras digitadas, da similaridade da palavra
+    do cadastro que a substituiu (0 para as que ficaram sem par). Nomes de
+    alunos vêm antes de nomes de professores com a mesma nota. `where`/`params`
+    filtram a tabela students (apelido t).
+    """
+    tokens = list(dict.fromkeys(words(term)))[:MAX_TOKENS]
+    if not tokens:
+        return []
+    ensure_fresh(conn)
+    options = [similar_words(conn, token) for token in tokens]
+    select = ", ".join(f"t.{c}" for c in columns)
+    extra = f" AND ({where})" if where else ""
+    sql = (f"SELECT {select} FROM students_fts f JOIN students t ON t.id = f.rowid "
+           f"WHERE students_fts MATCH ?{extra} LIMIT ?")
+    found: dict[int, tuple[float, int, tuple]] = {}
+    for score, chosen in _combinations(options):
+        match = " AND ".join(f'"{word}"' for word in chosen)
+        for rank, column in enumerate(("name", "professor")):
+            if len(found) >= limit:
+                break
+            # os já encontrados (com nota maior ou igual) podem voltar; o LIMIT os desconta
+            rows = cached_fetchall(conn, sql, (f"{column} : ({match})",) + tuple(params) + (limit + len(found),),
+                                   ("students",))
+            for row in rows:
+                if row[0] not in found and len(found) < limit:
+                    found[row[0]] = (score, rank, row)
+        if len(found) >= limit:
+            break
+    ordered = sorted(found.values(), key=lambda item: (-item[0], item[1], str(item[2][1]).lower()))
+    return [(row, round(score, 3)) for score, _, row in ordered]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Busca aproximada de alunos e professores pelo nome.")
+    parser.add_argument("termo", nargs="?", default="")
+    parser.add_argument("--limite", type=int, default=20)
+    parser.add_argument("--reconstruir", action="store_true", help="reconfere todo o índice de nomes")
+    args = parser.parse_args(argv)
+
+    init_db()
+    conn = get_connection()
+    if not available(conn):
+        print("busca aproximada indisponível: o SQLite não tem FTS5", file=sys.stderr)
+        return 1
+    if args.reconstruir:
+        print(f"{refresh(force=True)} palavras atualizadas no índice")
+    for row, score in search(conn, args.termo, ["id", "name", "professor", "turma"], limit=args.limite):
+        print(f"{score:5.2f}  {row[1]}  ({row[2] or '-'}, {row[3] or '-'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
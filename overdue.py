@@ -0,0 +1,205 @@
+import argparse
+import sys
+import threading
+import tkinter as tk
+from datetime import date, timedelta
+from tkinter import ttk, messagebox
+
+import services
+from database import init_db, get_connection, data_generation
+from utils import iso_to_br
+from virtual_table import VirtualTreeview
+
+NEW_NAMES = 50          # nomes novos devolvidos por varredura (a contagem é sempre completa)
+
+
+def overdue_filters(today: date | None = None, turma: str | None = None, professor: str | None = None) -> dict:
+    """Filtros de student_filters para "pendente com vencimento anterior a hoje"."""
+    yesterday = (today or date.today()) - timedelta(days=1)
+    filters = {"status": "Pendente", "date_to": yesterday.isoformat()}
+    if turma:
+        filters["turma"] = turma
+    if professor:
+        filters["professor"] = professor
+    return filters
+
+
+def overdue_source(term: str = "", turma: str | None = None, professor: str | None = None):
+    """Fonte paginada dos alunos em atraso, do vencimento mais antigo para o mais recente."""
+    return services.student_source(term, "payment_date", False, overdue_filters(None, turma, professor))
+
+
+def days_overdue(today: date, pdate) -> int | None:
+    """Dias desde o vencimento; None se a data estiver vazia ou ilegível (banco antigo, importação)."""
+    try:
+        return (today - date.fromisoformat(pdate)).days
+    except (TypeError, ValueError):
+        return None
+
+
+class ScanResult:
+    def __init__(self, today: str, generation):
+        self.today = today
+        self.generation = generation
+        self.total = 0
+        self.new_count = 0
+        self.new: list[tuple] = []     # (id, nome, vencimento ISO) de até NEW_NAMES novos
+        self.resolved = 0
+        self.first = False
+
+    def banner(self) -> str:
+        text = f"⚠ {self.total} alunos com pagamentos atrasados"
+        if self.new_count and not self.first:
+            names = ", ".join(name for _, name, _ in self.new[:3])
+            more = f" e mais {self.new_count - 3}" if self.new_count > 3 else ""
+            text += f" — {self.new_count} novos desde a última verificação: {names}{more}"
+        return text + ". Clique para ver a lista."
+
+
+class OverdueScanner:
+    """Acompanha os alunos em atraso entre varreduras para avisar só dos novos.
+
+    Cada varredura lê (id, vencimento) dos pendentes vencidos pelo índice
+    idx_students_status_date e compara com a anterior: entram como novos os
+    ids que não estavam lá ou cujo vencimento mudou. Se nem a geração de
+    students nem a data mudaram desde a última varredura, nada é relido.
+    """
+
+    def __init__(self):
+        self._known: dict[int, str] | None = None
+        self._state = None
+        self._lock = threading.Lock()
+        self.last: ScanResult | None = None
+
+    def scan(self, conn=None, today: date | None = None) -> ScanResult:
+        conn = conn or get_connection()
+        cutoff = (today or date.today()).isoformat()
+        with self._lock:
+            generation = data_generation(conn, "students")
+            if self.last is not None and self._state == (generation, cutoff):
+                return self.last
+            rows = conn.execute("""SELECT id, payment_date FROM students
+                                   WHERE status_pagamento = 'Pendente' AND payment_date < ?""", (cutoff,)).fetchall()
+            current = dict(rows)
+            result = ScanResult(cutoff, generation)
+            result.total = len(current)
+            result.first = self._known is None
+            known = self._known or {}
+            fresh = [sid for sid, pdate in current.items() if known.get(sid) != pdate]
+            result.new_count = len(fresh)
+            result.resolved = sum(1 for sid in known if sid not in current)
+            if fresh and not result.first:
+                fresh.sort(key=lambda sid: (current[sid], sid))
+                fresh = fresh[:NEW_NAMES]
+                marks = ",".join("?" * len(fresh))
+                result.new = conn.execute(f"SELECT id, name, payment_date FROM students WHERE id IN ({marks}) "
+                                          "ORDER BY payment_date, id", fresh).fetchall()
+            self._known = current
+            self._state = (generation, cutoff)
+            self.last = result
+            return result
+
+
+class OverdueWindow:
+    """Lista paginada dos alunos em atraso, com busca e filtros por turma e professor."""
+
+    def __init__(self, worker, on_pay=None):
+        self.worker = worker
+        self.on_pay = on_pay
+        self.root = tk.Toplevel()
+        self.root.title("Alunos em atraso")
+        self.root.geometry("900x560")
+        self.today = date.today()
+
+        bar = ttk.Frame(self.root, padding=8)
+        bar.pack(fill="x")
+        self.entries = {}
+        for key, label, width in (("term", "Nome", 22), ("turma", "Turma", 12), ("professor", "Professor", 16)):
+            ttk.Label(bar, text=label).pack(side="left", padx=(8, 0))
+            ent = ttk.Entry(bar, width=width)
+            ent.pack(side="left", padx=4)
+            ent.bind("<Return>", lambda e: self.apply_filters())
+            self.entries[key] = ent
+        ttk.Button(bar, text="Filtrar", command=self.apply_filters).pack(side="left", padx=8)
+
+        frame = ttk.Frame(self.root, padding=(8, 0))
+        frame.pack(fill="both", expand=True)
+        frame.grid_rowconfigure(0, weight=1)
+        frame.grid_columnconfigure(0, weight=1)
+        cols = ["Nome", "Professor", "Turma", "Vencimento", "Dias em atraso"]
+        self.table = VirtualTreeview(frame, cols, get_connection, self.format_row, worker=worker,
+                                     generation=lambda conn: data_generation(conn, "students"),
+                                     selectmode="extended",
+                                     on_loaded=self.show_count)
+        self.table.tree.grid(row=0, column=0, sticky="nsew")
+        self.table.scrollbar.grid(row=0, column=1, sticky="ns")
+        for c in cols:
+            self.table.tree.heading(c, text=c)
+            self.table.tree.column(c, width=150, anchor="center")
+        self.table.tree.column("Nome", width=240, anchor="w")
+
+        bottom = ttk.Frame(self.root, padding=8)
+        bottom.pack(fill="x")
+        self.count_label = ttk.Label(bottom, text="")
+        self.count_label.pack(side="left")
+        ttk.Button(bottom, text="Fechar", command=self.root.destroy).pack(side="right")
+        ttk.Button(bottom, text="Marcar selecionados como pagos", command=self.mark_paid).pack(side="right", padx=6)
+
+        self.apply_filters()
+
+    def show_count(self, total):
+        if self.root.winfo_exists():
+            self.count_label.config(text=f"{total} alunos em atraso")
+
+    def format_row(self, row):
+        sid, name, professor, turma, pdate = row[:5]
+        days = days_overdue(self.today, pdate)
+        return sid, (name, professor, turma, iso_to_br(pdate), "" if days is None else days)
+
+    def apply_filters(self):
+        values = {key: ent.get().strip() for key, ent in self.entries.items()}
+        self.table.set_source(overdue_source(values["term"], values["turma"] or None, values["professor"] or None),
+                              "overdue_panel")
+
+    def mark_paid(self):
+        ids = [int(iid) for iid in self.table.tree.selection() if not iid.startswith("loading-")]
+        if not ids:
+            messagebox.showwarning("Aviso", "Selecione um ou mais alunos.", parent=self.root)
+            return
+
+        def done(change):
+            if self.on_pay:
+                self.on_pay(change)
+            if not self.root.winfo_exists():
+                return
+            # os pagos saem da fonte (status Pendente), então relê mantendo a posição
+            self.table.refresh()
+            messagebox.showinfo("Sucesso", f"{len(change.rows)} pagamentos validados!", parent=self.root)
+
+        self.worker.submit(services.mark_students_paid, ids, on_done=done, on_error=self.failed)
+
+    def failed(self, exc):
+        if self.root.winfo_exists():
+            messagebox.showerror("Erro", f"Falha ao acessar o banco de dados:\n{exc}", parent=self.root)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Lista os alunos com pagamento em atraso.")
+    parser.add_argument("--turma")
+    parser.add_argument("--professor")
+    parser.add_argument("--limite", type=int, default=50, help="quantos alunos listar")
+    args = parser.parse_args(argv)
+
+    init_db()
+    conn = get_connection()
+    source = overdue_source("", args.turma, args.professor)
+    today = date.today()
+    for sid, name, professor, turma, pdate, *_ in source.fetch(conn, 0, args.limite):
+        days = days_overdue(today, pdate)
+        print(f"{iso_to_br(pdate)}  {'?' if days is None else days:>5} dias  {name}  ({turma or '-'})")
+    print(f"{source.count(conn)} alunos em atraso")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,40 @@
 import tkinter as tk
+from datetime import date
 from tkinter import ttk, messagebox
-from database import db_connect
-from datetime import datetime
+import receipts
+import services
+from db_worker import DbWorker
+from utils import iso_to_br, validate_payment_fields
+
 
 class PaymentHistoryWindow:
-    def __init__(self, student_id: int, student_name: str):
+    def __init__(self, student_id: int, student_name: str, worker: DbWorker | None = None):
         self.student_id = student_id
         self.student_name = student_name
         self.root = tk.Toplevel()
+        self.worker = worker
+        # linhas exibidas, por id, e a geração de payments em que foram lidas
+        self.rows: dict[int, tuple] = {}
+        self.generation = None
+        # pagamentos vindos dos arquivos anuais: só leitura
+        self.archived_ids: set[int] = set()
+        if self.worker is None:
+            self.worker = DbWorker(self.root)
+            self.root.bind("<Destroy>", lambda e: e.widget is self.root and self.worker.shutdown(), add="+")
         self.root.title(f"Histórico de Pagamentos — {student_name}")
-        self.center_window(760, 460)
+        self.center_window(860, 460)
 
         ttk.Label(self.root, text=f"Pagamentos — {student_name}", font=("Segoe UI", 12, "bold")).pack(pady=8)
+        self.show_archived = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.root, text="Incluir anos arquivados", variable=self.show_archived,
+                        command=self.load_history).pack()
 
         cols = ("Mês", "Ano", "Data", "Forma", "Valor", "Status")
         self.tree = ttk.Treeview(self.root, columns=cols, show="headings", height=12)
         for c in cols:
             self.tree.heading(c, text=c)
             self.tree.column(c, anchor="center", width=110)
+        self.tree.tag_configure("arquivado", foreground="#888888")
         self.tree.pack(fill="both", expand=True, padx=12, pady=8)
 
         form = ttk.Frame(self.root)
@@ -37,78 +54,137 @@ class PaymentHistoryWindow:
         btns.pack(pady=6)
         ttk.Button(btns, text="Adicionar", command=self.add_payment).grid(row=0, column=0, padx=6)
         ttk.Button(btns, text="Marcar Pago", command=self.validate_payment).grid(row=0, column=1, padx=6)
-        ttk.Button(btns, text="Fechar", command=self.root.destroy).grid(row=0, column=2, padx=6)
+        ttk.Button(btns, text="Emitir recibo", command=self.issue_receipt).grid(row=0, column=2, padx=6)
+        ttk.Button(btns, text="Extrato do mês", command=self.issue_statement).grid(row=0, column=3, padx=6)
+        ttk.Button(btns, text="Fechar", command=self.root.destroy).grid(row=0, column=4, padx=6)
 
         self.load_history()
 
-    def db_connect(self):
-        return db_connect()
-
     def load_history(self):
+        sid, archived = self.student_id, self.show_archived.get()
+        self.worker.submit(lambda: (services.generation("payments"), services.payment_history(sid),
+                                    services.archived_payment_history(sid) if archived else []),
+                           on_done=lambda res: self.show_history(*res),
+                           on_error=self.show_db_error, key=("history", sid), label="load_history")
+
+    def show_history(self, generation, rows, archived=()):
+        if not self.root.winfo_exists():
+            return
+        selected = self.tree.selection()
+        scroll = self.tree.yview()[0]
+        self.generation = generation
+        self.archived_ids = {row[0] for row in archived}
+        if archived:
+            rows = sorted(rows + archived, key=lambda r: (r[2] or 0, r[1] if isinstance(r[1], int) else 0), reverse=True)
+        self.rows = {row[0]: row for row in rows}
         self.tree.delete(*self.tree.get_children())
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("SELECT id, month, year, payment_date, payment_method, amount, status_pagamento FROM payments WHERE student_id=? ORDER BY year DESC, month DESC", (self.student_id,))
-        for row in cur.fetchall():
-            pid, month, year, pdate, method, amount, status = row
-            amount_display = f"R$ {amount:.2f}" if amount is not None else ""
-            self.tree.insert("", "end", iid=pid, values=(month, year, pdate, method, amount_display, status))
-        conn.close()
-
-    def add_payment(self):
-        try:
-            amount = float(self.amount.get().strip())
-        except Exception:
-            messagebox.showerror("Erro", "Valor inválido.")
+        for row in rows:
+            if row[0] in self.archived_ids:
+                self.tree.insert("", "end", iid=row[0], values=self.format_row(row)[:-1] + (f"{row[-1]} (arquivado)",),
+                                 tags=("arquivado",))
+            else:
+                self.tree.insert("", "end", iid=row[0], values=self.format_row(row))
+        keep = [iid for iid in selected if self.tree.exists(iid)]
+        if keep:
+            self.tree.selection_set(keep)
+        self.tree.yview_moveto(scroll)
+
+    @staticmethod
+    def format_row(row):
+        pid, month, year, pdate, method, amount, status = row
+        amount_display = f"R$ {amount:.2f}" if amount is not None else ""
+        month_display = f"{month:02d}" if isinstance(month, int) else ""
+        return month_display, year, iso_to_br(pdate), method, amount_display, status
+
+    def apply_change(self, generation, kind, rows):
+        """Aplica ao Treeview os pagamentos devolvidos pela escrita, sem reler o histórico.
+
+        Se a geração de payments pulou (outra escrita no meio), relê tudo.
+        """
+        if not self.root.winfo_exists():
             return
-
-        month = self.month.get().strip()
-        year = self.year.get().strip()
-        date = self.p_date.get().strip()
-        method = self.p_method.get().strip()
-
-        if not (month and year and date and method):
-            messagebox.showerror("Erro", "Preencha todos os campos.")
+        if self.generation is None or generation != self.generation + 1 or None in rows:
+            self.load_history()
             return
+        self.generation = generation
+        for row in rows:
+            pid = row[0]
+            self.rows[pid] = row
+            if kind == "update" and self.tree.exists(pid):
+                self.tree.item(pid, values=self.format_row(row))
+                continue
+            # mesma ordem da consulta: ano e mês decrescentes (sem mês/ano, que o SQLite põe no fim)
+            index = sum(1 for r in self.rows.values() if r[0] != pid and (r[2] or 0, r[1] or 0) >= (row[2] or 0, row[1] or 0))
+            self.tree.insert("", index, iid=pid, values=self.format_row(row))
+            self.tree.see(pid)
+
+    def show_db_error(self, exc):
+        messagebox.showerror("Erro", f"Falha ao acessar o banco de dados:\n{exc}", parent=self.root)
 
-        # validar year 
+    def add_payment(self):
         try:
-            year_i = int(year)
-            if year_i < 1900 or year_i > 2100:
-                raise ValueError
-        except Exception:
-            messagebox.showerror("Erro", "Ano inválido.")
+            month_i, year_i, date, method, amount = validate_payment_fields(
+                self.month.get(), self.year.get(), self.p_date.get(), self.p_method.get(), self.amount.get())
+        except ValueError as exc:
+            messagebox.showerror("Erro", str(exc))
             return
 
-        # validar date
-        try:
-            datetime.strptime(date, "%d/%m/%Y")
-        except Exception:
-            messagebox.showerror("Erro", "Data inválida. Use o formato DD/MM/AAAA.")
-            return
+        def done(change):
+            self.apply_change(change.generation, "insert", [change.row])
+            messagebox.showinfo("Sucesso", "Pagamento adicionado.")
 
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("INSERT INTO payments (student_id, month, year, payment_date, payment_method, amount, status_pagamento) VALUES (?,?,?,?,?,?,?)",
-                    (self.student_id, month, year, date, method, amount, "Pendente"))
-        conn.commit()
-        conn.close()
-        self.load_history()
-        messagebox.showinfo("Sucesso", "Pagamento adicionado.")
+        self.worker.submit(services.add_payment, self.student_id, month_i, year_i, date, method, amount,
+                           on_done=done, on_error=self.show_db_error)
 
     def validate_payment(self):
         sel = self.tree.selection()
         if not sel:
             messagebox.showwarning("Aviso", "Selecione um pagamento.")
             return
-        pid = int(sel[0])
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("UPDATE payments SET status_pagamento='Pago' WHERE id= ?", (pid,))
-        conn.commit()
-        conn.close()
-        self.load_history()
-        messagebox.showinfo("Sucesso", "Pagamento marcado como Pago.")
+        ids = [int(iid) for iid in sel if int(iid) not in self.archived_ids]
+        if not ids:
+            messagebox.showwarning("Aviso", "Pagamentos de anos arquivados são somente leitura.")
+            return
+
+        def done(change):
+            self.apply_change(change.generation, "update", change.rows)
+            messagebox.showinfo("Sucesso", "Pagamento marcado como Pago." if len(ids) == 1
+                                else f"{len(change.rows)} pagamentos marcados como Pago.")
+
+        self.worker.submit(services.mark_payments_paid, ids, on_done=done, on_error=self.show_db_error)
+
+    def issue_receipt(self):
+        paid = [int(iid) for iid in self.tree.selection() if self.rows.get(int(iid), ("",))[-1] == "Pago"]
+        if not paid:
+            messagebox.showwarning("Aviso", "Selecione um ou mais pagamentos pagos.", parent=self.root)
+            return
+        sid = self.student_id
+        self.worker.submit(lambda: receipts.render_receipts(student_id=sid, payment_ids=paid),
+                           on_done=self.documents_ready, on_error=self.documents_failed)
+
+    def issue_statement(self):
+        """Extrato do mês do pagamento selecionado (ou do mês corrente, sem seleção)."""
+        sel = self.tree.selection()
+        row = self.rows.get(int(sel[0])) if sel else None
+        if row and isinstance(row[1], int) and row[2]:
+            month, year = row[1], row[2]
+        else:
+            today = date.today()
+            month, year = today.month, today.year
+        sid = self.student_id
+        self.worker.submit(lambda: receipts.render_statements(year, month, student_id=sid),
+                           on_done=self.documents_ready, on_error=self.documents_failed)
+
+    def documents_ready(self, result):
+        if not self.root.winfo_exists():
+            return
+        files = "\n".join(result.files[:5])
+        messagebox.showinfo("Documentos", f"{result.summary()}\n\n{files}", parent=self.root)
+
+    def documents_failed(self, exc):
+        if self.root.winfo_exists():
+            messagebox.showerror("Erro", str(exc) if isinstance(exc, receipts.ReceiptError)
+                                 else f"Falha ao gerar o documento:\n{exc}", parent=self.root)
 
     def center_window(self, w, h):
         ws = self.root.winfo_screenwidth()
@@ -0,0 +1,126 @@
+import os
+import tkinter as tk
+from datetime import date
+from tkinter import ttk, messagebox, filedialog
+
+import receipts
+from db_worker import DbWorker
+from utils import parse_month
+
+
+class ReceiptWindow:
+    """Geração em lote de recibos ou extratos mensais de uma turma (ou de todas), em segundo plano."""
+
+    def __init__(self, worker: DbWorker):
+        self.worker = worker
+        self.root = tk.Toplevel()
+        self.root.title("Recibos e extratos")
+        self.root.resizable(False, False)
+        self._done = 0
+        self._total = 0
+        self._running = False
+
+        form = ttk.Frame(self.root, padding=12)
+        form.pack(fill="both", expand=True)
+        today = date.today()
+
+        self.kind = tk.StringVar(value="recibos")
+        self.fmt = tk.StringVar(value="pdf")
+        self.out_dir = tk.StringVar(value=receipts.OUTPUT_DIR)
+
+        ttk.Label(form, text="Documento").grid(row=0, column=0, sticky="w", pady=3)
+        ttk.Combobox(form, textvariable=self.kind, values=["recibos", "extratos"], state="readonly",
+                     width=18).grid(row=0, column=1, sticky="w")
+        ttk.Label(form, text="Formato").grid(row=1, column=0, sticky="w", pady=3)
+        ttk.Combobox(form, textvariable=self.fmt, values=list(receipts.FORMATS), state="readonly",
+                     width=18).grid(row=1, column=1, sticky="w")
+
+        self.entries = {}
+        for i, (key, label, default) in enumerate([("month", "Mês", f"{today.month:02d}"),
+                                                   ("year", "Ano", str(today.year)),
+                                                   ("turma", "Turma (vazio = todas)", ""),
+                                                   ("workers", "Processos", str(os.cpu_count() or 1))], start=2):
+            ttk.Label(form, text=label).grid(row=i, column=0, sticky="w", pady=3)
+            ent = ttk.Entry(form, width=20)
+            ent.insert(0, default)
+            ent.grid(row=i, column=1, sticky="w")
+            self.entries[key] = ent
+
+        ttk.Label(form, text="Pasta").grid(row=6, column=0, sticky="w", pady=3)
+        folder = ttk.Frame(form)
+        folder.grid(row=6, column=1, sticky="w")
+        ttk.Entry(folder, textvariable=self.out_dir, width=32).pack(side="left")
+        ttk.Button(folder, text="...", width=3, command=self.choose_dir).pack(side="left", padx=(4, 0))
+
+        self.progress_label = ttk.Label(form, text="")
+        self.progress_label.grid(row=7, column=0, columnspan=2, sticky="w", pady=(8, 0))
+
+        btns = ttk.Frame(form)
+        btns.grid(row=8, column=0, columnspan=2, pady=(10, 0))
+        self.run_btn = ttk.Button(btns, text="Gerar", command=self.run)
+        self.run_btn.grid(row=0, column=0, padx=6)
+        ttk.Button(btns, text="Fechar", command=self.root.destroy).grid(row=0, column=1, padx=6)
+
+    def choose_dir(self):
+        path = filedialog.askdirectory(parent=self.root, initialdir=self.out_dir.get())
+        if path:
+            self.out_dir.set(path)
+
+    def read_form(self):
+        try:
+            month = parse_month(self.entries["month"].get())
+        except ValueError:
+            raise ValueError("Mês inválido.")
+        year = self.entries["year"].get().strip()
+        if not year.isdigit() or not 1900 <= int(year) <= 2100:
+            raise ValueError("Ano inválido.")
+        workers = self.entries["workers"].get().strip()
+        if not workers.isdigit() or int(workers) < 1:
+            raise ValueError("Número de processos inválido.")
+        return int(year), month, self.entries["turma"].get().strip() or None, int(workers)
+
+    def run(self):
+        try:
+            year, month, turma, workers = self.read_form()
+        except ValueError as exc:
+            messagebox.showerror("Erro", str(exc), parent=self.root)
+            return
+        fmt, out_dir = self.fmt.get(), self.out_dir.get()
+
+        def progress(done, total):
+            # runs on the worker thread; the label is refreshed by _poll_progress
+            self._done, self._total = done, total
+
+        if self.kind.get() == "recibos":
+            job = lambda: receipts.render_receipts(fmt, out_dir, workers, progress, turma=turma, year=year, month=month)
+        else:
+            job = lambda: receipts.render_statements(year, month, fmt, out_dir, workers, progress, turma=turma)
+        self._done = self._total = 0
+        self._running = True
+        self.run_btn.state(["disabled"])
+        self.worker.submit(job, on_done=self.finished, on_error=self.failed)
+        self._poll_progress()
+
+    def _poll_progress(self):
+        if not self._running or not self.root.winfo_exists():
+            return
+        if self._total:
+            self.progress_label.config(text=f"{self._done}/{self._total} documentos...")
+        else:
+            self.progress_label.config(text="Lendo os pagamentos...")
+        self.root.after(200, self._poll_progress)
+
+    def finished(self, result):
+        self._running = False
+        if not self.root.winfo_exists():
+            return
+        self.run_btn.state(["!disabled"])
+        self.progress_label.config(text=result.summary())
+        if result.errors:
+            messagebox.showwarning("Recibos e extratos", "\n".join(result.errors[:10]), parent=self.root)
+
+    def failed(self, exc):
+        self._running = False
+        if self.root.winfo_exists():
+            self.run_btn.state(["!disabled"])
+            messagebox.showerror("Erro", f"Falha ao gerar os documentos:\n{exc}", parent=self.root)
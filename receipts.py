@@ -0,0 +1,478 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import NamedTuple
+
+import archive
+from database import init_db, get_connection
+from utils import get_art_path, iso_to_br, format_money, parse_month, MONTH_NAMES
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recibos")
+SCHOOL_NAME = "Escola IEGV"
+LOGO_FILE = "logo.png"
+DPI = 150
+RECEIPT_SIZE = (1240, 874)      # A5 deitado a 150 dpi
+STATEMENT_SIZE = (1240, 1754)   # A4 em pé a 150 dpi
+MARGIN = 70
+LOGO_SIZE = 120
+FORMATS = ("pdf", "png")
+PARALLEL_MIN = 8                # abaixo disso o lote é desenhado no próprio processo
+
+# fontes tentadas na ordem (Windows, Linux); sem nenhuma, a fonte padrão do PIL
+FONT_FILES = {False: ("segoeui.ttf", "arial.ttf", "DejaVuSans.ttf"),
+              True: ("segoeuib.ttf", "arialbd.ttf", "DejaVuSans-Bold.ttf")}
+FONT_SPECS = {"titulo": (34, True), "subtitulo": (24, True), "texto": (22, False),
+              "negrito": (22, True), "pequeno": (16, False)}
+
+
+class ReceiptError(Exception):
+    """Falha ao gerar recibos/extratos, com mensagem para o usuário."""
+
+
+class Receipt(NamedTuple):
+    """Um pagamento pago, com o aluno como estava no banco (ou no arquivo do ano)."""
+    payment_id: int
+    student_id: int
+    student: str
+    turma: str | None
+    professor: str | None
+    month: int | None
+    year: int | None
+    payment_date: str | None
+    method: str | None
+    amount: float | None
+
+
+class Statement(NamedTuple):
+    """Extrato mensal de um aluno: os lançamentos do mês e o que ficou em aberto antes dele.
+
+    Cada lançamento é (mês, ano, data ISO, forma, valor, status).
+    """
+    student_id: int
+    student: str
+    turma: str | None
+    professor: str | None
+    year: int
+    month: int
+    payments: list[tuple]
+    open_items: list[tuple]
+
+
+class BatchResult:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.documents = 0
+        self.files: list[str] = []
+        self.errors: list[str] = []
+        self.elapsed = 0.0
+
+    @property
+    def per_second(self) -> float:
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        text = (f"{self.documents} documentos ({len(self.files)} arquivos) em {self.elapsed:.2f}s "
+                f"com {self.workers} processo(s) — {self.per_second:.1f} documentos/s")
+        if self.errors:
+            text += f"; {len(self.errors)} com erro"
+        return text
+
+
+# ---------------- Leitura ----------------
+def _competence(month, year) -> str:
+    if not month or not year:
+        return "-"
+    return f"{MONTH_NAMES[month - 1]}/{year}"
+
+
+def receipts(turma: str | None = None, year: int | None = None, month: int | None = None,
+             student_id: int | None = None, payment_ids: list[int] | None = None) -> list[Receipt]:
+    """Pagamentos pagos que entram no lote, incluindo os dos anos arquivados."""
+    conds, params = ["p.status_pagamento = 'Pago'"], []
+    for column, value in (("s.turma", turma), ("p.year", year), ("p.month", month), ("p.student_id", student_id)):
+        if value:
+            conds.append(f"{column} = ?")
+            params.append(value)
+    if payment_ids:
+        conds.append(f"p.id IN ({','.join('?' * len(payment_ids))})")
+        params.extend(payment_ids)
+    conn = get_connection()
+    rows = []
+    for schema in itertools.chain(["main"], archive.schemas(conn, year=year)):
+        rows += conn.execute(f"""
+            SELECT p.id, p.student_id, COALESCE(s.name, ''), s.turma, s.professor, p.month, p.year,
+                   p.payment_date, p.payment_method, p.amount
+            FROM {schema}.payments p LEFT JOIN {schema}.students s ON s.id = p.student_id
+            WHERE {' AND '.join(conds)}""", params).fetchall()
+    rows.sort(key=lambda r: (r[2].lower(), r[6] or 0, r[5] or 0, r[0]))
+    return [Receipt(*row) for row in rows]
+
+
+def statements(year: int, month: int, turma: str | None = None, student_id: int | None = None) -> list[Statement]:
+    """Extratos de `month`/`year` dos alunos (da turma) com lançamento no mês ou algo em aberto antes dele."""
+    conds, params = [], []
+    for column, value in (("turma", turma), ("id", student_id)):
+        if value:
+            conds.append(f"{column} = ?")
+            params.append(value)
+    where = f" WHERE {' AND '.join(conds)}" if conds else ""
+    conn = get_connection()
+    students = conn.execute(f"SELECT id, name, turma, professor FROM students{where} ORDER BY name, id",
+                            params).fetchall()
+    in_batch = f"student_id IN (SELECT id FROM main.students{where})" if conds else "1"
+    columns = "student_id, month, year, payment_date, payment_method, amount, status_pagamento"
+    current: dict[int, list] = {}
+    for schema in itertools.chain(["main"], archive.schemas(conn, year=year)):
+        for sid, *row in conn.execute(f"SELECT {columns} FROM {schema}.payments "
+                                      f"WHERE year = ? AND month = ? AND {in_batch} ORDER BY payment_date, id",
+                                      [year, month] + params):
+            current.setdefault(sid, []).append(tuple(row))
+    open_items: dict[int, list] = {}
+    for schema in itertools.chain(["main"], archive.schemas(conn)):
+        for sid, *row in conn.execute(f"SELECT {columns} FROM {schema}.payments "
+                                      f"WHERE status_pagamento = 'Pendente' AND (year < ? OR (year = ? AND month < ?)) "
+                                      f"AND {in_batch}", [year, year, month] + params):
+            open_items.setdefault(sid, []).append(tuple(row))
+    result = []
+    for sid, name, turma_, professor in students:
+        if sid in current or sid in open_items:
+            late = sorted(open_items.get(sid, []), key=lambda r: (r[1] or 0, r[0] or 0))
+            result.append(Statement(sid, name or "", turma_, professor, year, month, current.get(sid, []), late))
+    return result
+
+
+# ---------------- Desenho (roda nos processos do lote) ----------------
+_assets = None      # (logo, fontes) do processo atual, carregados uma única vez
+
+
+def _require_pil():
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        raise ReceiptError("Para gerar recibos é preciso instalar o Pillow (pip install pillow).")
+
+
+def _font(size: int, bold: bool):
+    from PIL import ImageFont
+    for name in FONT_FILES[bold]:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:   # Pillow < 10.1 não escala a fonte padrão
+        return ImageFont.load_default()
+
+
+def _init_worker(logo_path: str | None):
+    """Inicializador dos processos do lote: decodifica o logo e abre as fontes uma vez só."""
+    global _assets
+    from PIL import Image
+    logo = None
+    if logo_path and os.path.exists(logo_path):
+        with Image.open(logo_path) as img:
+            logo = img.convert("RGBA")
+        logo.thumbnail((LOGO_SIZE, LOGO_SIZE))
+    _assets = (logo, {key: _font(size, bold) for key, (size, bold) in FONT_SPECS.items()})
+
+
+def _get_assets():
+    if _assets is None:
+        _init_worker(get_art_path(LOGO_FILE))
+    return _assets
+
+
+def _wrap(draw, text: str, font, width: int) -> list[str]:
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if line and draw.textlength(candidate, font=font) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    return lines + [line] if line else lines
+
+
+def _header(img, draw, title: str, right: str = "") -> int:
+    """Logo, nome da escola e título; devolve o y onde o conteúdo começa."""
+    logo, fonts = _get_assets()
+    x = MARGIN
+    if logo is not None:
+        img.paste(logo, (MARGIN, MARGIN), logo)
+        x += logo.width + 24
+    draw.text((x, MARGIN + 8), SCHOOL_NAME, font=fonts["subtitulo"], fill="#1B5E20")
+    draw.text((x, MARGIN + 50), title, font=fonts["titulo"], fill="black")
+    if right:
+        width = draw.textlength(right, font=fonts["negrito"])
+        draw.text((img.width - MARGIN - width, MARGIN + 8), right, font=fonts["negrito"], fill="black")
+    y = MARGIN + max(LOGO_SIZE, 100) + 16
+    draw.line((MARGIN, y, img.width - MARGIN, y), fill="#1B5E20", width=3)
+    return y + 24
+
+
+def _footer(img, draw):
+    fonts = _get_assets()[1]
+    text = f"Emitido em {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+    draw.text((MARGIN, img.height - MARGIN), text, font=fonts["pequeno"], fill="#666666")
+
+
+def draw_receipt(r: Receipt) -> list:
+    from PIL import Image, ImageDraw
+    fonts = _get_assets()[1]
+    img = Image.new("RGB", RECEIPT_SIZE, "white")
+    draw = ImageDraw.Draw(img)
+    y = _header(img, draw, "Recibo de pagamento", f"Nº {r.payment_id:06d}")
+    body = (f"Recebemos a importância de {format_money(r.amount or 0)} referente à mensalidade de "
+            f"{_competence(r.month, r.year)} do(a) aluno(a) {r.student}.")
+    for line in _wrap(draw, body, fonts["texto"], img.width - 2 * MARGIN):
+        draw.text((MARGIN, y), line, font=fonts["texto"], fill="black")
+        y += 34
+    y += 16
+    fields = (("Turma", r.turma or "-"), ("Professor", r.professor or "-"),
+              ("Data do pagamento", iso_to_br(r.payment_date) or "-"), ("Forma de pagamento", r.method or "-"))
+    value_x = MARGIN + max(draw.textlength(f"{label}:", font=fonts["negrito"]) for label, _ in fields) + 16
+    for label, value in fields:
+        draw.text((MARGIN, y), f"{label}:", font=fonts["negrito"], fill="black")
+        draw.text((value_x, y), str(value), font=fonts["texto"], fill="black")
+        y += 32
+    sign_y = img.height - MARGIN - 90
+    x0, x1 = img.width - MARGIN - 420, img.width - MARGIN
+    draw.line((x0, sign_y, x1, sign_y), fill="black", width=2)
+    width = draw.textlength(SCHOOL_NAME, font=fonts["texto"])
+    draw.text((x0 + (x1 - x0 - width) / 2, sign_y + 8), SCHOOL_NAME, font=fonts["texto"], fill="black")
+    _footer(img, draw)
+    return [img]
+
+
+STATEMENT_COLUMNS = (("Competência", 0), ("Data", 300), ("Forma", 480), ("Valor", 700), ("Situação", 900))
+
+
+def draw_statement(s: Statement) -> list:
+    """Páginas do extrato; a tabela continua em páginas novas quando não cabe."""
+    from PIL import Image, ImageDraw
+    fonts = _get_assets()[1]
+    title = f"Extrato de {_competence(s.month, s.year)}"
+    pages = []
+    state = {}
+
+    def new_page():
+        img = Image.new("RGB", STATEMENT_SIZE, "white")
+        draw = ImageDraw.Draw(img)
+        pages.append(img)
+        state["draw"] = draw
+        state["y"] = _header(img, draw, title if len(pages) == 1 else f"{title} (continuação)")
+        _footer(img, draw)
+
+    def ensure(height) -> bool:
+        if state["y"] + height > STATEMENT_SIZE[1] - MARGIN - 40:
+            new_page()
+            return True
+        return False
+
+    def text(value, font="texto", x=0, fill="black"):
+        state["draw"].text((MARGIN + x, state["y"]), value, font=fonts[font], fill=fill)
+
+    def text_right(value, font="texto"):
+        width = state["draw"].textlength(value, font=fonts[font])
+        state["draw"].text((STATEMENT_SIZE[0] - MARGIN - width, state["y"]), value, font=fonts[font], fill="black")
+
+    def table(caption, rows):
+        ensure(110)
+        text(caption, "subtitulo")
+        state["y"] += 40
+
+        def headings():
+            for label, x in STATEMENT_COLUMNS:
+                text(label, "negrito", x)
+            state["y"] += 34
+
+        headings()
+        if not rows:
+            text("Nenhum lançamento.", x=0, fill="#666666")
+            state["y"] += 32
+        for month, year, pdate, method, amount, status in rows:
+            if ensure(32):
+                headings()
+            for (_, x), value in zip(STATEMENT_COLUMNS, (_competence(month, year), iso_to_br(pdate) or "-",
+                                                         method or "-", format_money(amount or 0), status or "-")):
+                text(value, x=x, fill="#B71C1C" if status == "Pendente" else "black")
+            state["y"] += 32
+        state["y"] += 24
+
+    new_page()
+    for label, value in (("Aluno(a)", s.student), ("Turma", s.turma or "-"), ("Professor", s.professor or "-")):
+        text(f"{label}:", "negrito")
+        text(value, x=180)
+        state["y"] += 32
+    state["y"] += 24
+    table(f"Lançamentos de {_competence(s.month, s.year)}", s.payments)
+    if s.open_items:
+        table("Em aberto de meses anteriores", s.open_items)
+
+    paid = sum(r[4] or 0 for r in s.payments if r[5] == "Pago")
+    pending = sum(r[4] or 0 for r in s.payments if r[5] != "Pago")
+    late = sum(r[4] or 0 for r in s.open_items)
+    ensure(4 * 34)
+    for label, value in (("Pago no mês", paid), ("Pendente no mês", pending),
+                         ("Em aberto de meses anteriores", late), ("Total em aberto", pending + late)):
+        text(f"{label}:", "negrito", 450)
+        text_right(format_money(value))
+        state["y"] += 34
+    return pages
+
+
+def _save(pages: list, path: str, fmt: str) -> list[str]:
+    """Grava as páginas (PDF com todas; PNG com uma imagem por página) e devolve os arquivos."""
+    written = []
+    if fmt == "pdf":
+        targets = [(path, pages)]
+    else:
+        stem, ext = os.path.splitext(path)
+        targets = [(path if i == 0 else f"{stem}_p{i + 1}{ext}", [page]) for i, page in enumerate(pages)]
+    for target, group in targets:
+        part = target + ".part"
+        if fmt == "pdf":
+            group[0].save(part, format="PDF", resolution=DPI, save_all=True, append_images=group[1:])
+        else:
+            group[0].save(part, format="PNG", dpi=(DPI, DPI))
+        os.replace(part, target)
+        written.append(target)
+    return written
+
+
+def _render_job(job: tuple) -> tuple[list[str], str | None]:
+    """Desenha e grava um documento; devolve (arquivos, erro)."""
+    kind, data, path, fmt = job
+    try:
+        pages = draw_receipt(data) if kind == "recibo" else draw_statement(data)
+        return _save(pages, path, fmt), None
+    except Exception as exc:
+        return [], f"{os.path.basename(path)}: {exc}"
+
+
+# ---------------- Lotes ----------------
+def _slug(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_")[:40] or "aluno"
+
+
+def receipt_jobs(items: list[Receipt], out_dir: str, fmt: str) -> list[tuple]:
+    return [("recibo", r, os.path.join(out_dir, f"recibo_{r.payment_id:06d}_{_slug(r.student)}.{fmt}"), fmt)
+            for r in items]
+
+
+def statement_jobs(items: list[Statement], out_dir: str, fmt: str) -> list[tuple]:
+    return [("extrato", s, os.path.join(out_dir, f"extrato_{s.year}-{s.month:02d}_{s.student_id:06d}_"
+                                                 f"{_slug(s.student)}.{fmt}"), fmt)
+            for s in items]
+
+
+def render_batch(jobs: list[tuple], workers: int | None = None, progress=None) -> BatchResult:
+    """Desenha os documentos em paralelo num pool de processos.
+
+    Cada processo decodifica o logo e abre as fontes uma vez (no
+    inicializador) e reaproveita para todos os documentos que receber; os
+    dados já vêm lidos do banco, então os processos não tocam no SQLite.
+    Lotes pequenos são desenhados aqui mesmo. `progress(feitos, total)`.
+    """
+    _require_pil()
+    for out_dir in {os.path.dirname(job[2]) for job in jobs}:
+        os.makedirs(out_dir or ".", exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    if len(jobs) < PARALLEL_MIN:
+        workers = 1
+    result = BatchResult(workers)
+    start = time.perf_counter()
+    if workers == 1:
+        outcomes = map(_render_job, jobs)
+        pool = None
+    else:
+        # spawn: o processo pai tem threads (Tk, escritor, leitores) e fork as copiaria no meio do trabalho
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(get_art_path(LOGO_FILE),))
+        outcomes = pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (workers * 8)))
+    try:
+        for done, (files, error) in enumerate(outcomes, start=1):
+            if error:
+                result.errors.append(error)
+            else:
+                result.documents += 1
+                result.files += files
+            if progress:
+                progress(done, len(jobs))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def render_receipts(fmt: str = "pdf", out_dir: str = OUTPUT_DIR, workers: int | None = None,
+                    progress=None, **filters) -> BatchResult:
+    """Recibos dos pagamentos pagos que atendem aos filtros de receipts()."""
+    items = receipts(**filters)
+    if not items:
+        raise ReceiptError("Nenhum pagamento pago encontrado para os filtros informados.")
+    return render_batch(receipt_jobs(items, out_dir, fmt), workers, progress)
+
+
+def render_statements(year: int, month: int, fmt: str = "pdf", out_dir: str = OUTPUT_DIR,
+                      workers: int | None = None, progress=None, **filters) -> BatchResult:
+    """Extratos do mês dos alunos que atendem aos filtros de statements()."""
+    items = statements(year, month, **filters)
+    if not items:
+        raise ReceiptError("Nenhum aluno com lançamentos no mês ou pendências anteriores.")
+    return render_batch(statement_jobs(items, out_dir, fmt), workers, progress)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gera recibos de pagamento e extratos mensais (PDF ou PNG).")
+    parser.add_argument("tipo", choices=["recibos", "extratos"])
+    parser.add_argument("--turma")
+    parser.add_argument("--mes", help="1..12 ou nome do mês (obrigatório para extratos)")
+    parser.add_argument("--ano", type=int, default=date.today().year)
+    parser.add_argument("--aluno", type=int, help="id do aluno")
+    parser.add_argument("--pagamento", type=int, action="append", help="id do pagamento (pode repetir)")
+    parser.add_argument("--formato", choices=FORMATS, default="pdf")
+    parser.add_argument("--saida", default=OUTPUT_DIR, help="pasta onde os arquivos são gravados")
+    parser.add_argument("--processos", type=int, help="processos em paralelo (padrão: um por núcleo)")
+    args = parser.parse_args(argv)
+
+    try:
+        month = parse_month(args.mes) if args.mes else None
+    except ValueError as exc:
+        parser.error(str(exc))
+    init_db()
+    progress = lambda n, total: print(f"\r{n}/{total} documentos...", end="", file=sys.stderr)
+    try:
+        if args.tipo == "recibos":
+            result = render_receipts(args.formato, args.saida, args.processos, progress, turma=args.turma,
+                                     year=None if args.pagamento else args.ano, month=month,
+                                     student_id=args.aluno, payment_ids=args.pagamento)
+        else:
+            if month is None:
+                parser.error("informe o mês do extrato (--mes)")
+            result = render_statements(args.ano, month, args.formato, args.saida, args.processos, progress,
+                                       turma=args.turma, student_id=args.aluno)
+    except ReceiptError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    print(result.summary())
+    for error in result.errors[:20]:
+        print("ERRO", error, file=sys.stderr)
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import argparse
+import itertools
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+import archive
+from database import init_db, get_connection, transaction, serialized_write, rebuild_payment_summary, cached_fetchall
+from utils import format_money
+
+# agrupamentos disponíveis -> (colunas do GROUP BY, ordem decrescente?, tabela de resumo)
+GROUPINGS = {
+    "mes": ("year, month", True, "payment_summary"),
+    "turma": ("turma", False, "payment_summary"),
+    "professor": ("professor", False, "payment_summary_professor"),
+}
+GROUP_LABELS = {"mes": "Mês", "turma": "Turma", "professor": "Professor"}
+
+
+def _summary_table(conn, schema: str, table: str) -> str:
+    """Arquivos gerados antes do resumo por professor só têm payment_summary, que ainda tinha a coluna professor."""
+    if schema == "main" or conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?",
+                                        (table,)).fetchone():
+        return table
+    return "payment_summary"
+
+
+def summary(group_by: str = "mes", year: int | None = None) -> list[tuple]:
+    """Totais recebidos/pendentes lidos dos resumos (não varre payments).
+
+    Os anos arquivados entram com o payment_summary do arquivo de cada ano
+    (anexado sob demanda) e são somados aos do banco principal.
+    Devolve linhas (grupo, recebido, pendente, qtd. pagamentos).
+    """
+    columns, descending, table = GROUPINGS[group_by]
+    where, params = ("WHERE year = ?", (year,)) if year else ("", ())
+    conn = get_connection()
+    totals: dict[tuple, list] = {}
+    for schema in itertools.chain(["main"], archive.schemas(conn, year=year)):
+        # o resumo muda com os pagamentos e com a turma/professor dos alunos
+        for *key, paid, pending, count in cached_fetchall(conn, f"""
+                SELECT {columns},
+                       SUM(CASE WHEN status_pagamento = 'Pago' THEN total ELSE 0 END),
+                       SUM(CASE WHEN status_pagamento = 'Pago' THEN 0 ELSE total END),
+                       SUM(count)
+                FROM {schema}.{_summary_table(conn, schema, table)} {where}
+                GROUP BY {columns}""", params, ("payments", "students")):
+            acc = totals.setdefault(tuple(key), [0.0, 0.0, 0])
+            acc[0] += paid
+            acc[1] += pending
+            acc[2] += count
+    rows = []
+    for row in sorted((key + tuple(acc) for key, acc in totals.items()), key=lambda r: r[:-3], reverse=descending):
+        if group_by == "mes":
+            year_, month, paid, pending, count = row
+            label = f"{month:02d}/{year_}" if year_ and month else "Sem data"
+        else:
+            label, paid, pending, count = row
+            label = label or "(sem informação)"
+        rows.append((label, paid, pending, count))
+    return rows
+
+
+@serialized_write
+def rebuild() -> float:
+    """Recalcula o resumo a partir de payments. Devolve o tempo gasto em segundos."""
+    start = time.perf_counter()
+    with transaction() as conn:
+        rebuild_payment_summary(conn)
+    return time.perf_counter() - start
+
+
+class ReportWindow:
+    """Janela com os totais financeiros por mês, turma ou professor."""
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.root = tk.Toplevel()
+        self.root.title("Relatórios Financeiros")
+        self.root.geometry("720x480")
+
+        bar = ttk.Frame(self.root, padding=8)
+        bar.pack(fill="x")
+        ttk.Label(bar, text="Agrupar por").pack(side="left")
+        self.group = tk.StringVar(value="Mês")
+        combo = ttk.Combobox(bar, textvariable=self.group, values=list(GROUP_LABELS.values()), state="readonly", width=12)
+        combo.pack(side="left", padx=6)
+        combo.bind("<<ComboboxSelected>>", lambda e: self.load())
+        ttk.Label(bar, text="Ano").pack(side="left", padx=(12, 0))
+        self.year = ttk.Entry(bar, width=6)
+        self.year.pack(side="left", padx=6)
+        self.year.bind("<Return>", lambda e: self.load())
+        ttk.Button(bar, text="Atualizar", command=self.load).pack(side="left", padx=6)
+        ttk.Button(bar, text="Recalcular", command=self.rebuild).pack(side="left", padx=6)
+
+        cols = ("Grupo", "Recebido", "Pendente", "Pagamentos")
+        self.tree = ttk.Treeview(self.root, columns=cols, show="headings")
+        for c in cols:
+            self.tree.heading(c, text=c)
+            self.tree.column(c, anchor="center", width=160)
+        self.tree.pack(fill="both", expand=True, padx=8, pady=4)
+
+        self.status = ttk.Label(self.root, text="")
+        self.status.pack(fill="x", padx=8, pady=(0, 8))
+        self.load()
+
+    def _group_key(self) -> str:
+        return next(k for k, v in GROUP_LABELS.items() if v == self.group.get())
+
+    def load(self):
+        year = self.year.get().strip()
+        if year and not year.isdigit():
+            messagebox.showerror("Erro", "Ano inválido.", parent=self.root)
+            return
+        start = time.perf_counter()
+        self.worker.submit(summary, self._group_key(), int(year) if year else None,
+                           on_done=lambda rows: self.show(rows, time.perf_counter() - start),
+                           on_error=self.failed, key=("report", id(self)))
+
+    def show(self, rows, elapsed):
+        if not self.root.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        paid_total = pending_total = 0.0
+        for label, paid, pending, count in rows:
+            paid_total += paid
+            pending_total += pending
+            self.tree.insert("", "end", values=(label, format_money(paid), format_money(pending), count))
+        self.status.config(text=f"Recebido: {format_money(paid_total)}  |  Pendente: {format_money(pending_total)}"
+                                f"  |  consulta em {elapsed * 1000:.0f} ms")
+
+    def rebuild(self):
+        self.worker.submit(rebuild, on_done=lambda _: self.load(), on_error=self.failed)
+
+    def failed(self, exc):
+        if self.root.winfo_exists():
+            messagebox.showerror("Erro", f"Falha ao gerar relatório:\n{exc}", parent=self.root)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Totais financeiros por mês, turma ou professor.")
+    parser.add_argument("--por", choices=list(GROUPINGS), default="mes")
+    parser.add_argument("--ano", type=int)
+    parser.add_argument("--reconstruir", action="store_true", help="recalcula o resumo a partir de payments")
+    args = parser.parse_args(argv)
+
+    init_db()
+    if args.reconstruir:
+        print(f"resumo recalculado em {rebuild():.2f}s")
+    start = time.perf_counter()
+    rows = summary(args.por, args.ano)
+    elapsed = time.perf_counter() - start
+    print(f"{GROUP_LABELS[args.por]:<20} {'Recebido':>16} {'Pendente':>16} {'Pagamentos':>11}")
+    for label, paid, pending, count in rows:
+        print(f"{label:<20} {format_money(paid):>16} {format_money(pending):>16} {count:>11}")
+    print(f"({len(rows)} linhas em {elapsed * 1000:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
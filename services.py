@@ -0,0 +1,406 @@
+# Acesso a dados de alunos, pagamentos e login, independente da interface.
+# As janelas Tk, as ferramentas de linha de comando e o benchmark usam estas
+# funções; nenhuma toca em widgets, então rodam em qualquer thread. As
+# escritas passam pelo escritor único de database (@serialized_write) e as
+# leituras repetidas das telas, pelo cache de leituras (cached_fetchall).
+import json
+from typing import NamedTuple
+
+import archive
+import name_index
+from database import (get_connection, transaction, serialized_write, has_fts5, fts_query, verify_user,
+                      bump_generation, data_generation, cached_fetchall)
+
+STUDENT_COLUMNS = ["id", "name", "professor", "turma", "payment_date", "payment_method", "assinatura", "status_pagamento"]
+PAYMENT_COLUMNS = ["id", "month", "year", "payment_date", "payment_method", "amount", "status_pagamento"]
+PAGE_SIZE = 200
+_STUDENT_SELECT = ", ".join(STUDENT_COLUMNS)
+_PAYMENT_SELECT = ", ".join(PAYMENT_COLUMNS)
+# RETURNING devolve um REAL de valor inteiro (10.0) como inteiro (10), ao contrário
+# do SELECT; convertido aqui, a resposta de uma escrita é igual à leitura seguinte
+_PAYMENT_RETURNING = _PAYMENT_SELECT.replace(
+    "amount", "CASE WHEN typeof(amount) IN ('integer', 'real') THEN CAST(amount AS REAL) ELSE amount END")
+
+
+class Change(NamedTuple):
+    """Resultado de uma escrita: a linha como ficou no banco (None se apagada)
+    e a geração da tabela logo após a escrita (ver database.bump_generation)."""
+    row: tuple | None
+    generation: int
+
+
+class BulkChange(NamedTuple):
+    """Como Change, para escritas que alteram várias linhas de uma vez."""
+    rows: list[tuple]
+    generation: int
+
+
+# ---------------- Fontes paginadas ----------------
+class KeysetSource:
+    """Fonte de linhas paginada por chave (order_column, id).
+
+    A primeira coluna de `columns` precisa ser o id e `order_column` precisa
+    estar entre as colunas selecionadas, para que a última linha de uma página
+    sirva de âncora para a próxima (WHERE (col, id) > (?, ?)).
+    """
+
+    def __init__(self, table: str, columns: list[str], order_column: str,
+                 where: str = "", params: tuple = (), descending: bool = False):
+        self.table = table
+        self.columns = columns
+        self.order_column = order_column
+        self.where = where
+        self.params = tuple(params)
+        self.descending = descending
+        self._order_index = columns.index(order_column)
+        self.tables = (table,)      # gerações de que as linhas dependem (cache de leituras)
+
+    def _where(self, extra: str = "") -> str:
+        conds = [c for c in (self.where, extra) if c]
+        return f" WHERE {' AND '.join(f'({c})' for c in conds)}" if conds else ""
+
+    def count(self, conn) -> int:
+        sql = f"SELECT COUNT(*) FROM {self.table}{self._where()}"
+        return cached_fetchall(conn, sql, self.params, self.tables)[0][0]
+
+    def fetch(self, conn, offset: int, limit: int, after=None) -> list[tuple]:
+        col = self.order_column
+        select = ", ".join(self.columns)
+        direction = " DESC" if self.descending else ""
+        order = f" ORDER BY {col}{direction}, id{direction} LIMIT ?"
+        if after is None:
+            sql = f"SELECT {select} FROM {self.table}{self._where()}{order} OFFSET ?"
+            return cached_fetchall(conn, sql, self.params + (limit, offset), self.tables)
+
+        last_value, last_id = after[self._order_index], after[0]
+        # NULLs vêm primeiro no ORDER BY ascendente e por último no descendente
+        if self.descending and last_value is None:
+            cond = f"{col} IS NULL AND id < ?"
+            extra = (last_id,)
+        elif self.descending:
+            cond = f"({col}, id) < (?, ?) OR {col} IS NULL"
+            extra = (last_value, last_id)
+        elif last_value is None:
+            cond = f"({col} IS NULL AND id > ?) OR {col} IS NOT NULL"
+            extra = (last_id,)
+        else:
+            cond = f"({col}, id) > (?, ?)"
+            extra = (last_value, last_id)
+        sql = f"SELECT {select} FROM {self.table}{self._where(cond)}{order}"
+        return cached_fetchall(conn, sql, self.params + extra + (limit,), self.tables)
+
+
+class FtsSource:
+    """Fonte de linhas vindas de um índice FTS5, ordenadas por relevância (bm25).
+
+    `where`/`params` filtram as linhas da tabela (apelido t) além do MATCH.
+    """
+
+    def __init__(self, table: str, fts_table: str, columns: list[str], match: str,
+                 where: str = "", params: tuple = ()):
+        self.table = table
+        self.fts_table = fts_table
+        self.columns = columns
+        self.match = match
+        self.where = where
+        self.params = tuple(params)
+        self.tables = (table,)
+
+    def _filter(self) -> str:
+        return f" AND ({self.where})" if self.where else ""
+
+    def count(self, conn) -> int:
+        if not self.where:
+            sql = f"SELECT COUNT(*) FROM {self.fts_table} WHERE {self.fts_table} MATCH ?"
+        else:
+            sql = (f"SELECT COUNT(*) FROM {self.fts_table} f JOIN {self.table} t ON t.id = f.rowid "
+                   f"WHERE {self.fts_table} MATCH ?{self._filter()}")
+        return cached_fetchall(conn, sql, (self.match,) + self.params, self.tables)[0][0]
+
+    def fetch(self, conn, offset: int, limit: int, after=None) -> list[tuple]:
+        select = ", ".join(f"t.{c}" for c in self.columns)
+        sql = (f"SELECT {select} FROM {self.fts_table} f JOIN {self.table} t ON t.id = f.rowid "
+               f"WHERE {self.fts_table} MATCH ?{self._filter()} ORDER BY f.rank LIMIT ? OFFSET ?")
+        return cached_fetchall(conn, sql, (self.match,) + self.params + (limit, offset), self.tables)
+
+
+class FuzzySource:
+    """Os alunos mais parecidos com `term` (busca aproximada, ver name_index), paginados em memória.
+
+    Sem `sort` a ordem é a da nota; com `sort` as mesmas linhas são reordenadas
+    pela coluna. `scores` guarda a nota de cada id da última busca.
+    """
+
+    def __init__(self, term: str, columns: list[str], where: str = "", params: tuple = (),
+                 sort: str | None = None, descending: bool = False, limit: int = name_index.TOP_K):
+        self.term = term
+        self.columns = columns
+        self.where = where
+        self.params = tuple(params)
+        self.sort = sort
+        self.descending = descending
+        self.limit = limit
+        self.tables = ("students",)
+        self.scores: dict[int, float] = {}
+        self._result = None     # (geração de students, linhas)
+
+    def rows(self, conn) -> list[tuple]:
+        generation = data_generation(conn, "students")
+        if self._result is None or self._result[0] != generation:
+            matches = name_index.search(conn, self.term, self.columns, self.where, self.params, self.limit)
+            self.scores = {row[0]: score for row, score in matches}
+            rows = [row for row, _ in matches]
+            if self.sort:
+                index = self.columns.index(self.sort)
+                # NULLs primeiro na ordem ascendente e por último na descendente, como no ORDER BY
+                rows.sort(key=lambda r: (r[index] is not None, r[index] or ""), reverse=self.descending)
+            self._result = (generation, rows)
+        return self._result[1]
+
+    def count(self, conn) -> int:
+        return len(self.rows(conn))
+
+    def fetch(self, conn, offset: int, limit: int, after=None) -> list[tuple]:
+        return self.rows(conn)[offset:offset + limit]
+
+
+# ---------------- Login ----------------
+def authenticate(username: str, password: str) -> tuple[bool, bool]:
+    """(senha correta, é administrador)."""
+    return verify_user(username, password)
+
+
+# ---------------- Alunos ----------------
+# colunas pelas quais a tabela de alunos pode ser ordenada (todas indexadas)
+STUDENT_SORT_COLUMNS = ("name", "professor", "turma", "payment_date", "status_pagamento")
+
+
+def student_filters(status=None, turma=None, professor=None, date_from=None, date_to=None) -> tuple[str, tuple]:
+    """WHERE (sem a palavra) e parâmetros dos filtros da tabela de alunos; datas em ISO."""
+    conds, params = [], []
+    for column, value in (("status_pagamento", status), ("turma", turma), ("professor", professor)):
+        if value:
+            conds.append(f"{column} = ?")
+            params.append(value)
+    if date_from:
+        conds.append("payment_date >= ?")
+        params.append(date_from)
+    if date_to:
+        conds.append("payment_date <= ?")
+        params.append(date_to)
+    return " AND ".join(conds), tuple(params)
+
+
+def student_source(term: str = "", sort: str | None = None, descending: bool = False, filters: dict | None = None,
+                   fuzzy: bool = False):
+    """Fonte paginada da tabela de alunos: todos ou o resultado da busca, com filtros e ordenação.
+
+    Sem `sort` a listagem sai por nome e a busca por relevância; com `sort` a
+    busca vira só mais um filtro e a ordem é a da coluna escolhida. Com
+    `fuzzy` a busca tolera erros de digitação e traz só os name_index.TOP_K
+    alunos mais parecidos.
+    """
+    if sort is not None and sort not in STUDENT_SORT_COLUMNS:
+        raise ValueError(f"coluna de ordenação inválida: {sort!r}")
+    term = term.strip()
+    where, params = student_filters(**(filters or {}))
+    if fuzzy and term and name_index.available(get_connection()):
+        return FuzzySource(term, STUDENT_COLUMNS, where, params, sort, descending)
+    match = fts_query(term) if term else None
+    if match and not has_fts5(get_connection()):
+        match = None
+    if term and match and sort is None:
+        # busca por prefixo, sem acentos, ordenada por relevância
+        return FtsSource("students", "students_fts", STUDENT_COLUMNS, match, where, params)
+
+    conds, all_params = [where] if where else [], list(params)
+    if match:
+        conds.append("id IN (SELECT rowid FROM students_fts WHERE students_fts MATCH ?)")
+        all_params.append(match)
+    elif term:
+        like = f"%{term}%"
+        conds.append("name LIKE ? OR professor LIKE ? OR turma LIKE ?")
+        all_params.extend((like, like, like))
+    return KeysetSource("students", STUDENT_COLUMNS, sort or "name",
+                        " AND ".join(f"({c})" for c in conds), tuple(all_params), descending)
+
+
+def list_students(term: str = "", offset: int = 0, limit: int = PAGE_SIZE, after=None,
+                  sort: str | None = None, descending: bool = False, filters: dict | None = None) -> tuple[int, list[tuple]]:
+    """(total, página de linhas) da listagem ou da busca."""
+    source, conn = student_source(term, sort, descending, filters), get_connection()
+    return source.count(conn), source.fetch(conn, offset, limit, after)
+
+
+def get_student(student_id: int) -> tuple | None:
+    return get_connection().execute(f"SELECT {_STUDENT_SELECT} FROM students WHERE id=?",
+                                    (student_id,)).fetchone()
+
+
+@serialized_write
+def add_student(name, professor, turma, payment_date, payment_method, assinatura) -> Change:
+    with transaction() as conn:
+        row = conn.execute(f"INSERT INTO students (name, professor, turma, payment_date, payment_method, assinatura, status_pagamento) "
+                           f"VALUES (?,?,?,?,?,?,?) RETURNING {_STUDENT_SELECT}",
+                           (name, professor, turma, payment_date, payment_method, assinatura, "Pendente")).fetchone()
+        return Change(row, bump_generation(conn, "students"))
+
+
+@serialized_write
+def update_student(student_id: int, name, professor, turma, payment_date, payment_method, assinatura) -> Change:
+    with transaction() as conn:
+        row = conn.execute(f"UPDATE students SET name=?, professor=?, turma=?, payment_date=?, payment_method=?, assinatura=? "
+                           f"WHERE id=? RETURNING {_STUDENT_SELECT}",
+                           (name, professor, turma, payment_date, payment_method, assinatura, student_id)).fetchone()
+        return Change(row, bump_generation(conn, "students"))
+
+
+@serialized_write
+def delete_student(student_id: int) -> Change:
+    with transaction() as conn:
+        # os pagamentos do aluno são apagados junto (trigger payment_summary_student_bd)
+        conn.execute("DELETE FROM students WHERE id=?", (student_id,))
+        bump_generation(conn, "payments")
+        return Change(None, bump_generation(conn, "students"))
+
+
+@serialized_write
+def mark_student_paid(student_id: int) -> Change:
+    with transaction() as conn:
+        row = conn.execute(f"UPDATE students SET status_pagamento='Pago' WHERE id=? RETURNING {_STUDENT_SELECT}",
+                           (student_id,)).fetchone()
+        return Change(row, bump_generation(conn, "students"))
+
+
+@serialized_write
+def mark_students_paid(student_ids) -> BulkChange:
+    """Marca vários alunos como pagos numa única transação."""
+    with transaction() as conn:
+        rows = conn.execute(f"UPDATE students SET status_pagamento='Pago' "
+                            f"WHERE id IN (SELECT value FROM json_each(?)) RETURNING {_STUDENT_SELECT}",
+                            (json.dumps([int(i) for i in student_ids]),)).fetchall()
+        return BulkChange(rows, bump_generation(conn, "students"))
+
+
+def generation(name: str) -> int:
+    """Geração atual de students ou payments."""
+    return data_generation(get_connection(), name)
+
+
+def overdue_students() -> list[tuple]:
+    """(nome, data ISO) dos alunos pendentes com vencimento anterior a hoje."""
+    cur = get_connection().execute("""SELECT name, payment_date FROM students
+                                      WHERE status_pagamento='Pendente' AND payment_date < date('now', 'localtime')
+                                      ORDER BY payment_date""")
+    return cur.fetchall()
+
+
+# ---------------- Pagamentos ----------------
+def payment_history(student_id: int) -> list[tuple]:
+    return cached_fetchall(get_connection(),
+                           f"SELECT {_PAYMENT_SELECT} FROM payments WHERE student_id=? ORDER BY year DESC, month DESC",
+                           (student_id,), ("payments",))
+
+
+def archived_payment_history(student_id: int) -> list[tuple]:
+    """Pagamentos do aluno nos anos arquivados (somente leitura), do mais novo ao mais antigo."""
+    conn = get_connection()
+    rows = []
+    for schema in archive.schemas(conn):
+        rows += cached_fetchall(conn, f"SELECT {_PAYMENT_SELECT} FROM {schema}.payments WHERE student_id=?",
+                                (student_id,), ("payments",))
+    rows.sort(key=lambda r: (r[2], r[1]), reverse=True)
+    return rows
+
+
+@serialized_write
+def add_payment(student_id: int, month: int, year: int, payment_date: str, payment_method: str, amount: float) -> Change:
+    """Insere um pagamento já validado (ver utils.validate_payment_fields)."""
+    with transaction() as conn:
+        row = conn.execute(f"INSERT INTO payments (student_id, month, year, payment_date, payment_method, amount, status_pagamento) "
+                           f"VALUES (?,?,?,?,?,?,?) RETURNING {_PAYMENT_RETURNING}",
+                           (student_id, month, year, payment_date, payment_method, amount, "Pendente")).fetchone()
+        return Change(row, bump_generation(conn, "payments"))
+
+
+@serialized_write
+def mark_payment_paid(payment_id: int) -> Change:
+    with transaction() as conn:
+        row = conn.execute(f"UPDATE payments SET status_pagamento='Pago' WHERE id=? RETURNING {_PAYMENT_RETURNING}",
+                           (payment_id,)).fetchone()
+        return Change(row, bump_generation(conn, "payments"))
+
+
+@serialized_write
+def mark_payments_paid(payment_ids) -> BulkChange:
+    """Marca vários pagamentos como pagos numa única transação."""
+    with transaction() as conn:
+        rows = conn.execute(f"UPDATE payments SET status_pagamento='Pago' "
+                            f"WHERE id IN (SELECT value FROM json_each(?)) RETURNING {_PAYMENT_RETURNING}",
+                            (json.dumps([int(i) for i in payment_ids]),)).fetchall()
+        return BulkChange(rows, bump_generation(conn, "payments"))
+
+
+def ledger_page(filters: dict, cursor=None, carry: float = 0.0, limit: int = 100) -> list[tuple]:
+    """Uma página do livro-caixa, do pagamento mais recente para o mais antigo.
+
+    A paginação é por chave (year, month, id): `cursor` é a chave da última
+    linha da página anterior. A última coluna é o total acumulado, calculado
+    com SUM() OVER só sobre as linhas da página e somado a `carry`, o
+    acumulado ao final da página anterior.
+
+    Ano ou mês ausentes (NULL, ver migração 13) vêm depois dos preenchidos,
+    como no ORDER BY do SQLite.
+    """
+    conds, params = [], []
+    if filters.get("status"):
+        conds.append("p.status_pagamento = ?")
+        params.append(filters["status"])
+    if filters.get("method"):
+        conds.append("p.payment_method = ?")
+        params.append(filters["method"])
+    if filters.get("date_from"):
+        conds.append("p.payment_date >= ?")
+        params.append(filters["date_from"])
+    if filters.get("date_to"):
+        conds.append("p.payment_date <= ?")
+        params.append(filters["date_to"])
+
+    # o que vem depois do cursor; com NULL a comparação por linha daria NULL e
+    # pularia esses pagamentos, então a chave é dividida em faixas que usam os índices
+    if cursor is None:
+        ranges = [("", ())]
+    else:
+        year, month, pid = cursor
+        ranges = [("p.year IS ? AND (p.month, p.id) < (?, ?)", (year, month, pid)),
+                  ("p.year IS ? AND p.month IS NULL AND (? IS NOT NULL OR p.id < ?)", (year, month, pid)),
+                  ("p.year < ?", (year,)),
+                  ("p.year IS NULL AND ? IS NOT NULL", (year,))]
+    parts, part_params = [], []
+    for cond, values in ranges:
+        where = " AND ".join(conds + [cond] if cond else conds)
+        parts.append(f"""
+            SELECT * FROM (
+                SELECT p.id, p.year, p.month, p.payment_date, s.name, p.payment_method, p.amount, p.status_pagamento
+                FROM payments p LEFT JOIN students s ON s.id = p.student_id
+                {"WHERE " + where if where else ""}
+                ORDER BY p.year DESC, p.month DESC, p.id DESC
+                LIMIT ?
+            )""")
+        part_params += params + list(values) + [limit]
+
+    sql = f"""
+        SELECT id, year, month, payment_date, name, payment_method, amount, status_pagamento,
+               ? + SUM(COALESCE(amount, 0)) OVER (ORDER BY year DESC, month DESC, id DESC
+                                                  ROWS UNBOUNDED PRECEDING)
+        FROM ({" UNION ALL ".join(parts)}
+            ORDER BY year DESC, month DESC, id DESC
+            LIMIT ?
+        )
+        ORDER BY year DESC, month DESC, id DESC"""
+    return get_connection().execute(sql, [carry] + part_params + [limit]).fetchall()
+
+
+def payment_methods() -> list[str]:
+    cur = get_connection().execute("SELECT DISTINCT payment_method FROM payments WHERE payment_method IS NOT NULL ORDER BY 1")
+    return [r[0] for r in cur.fetchall()]
@@ -0,0 +1,96 @@
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import database
+from database import transaction, bump_generation
+
+FIRST_NAMES = ["João", "Maria", "José", "Ana", "Pedro", "Paula", "Lucas", "Júlia", "Marcos", "Márcia",
+               "Gabriel", "Beatriz", "Rafael", "Larissa", "Felipe", "Camila", "Mateus", "Letícia",
+               "Gustavo", "Fernanda", "André", "Luíza", "Thiago", "Vitória", "Caio", "Sofia"]
+LAST_NAMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Costa",
+              "Rodrigues", "Almeida", "Nascimento", "Araújo", "Melo", "Barbosa", "Ribeiro", "Conceição"]
+METHODS = ["Pix", "Dinheiro", "Cartão", "Boleto"]
+BATCH = 10_000
+
+
+def _name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def generate(students: int, payments: int, seed: int = 42, years: int = 5, progress=None) -> None:
+    """Popula o banco atual com alunos e pagamentos fictícios (mesma semente -> mesmos dados)."""
+    rng = random.Random(seed)
+    professors = [_name(rng) for _ in range(max(1, students // 400))]
+    turmas = [f"{serie}º{letra}" for serie in range(1, 10) for letra in "ABCDE"]
+    today = date.today()
+    first_year = today.year - years + 1
+
+    def student_rows():
+        for _ in range(students):
+            due = today + timedelta(days=rng.randint(-60, 30))
+            yield (_name(rng), rng.choice(professors), rng.choice(turmas), due.isoformat(),
+                   rng.choice(METHODS), "", "Pago" if rng.random() < 0.8 else "Pendente")
+
+    def payment_rows(first_id, last_id):
+        for _ in range(payments):
+            year = rng.randint(first_year, today.year)
+            month = rng.randint(1, 12)
+            paid = date(year, month, rng.randint(1, 28))
+            yield (rng.randint(first_id, last_id), month, year, paid.isoformat(), rng.choice(METHODS),
+                   round(rng.uniform(150, 900), 2), "Pago" if rng.random() < 0.9 else "Pendente")
+
+    def insert(sql, rows, total, label):
+        done = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH:
+                with transaction() as conn:
+                    conn.executemany(sql, batch)
+                done += len(batch)
+                batch.clear()
+                if progress:
+                    progress(label, done, total)
+        if batch:
+            with transaction() as conn:
+                conn.executemany(sql, batch)
+            if progress:
+                progress(label, total, total)
+
+    conn = database.get_connection()
+    first_id = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM students").fetchone()[0]) + 1
+    insert("INSERT INTO students (name, professor, turma, payment_date, payment_method, assinatura, status_pagamento) "
+           "VALUES (?,?,?,?,?,?,?)", student_rows(), students, "alunos")
+    if students and payments:
+        last_id = conn.execute("SELECT MAX(id) FROM students").fetchone()[0]
+        insert("INSERT INTO payments (student_id, month, year, payment_date, payment_method, amount, status_pagamento) "
+               "VALUES (?,?,?,?,?,?,?)", payment_rows(first_id, last_id), payments, "pagamentos")
+    with transaction() as conn:
+        bump_generation(conn, "students")
+        bump_generation(conn, "payments")
+    conn.execute("ANALYZE")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gera um banco com dados fictícios para testes de desempenho.")
+    parser.add_argument("banco", help="arquivo .db a criar/popular (não use o banco de produção)")
+    parser.add_argument("--alunos", type=int, default=100_000)
+    parser.add_argument("--pagamentos", type=int, default=2_000_000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    database.use_database(args.banco)
+    database.init_db()
+    start = time.perf_counter()
+    generate(args.alunos, args.pagamentos, args.semente,
+             progress=lambda label, n, total: print(f"\r{label}: {n}/{total}", end="", file=sys.stderr))
+    print(file=sys.stderr)
+    print(f"dados gerados em {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
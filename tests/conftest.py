@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Banco novo e migrado em tmp_path; o banco anterior volta a ser o atual no fim."""
+    previous = database.DB_PATH
+    database.use_database(str(tmp_path / "teste.db"))
+    database.init_db()
+    yield database.get_connection()
+    database.use_database(previous)
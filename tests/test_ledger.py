@@ -0,0 +1,33 @@
+import services
+from database import transaction, bump_generation
+
+
+def _walk(filters: dict, page: int) -> tuple[list[int], float]:
+    """Percorre o livro-caixa inteiro como a LedgerWindow: cursor e acumulado da última linha."""
+    ids, cursor, carry = [], None, 0.0
+    while True:
+        rows = services.ledger_page(filters, cursor, carry, page)
+        if not rows:
+            return ids, carry
+        ids += [r[0] for r in rows]
+        last = rows[-1]
+        cursor, carry = (last[1], last[2], last[0]), last[-1]
+
+
+def test_ledger_pages_through_null_months_and_years(db):
+    with transaction() as conn:
+        student = conn.execute("INSERT INTO students (name) VALUES ('Aluno') RETURNING id").fetchone()[0]
+        rows = [(month, year) for year in (2023, 2024) for month in (1, 6, 12, None)] + [(3, None), (None, None)]
+        for i, (month, year) in enumerate(rows * 3):
+            conn.execute("INSERT INTO payments (student_id, month, year, payment_date, payment_method, amount, "
+                         "status_pagamento) VALUES (?, ?, ?, '2024-01-10', 'Pix', ?, ?)",
+                         (student, month, year, 10.0 + i, "Pago" if i % 2 else "Pendente"))
+        bump_generation(conn, "payments")
+
+    for filters, where in (({}, ""), ({"status": "Pago"}, "WHERE status_pagamento = 'Pago'")):
+        expected = [r[0] for r in db.execute(f"SELECT id FROM payments {where} ORDER BY year DESC, month DESC, id DESC")]
+        total = db.execute(f"SELECT SUM(amount) FROM payments {where}").fetchone()[0]
+        for page in (1, 4, 100):
+            ids, carry = _walk(filters, page)
+            assert ids == expected
+            assert abs(carry - total) < 1e-9
@@ -1,4 +1,5 @@
 from pathlib import Path
+from datetime import datetime
 import os
 import sys
 
@@ -6,13 +7,107 @@ def resource_path(relative_path: str) -> str:
     try:
         base_path = sys._MEIPASS  
     except Exception:
-        base_path = os.path.abspath(".")
+        base_path = os.path.dirname(os.path.abspath(__file__))
 
     return os.path.join(base_path, relative_path)
 
 
 def get_art_path(filename: str) -> str:
     """
-    Retorna o caminho absoluto de um arquivo dentro da pasta Arte.
+    Retorna o caminho absoluto de um arquivo dentro da pasta Arte,
+    ou da raiz do projeto quando a pasta Arte não tem o arquivo.
     """
-    return resource_path(os.path.join("Arte", filename))
\ No newline at end of file
+    path = resource_path(os.path.join("Arte", filename))
+    if os.path.exists(path):
+        return path
+    return resource_path(filename)
+
+MONTH_NAMES = ["janeiro", "fevereiro", "março", "abril", "maio", "junho", "julho",
+               "agosto", "setembro", "outubro", "novembro", "dezembro"]
+
+
+def br_to_iso(value: str | None) -> str | None:
+    """Converte DD/MM/AAAA para AAAA-MM-DD. Datas já em ISO são devolvidas como estão."""
+    if value is None:
+        return None
+    value = value.strip()
+    if value == "":
+        return None
+    try:
+        return datetime.strptime(value, "%d/%m/%Y").date().isoformat()
+    except ValueError:
+        pass
+    datetime.strptime(value, "%Y-%m-%d")
+    return value
+
+
+def iso_to_br(value: str | None) -> str:
+    """Converte AAAA-MM-DD para DD/MM/AAAA (texto vazio para None)."""
+    if not value:
+        return ""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%d/%m/%Y")
+    except ValueError:
+        return value
+
+
+def format_money(value: float) -> str:
+    """1234.5 -> "R$ 1.234,50"."""
+    return f"R$ {value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def parse_month(value) -> int:
+    """Aceita 1..12, "01" ou o nome do mês em português e devolve o número."""
+    if isinstance(value, int):
+        month = value
+    else:
+        text = str(value).strip().lower()
+        if text.isdigit():
+            month = int(text)
+        else:
+            names = [n for n in MONTH_NAMES if n == text or n[:3] == text[:3] and len(text) >= 3]
+            if not names:
+                raise ValueError(f"mês inválido: {value!r}")
+            month = MONTH_NAMES.index(names[0]) + 1
+    if not 1 <= month <= 12:
+        raise ValueError(f"mês inválido: {value!r}")
+    return month
+
+
+def validate_payment_fields(month, year, date, method, amount):
+    """Valida um pagamento com as mesmas regras da tela de histórico.
+
+    Devolve (mês, ano, data ISO, forma, valor) ou levanta ValueError com a
+    mensagem a ser exibida ao usuário.
+    """
+    try:
+        amount = float(str(amount).strip().replace(",", "."))
+    except Exception:
+        raise ValueError("Valor inválido.")
+
+    month = str(month).strip()
+    year = str(year).strip()
+    date = str(date).strip()
+    method = str(method).strip()
+
+    if not (month and year and date and method):
+        raise ValueError("Preencha todos os campos.")
+
+    try:
+        year_i = int(year)
+        if year_i < 1900 or year_i > 2100:
+            raise ValueError
+    except Exception:
+        raise ValueError("Ano inválido.")
+
+    try:
+        month_i = parse_month(month)
+    except ValueError:
+        raise ValueError("Mês inválido.")
+
+    try:
+        datetime.strptime(date, "%d/%m/%Y")
+    except Exception:
+        raise ValueError("Data inválida. Use o formato DD/MM/AAAA.")
+
+    return month_i, year_i, br_to_iso(date), method, amount
@@ -0,0 +1,360 @@
+from tkinter import ttk
+
+
+class VirtualTreeview:
+    """Treeview que materializa apenas as linhas visíveis.
+
+    As linhas são buscadas em páginas de `page_size` conforme o usuário rola;
+    a barra de rolagem reflete o total de registros da fonte e só a janela
+    visível (mais uma margem de pré-carregamento) fica no widget. Com um
+    `worker` (db_worker.DbWorker) as páginas são buscadas em segundo plano e
+    linhas ainda não carregadas aparecem como marcadores temporários.
+
+    Com `generation` (função conn -> geração da tabela, ver
+    database.data_generation) as escritas feitas pela própria tela podem ser
+    aplicadas às páginas em memória com apply_change, sem recarregar tudo.
+    `on_loaded(total)` é chamado a cada refresh concluído.
+    """
+
+    MAX_CACHED_PAGES = 20
+    PLACEHOLDER = "Carregando…"
+
+    def __init__(self, parent, columns, connect, format_row, page_size: int = 200,
+                 prefetch: int = 50, rowheight: int = 28, worker=None, generation=None,
+                 selectmode: str = "browse", on_loaded=None):
+        self.connect = connect
+        self.on_loaded = on_loaded
+        self.generation = generation
+        self.format_row = format_row
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.rowheight = rowheight
+        self.worker = worker
+
+        self.source = None
+        self.total = 0
+        self.offset = 0
+        self.visible = 20
+        self.pages: dict[int, list[tuple]] = {}
+        self._loading: set[int] = set()
+        self._generation = 0
+        self._refreshing = False
+        self.data_generation = None
+
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings", selectmode=selectmode)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Up>", lambda e: self._on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self._on_arrow(1))
+        self.tree.bind("<Prior>", lambda e: self._scroll_break(-self.visible))
+        self.tree.bind("<Next>", lambda e: self._scroll_break(self.visible))
+
+    # ---------------- Fonte de dados ----------------
+    def set_source(self, source, label: str | None = None):
+        self.source = source
+        self.refresh(keep_position=False, label=label)
+
+    def refresh(self, keep_position: bool = True, label: str | None = None):
+        """Relê o total e a página atual; `label` nomeia a ação nas métricas do DbWorker."""
+        self._generation += 1
+        self.pages.clear()
+        self._loading.clear()
+        if not keep_position:
+            self.offset = 0
+        if self.source is None:
+            self._loaded(self._generation, None, 0)
+            return
+        if self.worker is None:
+            conn = self.connect()
+            data_generation = self.generation(conn) if self.generation else None
+            self._loaded(self._generation, data_generation, self.source.count(conn), None)
+            return
+        # a newer refresh (e.g. another search) replaces one still in flight
+        self._refreshing = True
+        source, generation, first = self.source, self._generation, self.offset // self.page_size
+        self.worker.submit(self._load_first, source, first,
+                           on_done=lambda res: self._loaded(generation, *res),
+                           key=("virtual-table", id(self)), label=label)
+
+    def _load_first(self, source, page_no):
+        conn = self.connect()
+        # lida antes das linhas: se algo mudar no meio, a próxima escrita percebe
+        data_generation = self.generation(conn) if self.generation else None
+        total = source.count(conn)
+        return data_generation, total, (page_no, source.fetch(conn, page_no * self.page_size, self.page_size))
+
+    def _loaded(self, generation, data_generation, total, first_page=None):
+        # the window may have been closed while the query was running
+        if not self.tree.winfo_exists():
+            return
+        if generation != self._generation:
+            return
+        self._refreshing = False
+        self.data_generation = data_generation
+        self.total = total
+        if first_page is not None:
+            self.pages[first_page[0]] = first_page[1]
+        self._clamp()
+        self.render()
+        if self.on_loaded:
+            self.on_loaded(total)
+
+    def _page(self, page_no: int) -> list[tuple] | None:
+        rows = self.pages.get(page_no)
+        if rows is not None:
+            return rows
+        prev = self.pages.get(page_no - 1)
+        after = prev[-1] if prev and len(prev) == self.page_size else None
+        if self.worker is None:
+            rows = self.source.fetch(self.connect(), page_no * self.page_size, self.page_size, after)
+            self._store(page_no, rows)
+            return rows
+        if page_no not in self._loading:
+            self._loading.add(page_no)
+            source, generation = self.source, self._generation
+            self.worker.submit(lambda: source.fetch(self.connect(), page_no * self.page_size, self.page_size, after),
+                               on_done=lambda rows: self._page_loaded(generation, page_no, rows), label="load_page")
+        return None
+
+    def _page_loaded(self, generation, page_no, rows):
+        if not self.tree.winfo_exists():
+            return
+        if generation != self._generation:
+            return
+        self._loading.discard(page_no)
+        self._store(page_no, rows)
+        first, last = self.offset // self.page_size, (self.offset + self.visible) // self.page_size
+        if first <= page_no <= last:
+            self.render()
+
+    def _store(self, page_no: int, rows: list[tuple]):
+        self.pages[page_no] = rows
+        self._evict(page_no)
+
+    def _evict(self, current: int):
+        if len(self.pages) <= self.MAX_CACHED_PAGES:
+            return
+        far = sorted(self.pages, key=lambda p: abs(p - current), reverse=True)
+        for p in far[:len(self.pages) - self.MAX_CACHED_PAGES]:
+            del self.pages[p]
+
+    def rows(self, start: int, stop: int) -> list[tuple | None]:
+        """Linhas de start a stop; None marca as que ainda estão carregando."""
+        out = []
+        stop = min(stop, self.total)
+        for page_no in range(start // self.page_size, (max(stop, 1) - 1) // self.page_size + 1):
+            base = page_no * self.page_size
+            lo, hi = max(start - base, 0), max(stop - base, 0)
+            page = self._page(page_no)
+            if page is None:
+                out.extend([None] * (min(hi, self.page_size) - lo))
+            else:
+                out.extend(page[lo:hi])
+        return out
+
+    # ---------------- Alterações pontuais ----------------
+    def apply_change(self, generation: int, kind: str, row=None, row_id=None) -> bool:
+        """Aplica uma escrita desta tela ("insert", "update" ou "delete") às páginas em memória.
+
+        `generation` é a geração da tabela logo após a escrita (services.Change).
+        Se não for a sucessora da última geração vista, outra escrita aconteceu
+        no meio e a tabela é recarregada mantendo a posição; o mesmo vale quando
+        a linha não pode ser posicionada com o que está em memória. Devolve
+        True se a alteração foi aplicada sem recarregar.
+        """
+        def apply():
+            if kind == "delete":
+                return self._remove(row_id)
+            if row is None:
+                # a linha sumiu antes da escrita (apagada em outro lugar)
+                return False
+            if kind == "update":
+                return self._replace(row)
+            return kind == "insert" and self._insert(row)
+
+        return self._apply(generation, apply)
+
+    def apply_updates(self, generation: int, rows: list[tuple]) -> bool:
+        """Como apply_change("update"), para várias linhas alteradas numa mesma escrita."""
+        return self._apply(generation, lambda: all(self._replace(row) for row in rows))
+
+    def _apply(self, generation: int, apply) -> bool:
+        expected = self.data_generation is not None and generation == self.data_generation + 1
+        if not (expected and not self._refreshing and not self._loading and self.source is not None and apply()):
+            self.refresh()
+            return False
+        self.data_generation = generation
+        self._clamp()
+        self.render()
+        return True
+
+    def _sort_key(self, row):
+        """Chave de ordenação da fonte, ou None se a ordem/filtro não é conhecida aqui."""
+        col = getattr(self.source, "order_column", None)
+        if col is None or getattr(self.source, "where", ""):
+            return None
+        value = row[self.source.columns.index(col)]
+        # NULLs vêm primeiro, como no ORDER BY do SQLite
+        return (value is not None, value if value is not None else 0, row[0])
+
+    def _locate(self, row_id):
+        for page_no, rows in self.pages.items():
+            for i, row in enumerate(rows):
+                if row[0] == row_id:
+                    return page_no, i
+        return None
+
+    def _replace(self, row) -> bool:
+        found = self._locate(row[0])
+        if found is None:
+            return False
+        page_no, i = found
+        old = self.pages[page_no][i]
+        if self._sort_key(old) == self._sort_key(row):
+            self.pages[page_no][i] = row
+            return True
+        # a linha mudou de lugar na ordenação
+        self._remove_at(page_no, i)
+        return self._insert(row)
+
+    def _remove(self, row_id) -> bool:
+        found = self._locate(row_id)
+        if found is None:
+            return False
+        self._remove_at(*found)
+        return True
+
+    def _remove_at(self, page_no: int, index: int):
+        del self.pages[page_no][index]
+        self.total -= 1
+        # puxa uma linha de cada página seguinte em memória para manter as páginas cheias
+        while page_no + 1 in self.pages and self.pages[page_no + 1]:
+            self.pages[page_no].append(self.pages[page_no + 1].pop(0))
+            page_no += 1
+        rows = self.pages[page_no]
+        if len(rows) < self.page_size and page_no * self.page_size + len(rows) < self.total:
+            # página incompleta no meio dos dados: será buscada de novo
+            del self.pages[page_no]
+        self._drop_after(page_no)
+
+    def _drop_after(self, page_no: int):
+        """Descarta as páginas depois de `page_no`: as linhas delas mudaram de posição."""
+        for p in [p for p in self.pages if p > page_no]:
+            del self.pages[p]
+
+    def _insert(self, row) -> bool:
+        key = self._sort_key(row)
+        if key is None or getattr(self.source, "descending", False):
+            return False
+        position = None
+        for page_no in sorted(self.pages):
+            rows = self.pages[page_no]
+            if not rows:
+                continue
+            first, last = self._sort_key(rows[0]), self._sort_key(rows[-1])
+            prev = self.pages.get(page_no - 1)
+            starts_here = page_no == 0 or (prev and len(prev) == self.page_size and self._sort_key(prev[-1]) < key)
+            is_last = page_no * self.page_size + len(rows) >= self.total
+            if first <= key <= last or (key < first and starts_here) or (key > last and is_last):
+                position = (page_no, sum(1 for r in rows if self._sort_key(r) < key))
+                break
+        if position is None:
+            return False
+        page_no, index = position
+        self.pages[page_no].insert(index, row)
+        self.total += 1
+        # empurra o excedente para as páginas seguintes que estiverem em memória
+        while len(self.pages[page_no]) > self.page_size and page_no + 1 in self.pages:
+            self.pages[page_no + 1].insert(0, self.pages[page_no].pop())
+            page_no += 1
+        del self.pages[page_no][self.page_size:]
+        self._drop_after(page_no)
+        return True
+
+    # ---------------- Renderização ----------------
+    def render(self):
+        if not self.tree.winfo_exists():
+            return
+        selected = self.tree.selection()
+        self.tree.delete(*self.tree.get_children())
+        if self.source is not None and self.total:
+            for i, row in enumerate(self.rows(self.offset, self.offset + self.visible)):
+                if row is None:
+                    self.tree.insert("", "end", iid=f"loading-{self.offset + i}", values=(self.PLACEHOLDER,))
+                    continue
+                iid, values = self.format_row(row)
+                self.tree.insert("", "end", iid=iid, values=values)
+            # pré-carrega a página seguinte quando a janela se aproxima do fim
+            ahead = self.offset + self.visible + self.prefetch
+            if ahead < self.total:
+                self._page(ahead // self.page_size)
+        keep = [iid for iid in selected if self.tree.exists(iid)]
+        if keep:
+            self.tree.selection_set(keep)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        if self.total <= 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        first = self.offset / self.total
+        last = min(self.offset + self.visible, self.total) / self.total
+        self.scrollbar.set(first, last)
+
+    def _clamp(self):
+        self.offset = max(0, min(self.offset, self.total - self.visible))
+
+    # ---------------- Rolagem ----------------
+    def yview(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * self.total)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.offset += step * (self.visible if args[2] == "pages" else 1)
+        self._clamp()
+        self.render()
+
+    def scroll(self, rows: int):
+        old = self.offset
+        self.offset += rows
+        self._clamp()
+        if self.offset != old:
+            self.render()
+
+    def _scroll_break(self, rows: int):
+        self.scroll(rows)
+        return "break"
+
+    def _on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_arrow(self, step: int):
+        children = self.tree.get_children()
+        sel = self.tree.selection()
+        if not children or not sel:
+            return None
+        edge = children[0] if step < 0 else children[-1]
+        if sel[0] != edge:
+            return None
+        self.scroll(step)
+        children = self.tree.get_children()
+        if children:
+            target = children[0] if step < 0 else children[-1]
+            self.tree.selection_set(target)
+            self.tree.focus(target)
+        return "break"
+
+    def _on_configure(self, event):
+        heading = self.rowheight
+        visible = max(1, (event.height - heading) // self.rowheight)
+        if visible != self.visible:
+            self.visible = visible
+            self._clamp()
+            self.render()